@@ -5,25 +5,102 @@ from datetime import datetime, timedelta
 from collections import Counter
 import re
 
+from cpu_pool import cpu_pool
+from working_set import as_tasks, as_events, as_time_entries
+
+WORD = re.compile(r'\b[a-zA-Z]{4,}\b')
+SENTENCE_END = re.compile(r'[.!?]+')
+
+# Common stop words to exclude from keywords
+STOP_WORDS = frozenset({'this', 'that', 'with', 'from', 'have', 'been', 'were', 'will',
+                        'would', 'could', 'should', 'about', 'which', 'their', 'there'})
+
+def local_summary(text):
+    """Simple extractive summary: the first 2-3 sentences of substance"""
+    sentences = [s.strip() for s in SENTENCE_END.split(text)]
+    sentences = [s for s in sentences if len(s) > 20]
+    
+    if not sentences:
+        return "Empty note"
+    
+    return '. '.join(sentences[:3]) + '.'
+
+def local_keywords(text):
+    """Simple keyword extraction: the 5 most frequent words that are not stop words"""
+    keywords = [w for w in WORD.findall(text.lower()) if w not in STOP_WORDS]
+    return [k[0] for k in Counter(keywords).most_common(5)]
+
+# Chunk functions for cpu_pool.map (module level so worker processes can import them)
+def _summaries(texts):
+    return [local_summary(text) for text in texts]
+
+def _keywords(texts):
+    return [local_keywords(text) for text in texts]
+
+class Badge:
+    """Declarative badge rule: earned while `metric` >= `threshold`"""
+    __slots__ = ('id', 'name', 'icon', 'metric', 'threshold')
+    
+    def __init__(self, id, name, icon, metric, threshold):
+        self.id = id
+        self.name = name
+        self.icon = icon
+        self.metric = metric
+        self.threshold = threshold
+    
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'icon': self.icon}
+
+BADGES = (
+    # Task completion badges
+    Badge('first_task', 'First Steps', '🎯', 'tasks_completed', 1),
+    Badge('task_warrior', 'Task Warrior', '⚔️', 'tasks_completed', 10),
+    Badge('task_master', 'Task Master', '👑', 'tasks_completed', 50),
+    Badge('centurion', 'Centurion', '🏆', 'tasks_completed', 100),
+    # Pomodoro badges
+    Badge('pomodoro_starter', 'Pomodoro Starter', '🍅', 'pomodoros_completed', 1),
+    Badge('focus_master', 'Focus Master', '🎯', 'pomodoros_completed', 25),
+    # Streak badges
+    Badge('consistent', 'Consistent', '📅', 'current_streak', 3),
+    Badge('week_warrior', 'Week Warrior', '🔥', 'current_streak', 7),
+    Badge('unstoppable', 'Unstoppable', '💎', 'current_streak', 30),
+    # Note badges
+    Badge('knowledge_seeker', 'Knowledge Seeker', '📚', 'notes_created', 10),
+    Badge('brain_builder', 'Brain Builder', '🧠', 'notes_created', 50),
+)
+
 class AIEngine:
     """
     AI Engine for NEXUS AI - Provides intelligent features
     Works locally without API keys, with optional OpenAI integration
     """
     
-    def __init__(self, openai_api_key=None):
+    def __init__(self, openai_api_key=None, llm=None):
         self.openai_api_key = openai_api_key
         self.has_openai = bool(openai_api_key)
-        
-    def suggest_next_task(self, tasks, current_time=None):
+        self.llm = llm  # Optional LLMClient; every method falls back to local heuristics
+    
+    def init_app(self, app):
+        """Pick up API settings from a Flask app's config"""
+        self.openai_api_key = app.config.get('OPENAI_API_KEY')
+        self.has_openai = bool(self.openai_api_key)
+        if app.config.get('ENABLE_AI_SUGGESTIONS'):
+            from llm_client import LLMClient  # Only pay for httpx/asyncio when enabled
+            self.llm = LLMClient(app)
+        
+    def suggest_next_task(self, tasks, current_time=None, graph=None):
         """
         AI-powered task suggestion based on priority, deadline, and patterns
+        With a TaskGraph, blocked tasks are skipped and bottlenecks rank higher
+        Tasks are TaskRecords or to_dict() dicts; the suggestion returns the same kind
         """
         if not tasks:
             return None
             
         current_time = current_time or datetime.now()
-        pending_tasks = [t for t in tasks if t['status'] == 'pending']
+        pending_tasks = as_tasks(tasks, status='pending')
+        if graph is not None:
+            pending_tasks = [t for t in pending_tasks if graph.is_ready(t.id)]
         
         if not pending_tasks:
             return None
@@ -35,12 +112,11 @@ class AIEngine:
             
             # Priority scoring
             priority_scores = {'urgent': 100, 'high': 75, 'medium': 50, 'low': 25}
-            score += priority_scores.get(task['priority'], 50)
+            score += priority_scores.get(task.priority, 50)
             
             # Deadline urgency
-            if task['deadline']:
-                deadline = datetime.fromisoformat(task['deadline'])
-                hours_until_deadline = (deadline - current_time).total_seconds() / 3600
+            if task.deadline:
+                hours_until_deadline = (task.deadline - current_time).total_seconds() / 3600
                 
                 if hours_until_deadline < 0:
                     score += 200  # Overdue!
@@ -54,15 +130,21 @@ class AIEngine:
             # Time-based suggestions
             hour = current_time.hour
             if 9 <= hour < 12:  # Morning - high priority tasks
-                if task['priority'] in ['urgent', 'high']:
+                if task.priority in ['urgent', 'high']:
                     score += 30
             elif 14 <= hour < 17:  # Afternoon - medium tasks
-                if task['priority'] == 'medium':
+                if task.priority == 'medium':
                     score += 20
             elif 20 <= hour < 23:  # Evening - low priority or creative
-                if task['priority'] == 'low':
+                if task.priority == 'low':
                     score += 15
             
+            # Dependencies - finishing this lets other work start
+            if graph is not None:
+                score += min(60, 15 * graph.unblocks(task.id))
+                if graph.on_critical_path(task.id):
+                    score += 40
+            
             scored_tasks.append((task, score))
         
         # Sort by score and return top suggestion
@@ -70,29 +152,29 @@ class AIEngine:
         best_task = scored_tasks[0][0]
         
         # Generate suggestion message
-        messages = [
-            f"🎯 Focus on '{best_task['title']}' - it's your top priority right now!",
-            f"⚡ Time to tackle '{best_task['title']}' - you've got this!",
-            f"🚀 Let's crush '{best_task['title']}' together!",
-            f"💪 '{best_task['title']}' is calling - let's get it done!",
+        llm_message = self.llm.suggest(best_task.to_dict()) if self.llm else None
+        messages = [llm_message] if llm_message else [
+            f"🎯 Focus on '{best_task.title}' - it's your top priority right now!",
+            f"⚡ Time to tackle '{best_task.title}' - you've got this!",
+            f"🚀 Let's crush '{best_task.title}' together!",
+            f"💪 '{best_task.title}' is calling - let's get it done!",
         ]
         
         return {
-            'task': best_task,
+            'task': best_task.original(),
             'message': random.choice(messages),
-            'reason': self._get_suggestion_reason(best_task, current_time)
+            'reason': self._get_suggestion_reason(best_task, current_time, graph)
         }
     
-    def _get_suggestion_reason(self, task, current_time):
+    def _get_suggestion_reason(self, task, current_time, graph=None):
         """Generate human-readable reason for suggestion"""
         reasons = []
         
-        if task['priority'] == 'urgent':
+        if task.priority == 'urgent':
             reasons.append("urgent priority")
         
-        if task['deadline']:
-            deadline = datetime.fromisoformat(task['deadline'])
-            hours_until = (deadline - current_time).total_seconds() / 3600
+        if task.deadline:
+            hours_until = (task.deadline - current_time).total_seconds() / 3600
             
             if hours_until < 0:
                 reasons.append("overdue")
@@ -101,11 +183,19 @@ class AIEngine:
             elif hours_until < 72:
                 reasons.append("due soon")
         
+        if graph is not None:
+            if graph.on_critical_path(task.id):
+                reasons.append("being on the critical path")
+            unblocks = graph.unblocks(task.id)
+            if unblocks:
+                reasons.append(f"unblocking {unblocks} task{'s' if unblocks > 1 else ''}")
+        
         return "Based on " + " and ".join(reasons) if reasons else "optimal timing"
     
-    def analyze_productivity(self, tasks, time_entries, days=7):
+    def analyze_productivity(self, tasks, time_entries, days=7, estimator=None):
         """
         Analyze productivity patterns and generate insights
+        A fitted DurationEstimator adds how far estimates are off
         """
         insights = {
             'total_tasks_completed': 0,
@@ -117,12 +207,14 @@ class AIEngine:
             'recommendations': []
         }
         
+        time_entries = as_time_entries(time_entries)
+        
         # Calculate completed tasks
-        completed_tasks = [t for t in tasks if t['status'] == 'completed']
+        completed_tasks = as_tasks(tasks, status='completed')
         insights['total_tasks_completed'] = len(completed_tasks)
         
         # Calculate total time
-        total_minutes = sum(entry['duration'] or 0 for entry in time_entries)
+        total_minutes = sum(entry.duration or 0 for entry in time_entries)
         insights['total_time_spent'] = total_minutes
         
         # Average task duration
@@ -132,9 +224,8 @@ class AIEngine:
         # Most productive hours (analyze time entries)
         hour_productivity = Counter()
         for entry in time_entries:
-            if entry['start_time']:
-                hour = datetime.fromisoformat(entry['start_time']).hour
-                hour_productivity[hour] += entry['duration'] or 0
+            if entry.start_time:
+                hour_productivity[entry.start_time.hour] += entry.duration or 0
         
         if hour_productivity:
             top_hours = hour_productivity.most_common(3)
@@ -158,6 +249,17 @@ class AIEngine:
         if insights['average_task_duration'] > 120:
             recommendations.append("⚡ Tasks are taking over 2 hours on average. Consider using Pomodoro technique!")
         
+        if estimator is not None and estimator.samples:
+            estimation = estimator.summary()
+            insights['estimation'] = estimation
+            factor = estimation['overall_factor']
+            if factor >= 1.2:
+                recommendations.append(f"⏱️ Tasks take {factor}x your estimates. Time blocks are now padded to match!")
+            elif factor <= 0.8:
+                recommendations.append(f"⏱️ Tasks take only {factor}x your estimates. You can plan more per day!")
+            for item in estimation['most_underestimated_tags'][:1]:
+                recommendations.append(f"🏷️ '{item['tag']}' tasks run {item['factor']}x over estimate. Budget extra time for them!")
+        
         if not recommendations:
             recommendations.append("🎉 Great job! Keep up the excellent productivity!")
         
@@ -165,95 +267,101 @@ class AIEngine:
         
         return insights
     
-    def suggest_time_blocks(self, tasks, events, date):
+    def suggest_time_blocks(self, tasks, events, date, estimator=None):
         """
         Suggest optimal time blocks for tasks based on calendar and patterns
+        A DurationEstimator replaces raw estimates with learned durations
         """
         suggestions = []
         
         # Get events for the day
-        day_events = [e for e in events if datetime.fromisoformat(e['start']).date() == date.date()]
+        day_events = [e for e in as_events(events) if e.start_time.date() == date.date()]
         
         # Find free time slots (assuming 9 AM to 9 PM work day)
         work_start = datetime.combine(date.date(), datetime.min.time().replace(hour=9))
         work_end = datetime.combine(date.date(), datetime.min.time().replace(hour=21))
         
         # Sort events by start time
-        day_events.sort(key=lambda e: e['start'])
+        day_events.sort(key=lambda e: e.start_time)
         
         # Find gaps between events
         free_slots = []
         current_time = work_start
         
         for event in day_events:
-            event_start = datetime.fromisoformat(event['start'])
-            if event_start > current_time:
-                free_slots.append((current_time, event_start))
-            current_time = max(current_time, datetime.fromisoformat(event['end']))
+            if event.start_time > current_time:
+                free_slots.append((current_time, event.start_time))
+            current_time = max(current_time, event.end_time)
         
         # Add final slot if there's time left
         if current_time < work_end:
             free_slots.append((current_time, work_end))
         
         # Match tasks to free slots
-        pending_tasks = [t for t in tasks if t['status'] == 'pending']
+        pending_tasks = as_tasks(tasks, status='pending')
         pending_tasks.sort(key=lambda t: (
-            {'urgent': 0, 'high': 1, 'medium': 2, 'low': 3}.get(t['priority'], 2),
-            t['deadline'] or '9999-12-31'
+            {'urgent': 0, 'high': 1, 'medium': 2, 'low': 3}.get(t.priority, 2),
+            t.deadline or datetime.max
         ))
         
         for task in pending_tasks[:5]:  # Top 5 tasks
-            estimated_time = task.get('estimated_time', 60)  # Default 1 hour
+            if estimator is not None:
+                estimated_time = estimator.expected_minutes(task.estimated_time, task.priority, task.tags)
+            else:
+                estimated_time = task.estimated_time or 60  # Default 1 hour
             
             for slot_start, slot_end in free_slots:
                 slot_duration = (slot_end - slot_start).total_seconds() / 60
                 
                 if slot_duration >= estimated_time:
                     suggestions.append({
-                        'task': task,
+                        'task': task.original(),
                         'suggested_start': slot_start.isoformat(),
                         'suggested_end': (slot_start + timedelta(minutes=estimated_time)).isoformat(),
+                        'predicted_minutes': estimated_time,
                         'confidence': 'high' if slot_duration >= estimated_time * 1.5 else 'medium'
                     })
                     break
         
         return suggestions
     
-    def summarize_note(self, note_content):
+    def summarize_note(self, note_content, timeout=None):
         """
-        Generate a summary of a note (local NLP-based)
+        Generate a summary of a note (language model if available, else local NLP-based)
         """
-        # Simple extractive summarization
-        sentences = re.split(r'[.!?]+', note_content)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+        if self.llm and note_content.strip():
+            summary = self.llm.summarize(note_content, timeout)
+            if summary:
+                return summary
         
-        if not sentences:
-            return "Empty note"
-        
-        # Take first 2-3 sentences as summary
-        summary_length = min(3, len(sentences))
-        summary = '. '.join(sentences[:summary_length]) + '.'
-        
-        return summary
+        return local_summary(note_content)
     
-    def extract_keywords(self, text):
+    def extract_keywords(self, text, timeout=None):
         """
         Extract keywords from text for tagging
         """
-        # Simple keyword extraction
-        words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-        
-        # Common stop words to exclude
-        stop_words = {'this', 'that', 'with', 'from', 'have', 'been', 'were', 'will', 
-                     'would', 'could', 'should', 'about', 'which', 'their', 'there'}
-        
-        keywords = [w for w in words if w not in stop_words]
+        if self.llm and text.strip():
+            tags = self.llm.tags(text, timeout)
+            if tags:
+                return tags
         
-        # Count frequency
-        keyword_freq = Counter(keywords)
-        
-        # Return top 5 keywords
-        return [k[0] for k in keyword_freq.most_common(5)]
+        return local_keywords(text)
+    
+    def summarize_notes(self, contents, timeout=None):
+        """
+        Summaries for many notes; the local summarizer runs chunked on the CPU pool
+        """
+        if self.llm:
+            return [self.summarize_note(content, timeout) for content in contents]
+        return cpu_pool.map(_summaries, contents)
+    
+    def extract_keywords_many(self, texts, timeout=None):
+        """
+        Keywords for many texts; the local extractor runs chunked on the CPU pool
+        """
+        if self.llm:
+            return [self.extract_keywords(text, timeout) for text in texts]
+        return cpu_pool.map(_keywords, texts)
     
     def generate_motivational_message(self, stats):
         """
@@ -291,36 +399,4 @@ class AIEngine:
         """
         Check and award badges based on achievements
         """
-        badges = []
-        
-        # Task completion badges
-        if stats['tasks_completed'] >= 1:
-            badges.append({'id': 'first_task', 'name': 'First Steps', 'icon': '🎯'})
-        if stats['tasks_completed'] >= 10:
-            badges.append({'id': 'task_warrior', 'name': 'Task Warrior', 'icon': '⚔️'})
-        if stats['tasks_completed'] >= 50:
-            badges.append({'id': 'task_master', 'name': 'Task Master', 'icon': '👑'})
-        if stats['tasks_completed'] >= 100:
-            badges.append({'id': 'centurion', 'name': 'Centurion', 'icon': '🏆'})
-        
-        # Pomodoro badges
-        if stats['pomodoros_completed'] >= 1:
-            badges.append({'id': 'pomodoro_starter', 'name': 'Pomodoro Starter', 'icon': '🍅'})
-        if stats['pomodoros_completed'] >= 25:
-            badges.append({'id': 'focus_master', 'name': 'Focus Master', 'icon': '🎯'})
-        
-        # Streak badges
-        if stats['current_streak'] >= 3:
-            badges.append({'id': 'consistent', 'name': 'Consistent', 'icon': '📅'})
-        if stats['current_streak'] >= 7:
-            badges.append({'id': 'week_warrior', 'name': 'Week Warrior', 'icon': '🔥'})
-        if stats['current_streak'] >= 30:
-            badges.append({'id': 'unstoppable', 'name': 'Unstoppable', 'icon': '💎'})
-        
-        # Note badges
-        if stats['notes_created'] >= 10:
-            badges.append({'id': 'knowledge_seeker', 'name': 'Knowledge Seeker', 'icon': '📚'})
-        if stats['notes_created'] >= 50:
-            badges.append({'id': 'brain_builder', 'name': 'Brain Builder', 'icon': '🧠'})
-        
-        return badges
+        return [badge.to_dict() for badge in BADGES if (stats.get(badge.metric) or 0) >= badge.threshold]
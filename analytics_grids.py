@@ -0,0 +1,299 @@
+"""
+Precomputed calendar grids for long-range analytics
+
+Logged minutes are kept per local calendar year in small int16 arrays:
+
+    daily   366 cells: minutes per day of the year (yearly heatmaps)
+    hours   7 x 24 cells: minutes per weekday and hour (focus grid)
+    tag     366 cells per tag: minutes per day on tasks with that tag (trends)
+
+Each array is one BLOB row in analytics_grids, so a query over ten years
+reads a few dozen rows of at most 732 bytes and slices them with NumPy,
+however many time entries lie behind them. Time entry writes update the
+grids in their own transaction: an after_flush hook adds the difference
+each new, changed or deleted entry makes. rebuild() recomputes every
+grid from hot and archived entries, which also picks up edits to task
+tags and rows written in bulk.
+
+An entry counts towards the local day and hour it started in. Cells
+saturate at 32767 minutes.
+"""
+import json
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import event, delete, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from config import Config
+from models import db, AnalyticsGrid, Task, ArchivedTask, TimeEntry, ArchivedTimeEntry
+from response_cache import bump_version
+
+DAYS = 366
+SHAPES = {'daily': (DAYS,), 'hours': (7, 24), 'tag': (DAYS,)}
+MAX_MINUTES = 32767
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def _decode(kind, blob):
+    import numpy as np
+    return np.frombuffer(blob, dtype='<i2').reshape(SHAPES[kind]).astype(np.int32)
+
+
+def _encode(grid):
+    import numpy as np
+    return np.clip(grid, 0, MAX_MINUTES).astype('<i2').tobytes()
+
+
+def _tag_keys(raw):
+    tags = json.loads(raw) if isinstance(raw, str) and raw else raw or []
+    return {str(tag)[:100] for tag in tags}
+
+
+def _cells(start_time, minutes, tags, tz):
+    """((kind, key, year), index, minutes) for every grid cell one entry adds to"""
+    local = start_time.replace(tzinfo=timezone.utc).astimezone(tz)
+    year, day = local.year, local.timetuple().tm_yday - 1
+    cells = [(('daily', '', year), day, minutes), (('hours', '', year), (local.weekday(), local.hour), minutes)]
+    cells.extend((('tag', tag, year), day, minutes) for tag in tags)
+    return cells
+
+
+def _previous(entry, name):
+    """An attribute's value before this flush (None if it had none)"""
+    history = get_history(entry, name)
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _update_flushed_entries(session, flush_context):
+    changes = []  # (start_time, minutes, task_id, sign)
+    for entry in session.new:
+        if isinstance(entry, TimeEntry):
+            changes.append((entry.start_time, entry.duration, entry.task_id, 1))
+    for entry in session.deleted:
+        if isinstance(entry, TimeEntry):
+            changes.append((entry.start_time, entry.duration, entry.task_id, -1))
+    for entry in session.dirty:
+        if isinstance(entry, TimeEntry) and any(
+                get_history(entry, name).has_changes() for name in ('start_time', 'duration', 'task_id')):
+            changes.append((_previous(entry, 'start_time'), _previous(entry, 'duration'), _previous(entry, 'task_id'), -1))
+            changes.append((entry.start_time, entry.duration, entry.task_id, 1))
+
+    changes = [change for change in changes if change[0] is not None and change[1]]
+    if changes:
+        apply_changes(session.connection(), changes)
+
+
+def apply_changes(connection, changes):
+    """Add (start_time, minutes, task_id, sign) changes to the stored grids"""
+    import numpy as np
+
+    tz = ZoneInfo(Config.TIMEZONE)
+    task_tags = {}
+    task_ids = {task_id for _, _, task_id, _ in changes if task_id}
+    for model in (Task, ArchivedTask):
+        missing = task_ids - task_tags.keys()
+        if missing:
+            rows = connection.execute(select(model.id, model.tags).where(model.id.in_(missing)))
+            task_tags.update((task_id, _tag_keys(raw)) for task_id, raw in rows)
+
+    deltas = {}
+    for start_time, minutes, task_id, sign in changes:
+        for grid_key, index, value in _cells(start_time, minutes, task_tags.get(task_id, ()), tz):
+            if grid_key not in deltas:
+                deltas[grid_key] = np.zeros(SHAPES[grid_key[0]], dtype=np.int32)
+            deltas[grid_key][index] += sign * value
+
+    table = AnalyticsGrid.__table__
+    stored = {
+        (row.kind, row.key, row.year): row.data
+        for row in connection.execute(select(table).where(
+            table.c.year.in_({year for _, _, year in deltas}),
+            table.c.key.in_({key for _, key, _ in deltas})
+        ).with_for_update())
+    }
+    now = datetime.utcnow()
+    for (kind, key, year), delta in deltas.items():
+        if (kind, key, year) in stored:
+            connection.execute(update(table).where(
+                table.c.kind == kind, table.c.key == key, table.c.year == year
+            ).values(data=_encode(_decode(kind, stored[(kind, key, year)]) + delta), updated_at=now))
+        elif delta.any():
+            connection.execute(insert(table).values(kind=kind, key=key, year=year, data=_encode(delta), updated_at=now))
+
+
+def detach_task(connection, task_id):
+    """
+    Take a task's logged minutes off its tag grids before its entries lose the task
+    Deleting a task clears task_id on its time entries in bulk, which the
+    flush hook never sees. The daily and hour grids keep the minutes.
+    """
+    changes = []
+    for model in (TimeEntry, ArchivedTimeEntry):
+        rows = connection.execute(select(model.start_time, model.duration).where(
+            model.task_id == task_id, model.duration > 0))
+        for start_time, minutes in rows:
+            # Tagged out, untagged back in: only the tag cells change
+            changes.extend(((start_time, minutes, task_id, -1), (start_time, minutes, None, 1)))
+    if changes:
+        apply_changes(connection, changes)
+        bump_version('analytics_grids')
+
+
+class AnalyticsGrids:
+    """Reads and maintenance of the per-year grids"""
+
+    def init_app(self, app):
+        # Keep the grids in step with time entry writes, in the same transaction
+        if not event.contains(Session, 'after_flush', _update_flushed_entries):
+            event.listen(Session, 'after_flush', _update_flushed_entries)
+
+    def rebuild(self):
+        """Recompute every grid from all time entries, hot and archived"""
+        import numpy as np
+
+        tz = ZoneInfo(Config.TIMEZONE)
+        task_tags = {}
+        for model in (Task, ArchivedTask):
+            for task_id, raw in db.session.query(model.id, model.tags).yield_per(Config.DB_STREAM_BATCH_SIZE):
+                tags = _tag_keys(raw)
+                if tags:
+                    task_tags[task_id] = tags
+
+        years, days, weekdays, hours, minutes, tag_names, tag_rows = [], [], [], [], [], [], []
+        for model in (TimeEntry, ArchivedTimeEntry):
+            rows = db.session.query(model.start_time, model.duration, model.task_id).filter(
+                model.duration > 0).yield_per(Config.DB_STREAM_BATCH_SIZE)
+            for start_time, duration, task_id in rows:
+                local = start_time.replace(tzinfo=timezone.utc).astimezone(tz)
+                for tag in task_tags.get(task_id, ()):
+                    tag_names.append(tag)
+                    tag_rows.append(len(years))
+                years.append(local.year)
+                days.append(local.timetuple().tm_yday - 1)
+                weekdays.append(local.weekday())
+                hours.append(local.hour)
+                minutes.append(duration)
+
+        grids = []
+        if years:
+            years, days = np.array(years), np.array(days)
+            minutes = np.array(minutes, dtype=np.int64)
+            first, span = int(years.min()), int(years.max() - years.min() + 1)
+            offset = years - first
+
+            daily = np.bincount(offset * DAYS + days, minutes, span * DAYS).reshape(span, DAYS)
+            by_hour = np.bincount((offset * 7 + np.array(weekdays)) * 24 + np.array(hours), minutes,
+                                  span * 168).reshape(span, 7, 24)
+            for i in range(span):
+                grids.append(('daily', '', first + i, daily[i]))
+                grids.append(('hours', '', first + i, by_hour[i]))
+
+            if tag_rows:
+                names, tag_index = np.unique(np.array(tag_names), return_inverse=True)
+                tag_rows = np.array(tag_rows)
+                cells = (tag_index * span + offset[tag_rows]) * DAYS + days[tag_rows]
+                by_tag = np.bincount(cells, minutes[tag_rows], len(names) * span * DAYS).reshape(len(names), span, DAYS)
+                for t, name in enumerate(names):
+                    for i in range(span):
+                        grids.append(('tag', str(name), first + i, by_tag[t, i]))
+
+        now = datetime.utcnow()
+        db.session.execute(delete(AnalyticsGrid.__table__))
+        rows = [{'kind': kind, 'key': key, 'year': year, 'data': _encode(grid), 'updated_at': now}
+                for kind, key, year, grid in grids if grid.any()]
+        if rows:
+            db.session.execute(insert(AnalyticsGrid.__table__), rows)
+        bump_version('analytics_grids')
+        db.session.commit()
+        return {'grids': len(rows), 'entries': len(minutes)}
+
+    def backfill(self):
+        """Build the grids the first time, for databases that already hold time entries"""
+        if db.session.query(AnalyticsGrid.year).first() is None and db.session.query(TimeEntry.id).first():
+            self.rebuild()
+
+    def _load(self, kind, first_year, last_year, keys=None):
+        """{(key, year): grid} for the stored grids of `kind` in the year range"""
+        query = db.session.query(AnalyticsGrid.key, AnalyticsGrid.year, AnalyticsGrid.data).filter(
+            AnalyticsGrid.kind == kind, AnalyticsGrid.year.between(first_year, last_year))
+        if keys is not None:
+            query = query.filter(AnalyticsGrid.key.in_(keys))
+        return {(key, year): _decode(kind, data) for key, year, data in query}
+
+    @staticmethod
+    def _days(grids, key, start, end):
+        """Minutes per day from start to end (inclusive), sliced out of the yearly grids"""
+        import numpy as np
+
+        pieces = []
+        for year in range(start.year, end.year + 1):
+            jan1 = date(year, 1, 1)
+            first = (start - jan1).days if year == start.year else 0
+            last = (end - jan1).days if year == end.year else (date(year + 1, 1, 1) - jan1).days - 1
+            grid = grids.get((key, year))
+            pieces.append(grid[first:last + 1] if grid is not None else np.zeros(last - first + 1, dtype=np.int32))
+        return np.concatenate(pieces)
+
+    def heatmap(self, start, end):
+        """Minutes per local day, with quartiles of the active days for four intensity levels"""
+        import numpy as np
+
+        minutes = self._days(self._load('daily', start.year, end.year), '', start, end)
+        active = minutes[minutes > 0]
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'minutes': minutes.tolist(),
+            'total': int(minutes.sum()),
+            'active_days': int(active.size),
+            'max': int(minutes.max()) if minutes.size else 0,
+            'levels': np.percentile(active, [25, 50, 75]).round().astype(int).tolist() if active.size else [0, 0, 0],
+        }
+
+    def focus_grid(self, first_year, last_year):
+        """Minutes per weekday and hour over whole years"""
+        import numpy as np
+
+        grid = np.zeros(SHAPES['hours'], dtype=np.int64)
+        for year_grid in self._load('hours', first_year, last_year).values():
+            grid += year_grid
+        weekday, hour = np.unravel_index(int(grid.argmax()), grid.shape)
+        return {
+            'start_year': first_year,
+            'end_year': last_year,
+            'weekdays': WEEKDAYS,
+            'minutes': grid.tolist(),
+            'peak': {'weekday': WEEKDAYS[weekday], 'hour': int(hour), 'minutes': int(grid[weekday, hour])}
+                    if grid.any() else None,
+        }
+
+    def tag_trends(self, start, end, tags=None, bucket='month', top=None):
+        """Minutes per tag per week or month; the `top` busiest tags unless `tags` are given"""
+        import numpy as np
+
+        grids = self._load('tag', start.year, end.year, tags)
+        names = tags if tags is not None else sorted({key for key, _ in grids})
+        series = {name: self._days(grids, name, start, end) for name in names}
+        if tags is None:
+            ranked = sorted(series, key=lambda name: -int(series[name].sum()))
+            series = {name: series[name] for name in ranked[:top or Config.ANALYTICS_TOP_TAGS]}
+
+        dates = np.arange(np.datetime64(start), np.datetime64(end) + 1)
+        if bucket == 'week':
+            # Weeks start on Monday; 1970-01-01 was a Thursday
+            periods = dates - (dates.astype(np.int64) + 3) % 7
+        else:
+            periods = dates.astype('datetime64[M]')
+        labels, starts = np.unique(periods, return_index=True)
+        return {
+            'bucket': bucket,
+            'periods': [str(label) for label in labels],
+            'series': {name: np.add.reduceat(days, starts).tolist() for name, days in series.items()},
+        }
+
+
+analytics_grids = AnalyticsGrids()
@@ -1,78 +1,195 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Blueprint, Response, current_app, render_template, request, jsonify, send_from_directory, stream_with_context
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 import json
 import os
+import re
+from itertools import chain
+import threading
+import click
+import hashlib
 from io import BytesIO
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend
-import matplotlib.pyplot as plt
 
 from config import Config
-from models import db, Task, Event, Note, TimeEntry, UserStats
+from models import db, Task, TaskDependency, Event, Note, TimeEntry, UserStats, Job, ActivityEvent, SyncOperation, ArchivedTask, ArchivedTimeEntry
 from ai_engine import AIEngine
+from jobs import job_queue
+from response_cache import response_cache, seed_versions, bump_version, get_versions
+from metrics import metrics
+from throttle import throttle
+from storage import normalize_database_url, engine_options, text_search, json_array_contains
+from migrations import upgrade as upgrade_schema
+from task_graph import TaskGraph, get_task_graph
+from estimator import duration_estimator
+from gamification import record_activity, refresh_streak, recompute_all, backfill_activity, get_user_stats, naive_utc
+from ical import import_calendar, generate_calendar, calendar_url, open_calendar_url
+from working_set import load_tasks, load_events, load_time_entries, task_dicts
+from archive import archive_history, archive_stats, reaches_archive, on_archive
+from analytics_grids import analytics_grids, detach_task
+from cpu_pool import cpu_pool
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
+# Routes are registered on a blueprint so create_app() can build fresh apps
+bp = Blueprint('nexus', __name__)
 
-# Initialize database
-db.init_app(app)
+# Shared AI Engine, configured from the app in create_app()
+ai_engine = AIEngine()
 
-# Initialize AI Engine
-ai_engine = AIEngine(openai_api_key=app.config.get('OPENAI_API_KEY'))
+cached = response_cache.cached
 
-# Create database tables
-with app.app_context():
+chart_lock = threading.Lock()  # pyplot is not thread-safe
+
+# Offline outbox replay: writes that may be queued, and references to earlier operations
+SYNC_METHODS = ('POST', 'PUT', 'DELETE')
+OP_REFERENCE = re.compile(r'\$op:([\w.-]{1,64})')
+
+# Background services start on the first request, once per process
+_services_started = False
+_services_lock = threading.Lock()
+
+def create_app(config_class=Config):
+    """Build a configured NEXUS AI application"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    CORS(app)
+    
+    # Initialize extensions
+    db.init_app(app)
+    ai_engine.init_app(app)
+    job_queue.init_app(app)
+    response_cache.init_app(app)
+    throttle.init_app(app)
+    analytics_grids.init_app(app)
+    cpu_pool.init_app(app)
+    
+    # Instrumentation for /metrics and Server-Timing
+    metrics.init_app(app)
+    metrics.instrument_serialization(Task, Event, Note, TimeEntry, UserStats, Job)
+    metrics.instrument_ai_engine(ai_engine, [
+        'suggest_next_task', 'analyze_productivity', 'suggest_time_blocks', 'summarize_note',
+        'extract_keywords', 'summarize_notes', 'extract_keywords_many', 'generate_motivational_message',
+        'check_badges'
+    ])
+    metrics.collectors = [lambda: {
+        f'nexus_response_cache_{name}': value
+        for name, value in response_cache.stats().items()
+        if name in ('hits', 'misses', 'not_modified', 'entries', 'bytes', 'evictions')
+    }, lambda: {
+        f'nexus_throttle_{name}': value
+        for name, value in throttle.stats().items()
+        if name != 'enabled'
+    }, lambda: {
+        f'nexus_cpu_pool_{name}': int(value)
+        for name, value in cpu_pool.stats().items()
+    }]
+    
+    app.register_blueprint(bp)
+    app.cli.add_command(init_db_command)
+    
+    if app.config.get('BACKGROUND_SERVICES', True):
+        app.before_request(start_background_services)
+    
+    return app
+
+def init_db():
+    """Create tables, apply migrations and seed rows the app expects"""
     db.create_all()
+    upgrade_schema()
     # Create default user stats if not exists
     if not UserStats.query.first():
         stats = UserStats()
         db.session.add(stats)
         db.session.commit()
+    backfill_activity()
+    seed_versions()
+    analytics_grids.backfill()
+
+@click.command('init-db')
+def init_db_command():
+    """Create the database schema."""
+    init_db()
+    click.echo('Initialized the database.')
+
+def start_background_services():
+    """Recover dangling timers and start the job workers"""
+    global _services_started
+    if _services_started:
+        return
+    
+    with _services_lock:
+        if _services_started:
+            return
+        # Close timers left running by a crashed or killed process
+        recover_dangling_timers()
+        job_queue.start()
+        _services_started = True
 
 # ============================================================================
 # ROUTES - Main Page
 # ============================================================================
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Main dashboard page"""
     return render_template('index.html')
 
+@bp.route('/sw.js')
+def service_worker():
+    """Offline service worker, served from the root so its scope covers the whole app"""
+    response = send_from_directory(os.path.join(current_app.static_folder, 'js'), 'sw.js',
+                                   mimetype='application/javascript', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'  # Browsers must see a new worker as soon as it ships
+    return response
+
 # ============================================================================
 # API ROUTES - Tasks
 # ============================================================================
 
-@app.route('/api/tasks', methods=['GET'])
+@bp.route('/api/tasks', methods=['GET'])
+@cached('tasks')
 def get_tasks():
-    """Get all tasks"""
+    """Get all tasks (archived ones too with ?include_archived=1)"""
     status = request.args.get('status')
     priority = request.args.get('priority')
     
-    query = Task.query
-    
+    criteria = []
     if status:
-        query = query.filter_by(status=status)
+        criteria.append(Task.status == status)
     if priority:
-        query = query.filter_by(priority=priority)
+        criteria.append(Task.priority == priority)
     
-    tasks = query.order_by(Task.order_index, Task.created_at.desc()).all()
-    return jsonify([task.to_dict() for task in tasks])
+    tasks = Task.query.filter(*criteria).order_by(Task.order_index, Task.created_at.desc()).all()
+    result = [task.to_dict() for task in tasks]
+    
+    if request.args.get('include_archived'):
+        archived = ArchivedTask.query.filter(*(on_archive(c, Task) for c in criteria))
+        result.extend(task.to_dict() for task in archived.order_by(ArchivedTask.completed_at.desc()))
+    
+    return jsonify(result)
 
-@app.route('/api/tasks', methods=['POST'])
+@bp.route('/api/tasks', methods=['POST'])
 def create_task():
     """Create a new task"""
     data = request.json
     
+    parent_id = data.get('parent_id')
+    if parent_id and not db.session.get(Task, parent_id):
+        return jsonify({'error': 'Parent task not found'}), 400
+    
     task = Task(
         title=data['title'],
         description=data.get('description', ''),
         priority=data.get('priority', 'medium'),
         deadline=datetime.fromisoformat(data['deadline']) if data.get('deadline') else None,
         tags=json.dumps(data.get('tags', [])),
-        estimated_time=data.get('estimated_time')
+        estimated_time=data.get('estimated_time'),
+        parent_id=parent_id
     )
     
     db.session.add(task)
@@ -80,12 +197,26 @@ def create_task():
     
     return jsonify(task.to_dict()), 201
 
-@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+@bp.route('/api/tasks/<int:task_id>', methods=['PUT'])
 def update_task(task_id):
     """Update a task"""
     task = Task.query.get_or_404(task_id)
     data = request.json
     
+    # Check the hierarchy before touching anything else
+    if data.get('parent_id') and data['parent_id'] != task.parent_id:
+        graph = TaskGraph.load()
+        if data['parent_id'] not in graph.status:
+            return jsonify({'error': 'Parent task not found'}), 400
+        if graph.would_create_cycle(task.id, data['parent_id']):
+            return jsonify({'error': 'Dependency cycle'}), 409
+    
+    # Completions logged after the fact may carry their real time
+    try:
+        completed_at = parse_timestamp(data['completed_at']) if data.get('completed_at') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid completed_at'}), 400
+    
     # Update fields
     if 'title' in data:
         task.title = data['title']
@@ -93,14 +224,16 @@ def update_task(task_id):
         task.description = data['description']
     if 'priority' in data:
         task.priority = data['priority']
+    completed = False
     if 'status' in data:
         old_status = task.status
         task.status = data['status']
         
         # If task completed, update stats
         if old_status != 'completed' and data['status'] == 'completed':
-            task.completed_at = datetime.utcnow()
-            update_user_stats('task_completed')
+            task.completed_at = completed_at or datetime.utcnow()
+            record_activity('task_completed', occurred_at=task.completed_at, subject_id=task.id)
+            completed = True
     
     if 'deadline' in data:
         task.deadline = datetime.fromisoformat(data['deadline']) if data['deadline'] else None
@@ -110,19 +243,37 @@ def update_task(task_id):
         task.estimated_time = data['estimated_time']
     if 'order_index' in data:
         task.order_index = data['order_index']
+    if 'parent_id' in data:
+        task.parent_id = data['parent_id']
     
     db.session.commit()
-    return jsonify(task.to_dict())
+    
+    task_dict = task.to_dict()
+    if completed:
+        duration_estimator.observe(task_dict)
+    return jsonify(task_dict)
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@bp.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     """Delete a task"""
     task = Task.query.get_or_404(task_id)
+    
+    # Detach the task from the dependency graph
+    TaskDependency.query.filter(
+        (TaskDependency.blocker_id == task_id) | (TaskDependency.blocked_id == task_id)
+    ).delete(synchronize_session=False)
+    Task.query.filter_by(parent_id=task_id).update({Task.parent_id: task.parent_id}, synchronize_session=False)
+    # Keep the history but drop the reference (foreign keys are enforced on PostgreSQL)
+    detach_task(db.session.connection(), task_id)
+    TimeEntry.query.filter_by(task_id=task_id).update({TimeEntry.task_id: None}, synchronize_session=False)
+    Event.query.filter_by(task_id=task_id).update({Event.task_id: None}, synchronize_session=False)
+    bump_version('task_dependencies', 'time_entries', 'events')
+    
     db.session.delete(task)
     db.session.commit()
     return '', 204
 
-@app.route('/api/tasks/reorder', methods=['POST'])
+@bp.route('/api/tasks/reorder', methods=['POST'])
 def reorder_tasks():
     """Reorder tasks (for drag and drop)"""
     data = request.json
@@ -136,11 +287,76 @@ def reorder_tasks():
     db.session.commit()
     return jsonify({'success': True})
 
+# ============================================================================
+# API ROUTES - Task Dependencies
+# ============================================================================
+
+@bp.route('/api/tasks/<int:task_id>/dependencies', methods=['GET'])
+@cached('tasks', 'task_dependencies')
+def get_task_dependencies(task_id):
+    """Get a task's parent, subtasks, blockers and the tasks it blocks"""
+    Task.query.get_or_404(task_id)
+    return jsonify(get_task_graph().neighbours(task_id))
+
+@bp.route('/api/tasks/<int:task_id>/dependencies', methods=['POST'])
+def add_task_dependency(task_id):
+    """Add a blocker ({"blocked_by": id}) or a blocked task ({"blocks": id})"""
+    data = request.json
+    if 'blocked_by' in data:
+        blocker_id, blocked_id = data['blocked_by'], task_id
+    elif 'blocks' in data:
+        blocker_id, blocked_id = task_id, data['blocks']
+    else:
+        return jsonify({'error': 'Expected blocked_by or blocks'}), 400
+    
+    existing = db.session.get(TaskDependency, (blocker_id, blocked_id))
+    if existing:
+        return jsonify(existing.to_dict())
+    
+    graph = TaskGraph.load()
+    if blocker_id not in graph.status or blocked_id not in graph.status:
+        return jsonify({'error': 'Task not found'}), 404
+    if graph.would_create_cycle(blocker_id, blocked_id):
+        return jsonify({'error': 'Dependency cycle'}), 409
+    
+    dependency = TaskDependency(blocker_id=blocker_id, blocked_id=blocked_id)
+    db.session.add(dependency)
+    db.session.commit()
+    return jsonify(dependency.to_dict()), 201
+
+@bp.route('/api/tasks/<int:task_id>/dependencies/<int:blocker_id>', methods=['DELETE'])
+def delete_task_dependency(task_id, blocker_id):
+    """Remove a blocker from a task"""
+    dependency = TaskDependency.query.get_or_404((blocker_id, task_id))
+    db.session.delete(dependency)
+    db.session.commit()
+    return '', 204
+
+@bp.route('/api/tasks/ready', methods=['GET'])
+@cached('tasks', 'task_dependencies')
+def get_ready_tasks():
+    """Get open tasks whose blockers and subtasks are all completed"""
+    graph = get_task_graph()
+    tasks = Task.query.filter(Task.status != 'completed').order_by(Task.order_index, Task.created_at.desc())
+    return jsonify([task.to_dict() for task in tasks if graph.is_ready(task.id)])
+
+@bp.route('/api/tasks/critical-path', methods=['GET'])
+@cached('tasks', 'task_dependencies')
+def get_critical_path():
+    """Get the longest chain of open tasks, weighted by estimated time"""
+    path, total = get_task_graph().critical_path()
+    tasks = {task.id: task for task in Task.query.filter(Task.id.in_(path))} if path else {}
+    return jsonify({
+        'tasks': [tasks[task_id].to_dict() for task_id in path],
+        'total_minutes': total
+    })
+
 # ============================================================================
 # API ROUTES - Events (Calendar)
 # ============================================================================
 
-@app.route('/api/events', methods=['GET'])
+@bp.route('/api/events', methods=['GET'])
+@cached('events')
 def get_events():
     """Get all events"""
     start = request.args.get('start')
@@ -156,7 +372,7 @@ def get_events():
     events = query.order_by(Event.start_time).all()
     return jsonify([event.to_dict() for event in events])
 
-@app.route('/api/events', methods=['POST'])
+@bp.route('/api/events', methods=['POST'])
 def create_event():
     """Create a new event"""
     data = request.json
@@ -178,7 +394,7 @@ def create_event():
     
     return jsonify(event.to_dict()), 201
 
-@app.route('/api/events/<int:event_id>', methods=['PUT'])
+@bp.route('/api/events/<int:event_id>', methods=['PUT'])
 def update_event(event_id):
     """Update an event"""
     event = Event.query.get_or_404(event_id)
@@ -200,7 +416,7 @@ def update_event(event_id):
     db.session.commit()
     return jsonify(event.to_dict())
 
-@app.route('/api/events/<int:event_id>', methods=['DELETE'])
+@bp.route('/api/events/<int:event_id>', methods=['DELETE'])
 def delete_event(event_id):
     """Delete an event"""
     event = Event.query.get_or_404(event_id)
@@ -208,11 +424,57 @@ def delete_event(event_id):
     db.session.commit()
     return '', 204
 
+# ============================================================================
+# API ROUTES - Calendar Import/Export (iCalendar)
+# ============================================================================
+
+@bp.route('/api/calendar/import', methods=['POST'])
+def import_ical():
+    """Import an .ics upload, raw text/calendar body, or (in the background) a URL"""
+    if request.is_json:
+        try:
+            url = calendar_url(str((request.json or {}).get('url', '')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        job = job_queue.enqueue('import_calendar_url', {'url': url})
+        db.session.commit()
+        return jsonify(job.to_dict()), 202
+    
+    # Both sources are read in chunks; the upload is never loaded whole
+    stream = request.files['file'].stream if 'file' in request.files else request.stream
+    counts = import_calendar(stream)
+    return jsonify(counts)
+
+@bp.route('/api/calendar/feed.ics', methods=['GET'])
+def calendar_feed():
+    """Subscribable iCalendar feed of all events, streamed and conditional"""
+    last_modified, count = db.session.query(db.func.max(Event.updated_at), db.func.count(Event.id)).one()
+    version = get_versions(('events',))['events']
+    etag = hashlib.md5(f"{version}:{count}:{last_modified}".encode()).hexdigest()
+    
+    last_modified = last_modified or datetime(1970, 1, 1)
+    
+    # Only a changed feed gets a body: stream_with_context holds the request context until it is consumed
+    body = ()
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        events = Event.query.order_by(Event.start_time).yield_per(Config.DB_STREAM_BATCH_SIZE)
+        body = stream_with_context(generate_calendar(events))
+    response = Response(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True  # Clients revalidate; unchanged feeds cost a 304
+    response.implicit_sequence_conversion = False  # Or make_conditional buffers the body for Content-Length
+    response.make_conditional(request)
+    if request.args.get('download'):
+        response.headers['Content-Disposition'] = 'attachment; filename="nexus-ai.ics"'
+    return response
+
 # ============================================================================
 # API ROUTES - Notes (Second Brain)
 # ============================================================================
 
-@app.route('/api/notes', methods=['GET'])
+@bp.route('/api/notes', methods=['GET'])
+@cached('notes')
 def get_notes():
     """Get all notes"""
     search = request.args.get('search', '')
@@ -221,47 +483,45 @@ def get_notes():
     query = Note.query
     
     if search:
-        query = query.filter(
-            (Note.title.contains(search)) | (Note.content.contains(search))
-        )
+        query = query.filter(text_search([Note.title, Note.content], search))
     
     if tag:
-        query = query.filter(Note.tags.contains(tag))
+        query = query.filter(json_array_contains(Note.tags, tag))
     
     notes = query.order_by(Note.updated_at.desc()).all()
     return jsonify([note.to_dict() for note in notes])
 
-@app.route('/api/notes', methods=['POST'])
+@bp.route('/api/notes', methods=['POST'])
 def create_note():
     """Create a new note"""
     data = request.json
     
-    # Extract keywords for auto-tagging
-    keywords = ai_engine.extract_keywords(data['content'])
-    existing_tags = data.get('tags', [])
-    all_tags = list(set(existing_tags + keywords[:3]))  # Merge and deduplicate
-    
     note = Note(
         title=data['title'],
         content=data['content'],
-        tags=json.dumps(all_tags),
+        tags=json.dumps(data.get('tags', [])),
         linked_notes=json.dumps(data.get('linked_notes', []))
     )
     
     db.session.add(note)
-    db.session.commit()
+    db.session.flush()
     
-    update_user_stats('note_created')
+    # Auto-tagging and summarizing happen in the background
+    job_queue.enqueue('auto_tag_note', {'note_id': note.id})
+    job_queue.enqueue('summarize_note', {'note_id': note.id})
+    record_activity('note_created', occurred_at=note.created_at, subject_id=note.id)
+    db.session.commit()
     
     return jsonify(note.to_dict()), 201
 
-@app.route('/api/notes/<int:note_id>', methods=['GET'])
+@bp.route('/api/notes/<int:note_id>', methods=['GET'])
+@cached('notes')
 def get_note(note_id):
     """Get a specific note"""
     note = Note.query.get_or_404(note_id)
     return jsonify(note.to_dict())
 
-@app.route('/api/notes/<int:note_id>', methods=['PUT'])
+@bp.route('/api/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     """Update a note"""
     note = Note.query.get_or_404(note_id)
@@ -271,11 +531,10 @@ def update_note(note_id):
         note.title = data['title']
     if 'content' in data:
         note.content = data['content']
-        # Re-extract keywords
-        keywords = ai_engine.extract_keywords(data['content'])
-        existing_tags = json.loads(note.tags) if note.tags else []
-        all_tags = list(set(existing_tags + keywords[:3]))
-        note.tags = json.dumps(all_tags)
+        note.summary = None
+        # Re-extract keywords and summary in the background
+        job_queue.enqueue('auto_tag_note', {'note_id': note.id})
+        job_queue.enqueue('summarize_note', {'note_id': note.id})
     
     if 'tags' in data:
         note.tags = json.dumps(data['tags'])
@@ -289,7 +548,7 @@ def update_note(note_id):
     
     return jsonify(note.to_dict())
 
-@app.route('/api/notes/<int:note_id>', methods=['DELETE'])
+@bp.route('/api/notes/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
     """Delete a note"""
     note = Note.query.get_or_404(note_id)
@@ -297,37 +556,52 @@ def delete_note(note_id):
     db.session.commit()
     return '', 204
 
-@app.route('/api/notes/<int:note_id>/summary', methods=['GET'])
+@bp.route('/api/notes/<int:note_id>/summary', methods=['GET'])
+@cached('notes')
 def get_note_summary(note_id):
     """Get AI-generated summary of a note"""
     note = Note.query.get_or_404(note_id)
-    summary = ai_engine.summarize_note(note.content)
+    summary = note.summary or ai_engine.summarize_note(note.content)
     return jsonify({'summary': summary})
 
+@bp.route('/api/notes/retag', methods=['POST'])
+def retag_all_notes():
+    """Queue keyword re-extraction for every note (and fresh summaries with {"summaries": true})"""
+    data = request.get_json(silent=True) or {}
+    job = job_queue.enqueue('retag_notes', {'summaries': bool(data.get('summaries'))})
+    db.session.commit()
+    return jsonify(job.to_dict()), 202
+
 # ============================================================================
 # API ROUTES - Time Tracking
 # ============================================================================
 
-@app.route('/api/time-entries', methods=['GET'])
+@bp.route('/api/time-entries', methods=['GET'])
+@cached('time_entries')
 def get_time_entries():
-    """Get time entries"""
-    task_id = request.args.get('task_id')
+    """Get time entries (archived ones too with ?include_archived=1 or a start_date past the archive cutoff)"""
+    task_id = request.args.get('task_id', type=int)
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    query = TimeEntry.query
-    
+    criteria = []
     if task_id:
-        query = query.filter_by(task_id=task_id)
+        criteria.append(TimeEntry.task_id == task_id)
     if start_date:
-        query = query.filter(TimeEntry.start_time >= datetime.fromisoformat(start_date))
+        criteria.append(TimeEntry.start_time >= datetime.fromisoformat(start_date))
     if end_date:
-        query = query.filter(TimeEntry.end_time <= datetime.fromisoformat(end_date))
+        criteria.append(TimeEntry.end_time <= datetime.fromisoformat(end_date))
+    
+    entries = TimeEntry.query.filter(*criteria).order_by(TimeEntry.start_time.desc()).all()
+    result = [entry.to_dict() for entry in entries]
+    
+    if request.args.get('include_archived') or (start_date and reaches_archive(datetime.fromisoformat(start_date))):
+        archived = ArchivedTimeEntry.query.filter(*(on_archive(c, TimeEntry) for c in criteria))
+        result.extend(entry.to_dict() for entry in archived.order_by(ArchivedTimeEntry.start_time.desc()))
     
-    entries = query.order_by(TimeEntry.start_time.desc()).all()
-    return jsonify([entry.to_dict() for entry in entries])
+    return jsonify(result)
 
-@app.route('/api/time-entries', methods=['POST'])
+@bp.route('/api/time-entries', methods=['POST'])
 def create_time_entry():
     """Create a time entry"""
     data = request.json
@@ -348,96 +622,374 @@ def create_time_entry():
         if task:
             task.actual_time = (task.actual_time or 0) + entry.duration
     
+    record_activity('time_logged', occurred_at=entry.start_time, subject_id=entry.task_id)
     db.session.commit()
     
     return jsonify(entry.to_dict()), 201
 
-@app.route('/api/pomodoro/complete', methods=['POST'])
+@bp.route('/api/pomodoro/complete', methods=['POST'])
 def complete_pomodoro():
     """Mark a pomodoro session as complete"""
     data = request.json
-    task_id = data.get('task_id')
+    task_id = int(data['task_id']) if data.get('task_id') else None
     duration = data.get('duration', 25)  # Default 25 minutes
-    
-    # Create time entry
-    entry = TimeEntry(
-        task_id=task_id,
-        start_time=datetime.utcnow() - timedelta(minutes=duration),
-        end_time=datetime.utcnow(),
-        duration=duration,
-        entry_type='pomodoro'
-    )
-    db.session.add(entry)
+    now = datetime.utcnow()
+    # Sessions replayed from the offline outbox carry the time they really ended
+    try:
+        completed_at = parse_timestamp(data['completed_at']) if data.get('completed_at') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid completed_at'}), 400
+    ended = min(completed_at, now) if completed_at else now
+    
+    # A session with its own end time was not tracked by whatever timer is running now
+    entry = get_active_timer(now) if completed_at is None else None
+    # Only a timer running for this same task was tracking the session; any other keeps running
+    tracked_live = entry is not None and entry.task_id == task_id
+    if tracked_live:
+        # The session was tracked live - close it with its real start time
+        stop_timer(entry, now)
+        entry.entry_type = 'pomodoro'
+    else:
+        # Create time entry
+        entry = TimeEntry(
+            task_id=task_id,
+            start_time=ended - timedelta(minutes=duration),
+            end_time=ended,
+            duration=duration,
+            entry_type='pomodoro'
+        )
+        db.session.add(entry)
     
     # Update task
     if task_id:
         task = Task.query.get(task_id)
         if task:
             task.pomodoros_completed = (task.pomodoros_completed or 0) + 1
-            task.actual_time = (task.actual_time or 0) + duration
+            if not tracked_live:
+                task.actual_time = (task.actual_time or 0) + duration
     
     # Update user stats
-    update_user_stats('pomodoro_completed')
+    record_activity('pomodoro_completed', occurred_at=entry.end_time, subject_id=task_id)
     
     db.session.commit()
     
     return jsonify({'success': True, 'entry': entry.to_dict()})
 
+# ============================================================================
+# API ROUTES - Live Timer
+# ============================================================================
+
+@bp.route('/api/timer', methods=['GET'])
+def get_timer():
+    """Get the currently running or paused timer"""
+    entry = get_active_timer(datetime.utcnow())
+    db.session.commit()
+    return jsonify({'active': timer_to_dict(entry) if entry else None})
+
+@bp.route('/api/timer/start', methods=['POST'])
+def start_timer():
+    """Start a timer, stopping any timer that is already active"""
+    data = request.json or {}
+    now = datetime.utcnow()
+    
+    stopped = get_active_timer(now)
+    if stopped:
+        stop_timer(stopped, now)
+    
+    entry = TimeEntry(
+        task_id=data.get('task_id'),
+        start_time=now,
+        entry_type='timer',
+        last_heartbeat=now,
+        paused_seconds=0,
+        credited_time=0
+    )
+    db.session.add(entry)
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request started a timer concurrently
+        db.session.rollback()
+        return jsonify({'error': 'A timer is already running'}), 409
+    
+    return jsonify({
+        'active': timer_to_dict(entry),
+        'stopped': stopped.to_dict() if stopped else None
+    }), 201
+
+@bp.route('/api/timer/pause', methods=['POST'])
+def pause_timer():
+    """Pause the active timer"""
+    now = datetime.utcnow()
+    entry = get_active_timer(now)
+    if not entry:
+        db.session.commit()
+        return jsonify({'error': 'No active timer'}), 404
+    
+    if entry.paused_at is None:
+        credit_timer(entry, now)
+        entry.paused_at = now
+    
+    db.session.commit()
+    return jsonify({'active': timer_to_dict(entry)})
+
+@bp.route('/api/timer/resume', methods=['POST'])
+def resume_timer():
+    """Resume a paused timer"""
+    now = datetime.utcnow()
+    entry = get_active_timer(now)
+    if not entry:
+        db.session.commit()
+        return jsonify({'error': 'No active timer'}), 404
+    
+    if entry.paused_at is not None:
+        entry.paused_seconds = (entry.paused_seconds or 0) + int((now - entry.paused_at).total_seconds())
+        entry.paused_at = None
+        entry.last_heartbeat = now
+    
+    db.session.commit()
+    return jsonify({'active': timer_to_dict(entry)})
+
+@bp.route('/api/timer/stop', methods=['POST'])
+def stop_active_timer():
+    """Stop the active timer and record the time entry"""
+    now = datetime.utcnow()
+    entry = get_active_timer(now)
+    if not entry:
+        db.session.commit()
+        return jsonify({'error': 'No active timer'}), 404
+    
+    stop_timer(entry, now)
+    record_activity('time_logged', occurred_at=entry.start_time, subject_id=entry.task_id)
+    db.session.commit()
+    return jsonify({'entry': entry.to_dict()})
+
+@bp.route('/api/timer/heartbeat', methods=['POST'])
+def timer_heartbeat():
+    """Keep the active timer alive and credit elapsed time to its task"""
+    now = datetime.utcnow()
+    entry = get_active_timer(now)
+    if not entry:
+        # Either nothing was running or the timer was closed for being idle
+        db.session.commit()
+        return jsonify({'active': None})
+    
+    if entry.paused_at is None:
+        entry.last_heartbeat = now
+        credit_timer(entry, now)
+    
+    db.session.commit()
+    return jsonify({'active': timer_to_dict(entry)})
+
 # ============================================================================
 # API ROUTES - AI Features
 # ============================================================================
 
-@app.route('/api/ai/suggest-task', methods=['GET'])
+@bp.route('/api/ai/suggest-task', methods=['GET'])
+@cached('tasks', 'task_dependencies', max_age=60)
 def suggest_task():
     """Get AI suggestion for next task"""
-    tasks = Task.query.filter_by(status='pending').all()
-    tasks_dict = [task.to_dict() for task in tasks]
+    tasks = load_tasks(Task.status == 'pending')
     
-    suggestion = ai_engine.suggest_next_task(tasks_dict)
+    suggestion = ai_engine.suggest_next_task(tasks, graph=get_task_graph())
+    if not suggestion:
+        return jsonify({'message': 'No tasks to suggest'})
     
-    return jsonify(suggestion if suggestion else {'message': 'No tasks to suggest'})
+    suggestion['task'] = task_dicts([suggestion['task']])[0]
+    return jsonify(suggestion)
 
-@app.route('/api/ai/productivity-analysis', methods=['GET'])
+@bp.route('/api/ai/productivity-analysis', methods=['GET'])
+@cached('tasks', 'time_entries', max_age=60)
+@throttle.expensive('tasks', 'time_entries')
 def productivity_analysis():
     """Get productivity analysis"""
     days = int(request.args.get('days', 7))
     
     # Get data for analysis
     cutoff_date = datetime.utcnow() - timedelta(days=days)
-    tasks = Task.query.filter(Task.created_at >= cutoff_date).all()
-    time_entries = TimeEntry.query.filter(TimeEntry.start_time >= cutoff_date).all()
-    
-    tasks_dict = [task.to_dict() for task in tasks]
-    entries_dict = [entry.to_dict() for entry in time_entries]
+    # Long windows stream through server-side cursors into compact records
+    history = reaches_archive(cutoff_date)  # Windows past the archive cutoff read the archive too
+    tasks = load_tasks(Task.created_at >= cutoff_date, history=history)
+    time_entries = load_time_entries(TimeEntry.start_time >= cutoff_date, history=history)
     
-    analysis = ai_engine.analyze_productivity(tasks_dict, entries_dict, days)
+    analysis = ai_engine.analyze_productivity(tasks, time_entries, days, estimator=duration_estimator.fitted())
     
     return jsonify(analysis)
 
-@app.route('/api/ai/suggest-time-blocks', methods=['GET'])
+@bp.route('/api/ai/suggest-time-blocks', methods=['GET'])
+@cached('tasks', 'events', max_age=60)
+@throttle.expensive('tasks', 'events')
 def suggest_time_blocks():
     """Get AI-suggested time blocks for tasks"""
     date_str = request.args.get('date', datetime.now().isoformat())
     date = datetime.fromisoformat(date_str)
     
-    tasks = Task.query.filter_by(status='pending').all()
-    events = Event.query.filter(
+    tasks = load_tasks(Task.status == 'pending')
+    events = load_events(
         Event.start_time >= date,
         Event.start_time < date + timedelta(days=1)
-    ).all()
-    
-    tasks_dict = [task.to_dict() for task in tasks]
-    events_dict = [event.to_dict() for event in events]
+    )
     
-    suggestions = ai_engine.suggest_time_blocks(tasks_dict, events_dict, date)
+    suggestions = ai_engine.suggest_time_blocks(tasks, events, date, estimator=duration_estimator.fitted())
+    for suggestion, task in zip(suggestions, task_dicts([s['task'] for s in suggestions])):
+        suggestion['task'] = task
     
     return jsonify(suggestions)
 
+# ============================================================================
+# API ROUTES - Long-range Analytics
+# ============================================================================
+
+@bp.route('/api/analytics/heatmap', methods=['GET'])
+@cached('time_entries', 'analytics_grids', max_age=60)
+def get_heatmap():
+    """Minutes logged per day: ?year=, or ?start=&end= dates (default: the last 365 days)"""
+    today = local_today()
+    try:
+        if request.args.get('year'):
+            year = int(request.args['year'])
+            start, end = date(year, 1, 1), date(year, 12, 31)
+        else:
+            end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+            start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Invalid year or date'}), 400
+    
+    error = check_analytics_range(start.year, end.year)
+    if error or start > end:
+        return jsonify({'error': error or 'start is after end'}), 400
+    return jsonify(analytics_grids.heatmap(start, end))
+
+@bp.route('/api/analytics/focus-grid', methods=['GET'])
+@cached('time_entries', 'analytics_grids', max_age=60)
+def get_focus_grid():
+    """Minutes logged per weekday and hour over ?start_year= to ?end_year= (default: this year)"""
+    this_year = local_today().year
+    try:
+        end_year = int(request.args.get('end_year', this_year))
+        start_year = int(request.args.get('start_year', end_year))
+    except ValueError:
+        return jsonify({'error': 'Invalid year'}), 400
+    
+    error = check_analytics_range(start_year, end_year)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(analytics_grids.focus_grid(start_year, end_year))
+
+@bp.route('/api/analytics/tag-trends', methods=['GET'])
+@cached('time_entries', 'analytics_grids', max_age=60)
+def get_tag_trends():
+    """Minutes per tag per ?bucket=week|month; ?tags=a,b or the busiest tags, ?start=&end= (default: a year)"""
+    bucket = request.args.get('bucket', 'month')
+    if bucket not in ('week', 'month'):
+        return jsonify({'error': 'bucket must be week or month'}), 400
+    tags = [tag.strip() for tag in request.args['tags'].split(',') if tag.strip()] if request.args.get('tags') else None
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else local_today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    error = check_analytics_range(start.year, end.year)
+    if error or start > end:
+        return jsonify({'error': error or 'start is after end'}), 400
+    return jsonify(analytics_grids.tag_trends(start, end, tags, bucket))
+
+# ============================================================================
+# API ROUTES - Offline Sync
+# ============================================================================
+
+@bp.route('/api/sync/batch', methods=['POST'])
+def sync_batch():
+    """
+    Replay writes the browser queued while the server was unreachable
+    Operations run in order through the regular routes. Each carries a
+    client-generated id, so a resent batch returns the recorded results
+    instead of applying anything twice, and "$op:<id>" stands for the id
+    of the row an earlier operation created.
+    """
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        return jsonify({'error': 'operations must be a list of objects'}), 400
+    if len(operations) > Config.SYNC_MAX_BATCH:
+        return jsonify({'error': f'At most {Config.SYNC_MAX_BATCH} operations per batch'}), 413
+    
+    # Results already recorded for this batch and the operations it refers to, in one query
+    ids = {str(op['id']) for op in operations if op.get('id')}
+    ids.update(OP_REFERENCE.findall(json.dumps(operations)))
+    # A record without a status is from a view that failed after committing: not applied, replay it
+    SyncOperation.query.filter(SyncOperation.id.in_(ids), SyncOperation.status_code.is_(None)).delete(synchronize_session=False)
+    db.session.commit()
+    replayed = {record.id: record.to_dict() for record in SyncOperation.query.filter(SyncOperation.id.in_(ids))}
+    
+    results = []
+    for operation in operations:
+        result = replay_operation(operation, replayed)
+        results.append(result)
+        if result['status'] >= 500:
+            break  # Leave the rest queued, in order, for the next attempt
+    
+    return jsonify({'results': results})
+
+# ============================================================================
+# API ROUTES - Archive
+# ============================================================================
+
+@bp.route('/api/archive', methods=['GET'])
+def get_archive_stats():
+    """Archive policy and how many rows are live and archived"""
+    return jsonify(archive_stats())
+
+@bp.route('/api/archive/run', methods=['POST'])
+def run_archiver():
+    """Queue an archive pass now instead of waiting for the nightly one"""
+    job = job_queue.enqueue('archive_history')
+    db.session.commit()
+    return jsonify(job.to_dict()), 202
+
+# ============================================================================
+# API ROUTES - Response Cache
+# ============================================================================
+
+@bp.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit rates and memory usage"""
+    return jsonify(response_cache.stats())
+
+# ============================================================================
+# API ROUTES - Background Jobs
+# ============================================================================
+
+@bp.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """Get recent background jobs"""
+    status = request.args.get('status')
+    name = request.args.get('name')
+    limit = min(int(request.args.get('limit', 50)), 500)
+    
+    query = Job.query
+    
+    if status:
+        query = query.filter_by(status=status)
+    if name:
+        query = query.filter_by(name=name)
+    
+    jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+@bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of a background job"""
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
 # ============================================================================
 # API ROUTES - User Stats & Gamification
 # ============================================================================
 
-@app.route('/api/stats', methods=['GET'])
+@bp.route('/api/stats', methods=['GET'])
+@cached('user_stats')
 def get_stats():
     """Get user statistics"""
     stats = UserStats.query.first()
@@ -457,7 +1009,30 @@ def get_stats():
     
     return jsonify(stats_dict)
 
-@app.route('/api/stats/chart', methods=['GET'])
+@bp.route('/api/stats/recompute', methods=['POST'])
+def recompute_stats():
+    """Rebuild stats, streaks and badges from the activity log"""
+    stats = recompute_all()
+    db.session.commit()
+    return jsonify(stats.to_dict())
+
+@bp.route('/api/activity', methods=['GET'])
+@cached('activity_events')
+def get_activity():
+    """Get activity events, newest first"""
+    limit = request.args.get('limit', 100, type=int)
+    query = ActivityEvent.query
+    
+    event_type = request.args.get('type')
+    if event_type:
+        query = query.filter(ActivityEvent.event_type == event_type)
+    
+    events = query.order_by(ActivityEvent.occurred_at.desc()).limit(limit).all()
+    return jsonify([event.to_dict() for event in events])
+
+@bp.route('/api/stats/chart', methods=['GET'])
+@cached('tasks', 'tasks_archive', max_age=600)
+@throttle.expensive('tasks')
 def get_stats_chart():
     """Generate productivity chart"""
     chart_type = request.args.get('type', 'weekly')  # weekly, monthly
@@ -467,12 +1042,21 @@ def get_stats_chart():
     else:
         days = 30
     
+    return Response(render_stats_chart(days), mimetype='image/png')
+
+# ============================================================================
+# Helper Functions
+# ============================================================================
+
+def render_stats_chart(days):
+    """Render the completed-tasks chart for the last `days` days as PNG bytes"""
     # Get completed tasks per day
     cutoff_date = datetime.utcnow() - timedelta(days=days)
-    tasks = Task.query.filter(
-        Task.completed_at >= cutoff_date,
-        Task.status == 'completed'
-    ).all()
+    models = (Task, ArchivedTask) if reaches_archive(cutoff_date) else (Task,)
+    completions = chain.from_iterable(db.session.query(model.completed_at).filter(
+        model.completed_at >= cutoff_date,
+        model.status == 'completed'
+    ).yield_per(Config.DB_STREAM_BATCH_SIZE) for model in models)
     
     # Group by date
     daily_counts = {}
@@ -480,8 +1064,8 @@ def get_stats_chart():
         date = (datetime.utcnow() - timedelta(days=i)).date()
         daily_counts[date] = 0
     
-    for task in tasks:
-        date = task.completed_at.date()
+    for (completed_at,) in completions:
+        date = completed_at.date()
         if date in daily_counts:
             daily_counts[date] += 1
     
@@ -489,74 +1073,340 @@ def get_stats_chart():
     dates = sorted(daily_counts.keys())
     counts = [daily_counts[d] for d in dates]
     
-    plt.figure(figsize=(10, 6))
-    plt.style.use('dark_background')
-    plt.plot(dates, counts, color='#00ffff', linewidth=2, marker='o')
-    plt.fill_between(dates, counts, alpha=0.3, color='#00ffff')
-    plt.xlabel('Date', color='#00ffff')
-    plt.ylabel('Tasks Completed', color='#00ffff')
-    plt.title(f'Productivity - Last {days} Days', color='#00ffff', fontsize=16)
-    plt.grid(True, alpha=0.2)
-    plt.tight_layout()
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-GUI backend
+    import matplotlib.pyplot as plt
+    
+    with chart_lock:
+        plt.figure(figsize=(10, 6))
+        plt.style.use('dark_background')
+        plt.plot(dates, counts, color='#00ffff', linewidth=2, marker='o')
+        plt.fill_between(dates, counts, alpha=0.3, color='#00ffff')
+        plt.xlabel('Date', color='#00ffff')
+        plt.ylabel('Tasks Completed', color='#00ffff')
+        plt.title(f'Productivity - Last {days} Days', color='#00ffff', fontsize=16)
+        plt.grid(True, alpha=0.2)
+        plt.tight_layout()
+        
+        # Save to bytes
+        img = BytesIO()
+        plt.savefig(img, format='png', facecolor='#0a0a0a')
+        plt.close()
+    
+    return img.getvalue()
+
+def get_active_timer(now):
+    """Return the open timer entry, closing it first if it went idle"""
+    entry = TimeEntry.query.filter(
+        TimeEntry.entry_type == 'timer',
+        TimeEntry.end_time.is_(None)
+    ).first()
+    
+    if entry and entry.paused_at is None:
+        idle_cutoff = timedelta(minutes=Config.TIMER_IDLE_CUTOFF)
+        last_seen = entry.last_heartbeat or entry.start_time
+        if now - last_seen > idle_cutoff:
+            # Nobody was there - drop the idle tail and end at the last heartbeat
+            stop_timer(entry, last_seen)
+            return None
+    
+    return entry
+
+def credit_timer(entry, until):
+    """Add the time accrued since the last credit to the task (caller commits)"""
+    end = min(until, entry.paused_at) if entry.paused_at else until
+    seconds = (end - entry.start_time).total_seconds() - (entry.paused_seconds or 0)
+    elapsed = max(0, int(seconds // 60))
+    delta = elapsed - (entry.credited_time or 0)
+    
+    if delta > 0 and entry.task_id:
+        task = Task.query.get(entry.task_id)
+        if task:
+            task.actual_time = (task.actual_time or 0) + delta
     
-    # Save to bytes
-    img = BytesIO()
-    plt.savefig(img, format='png', facecolor='#0a0a0a')
-    img.seek(0)
-    plt.close()
+    entry.credited_time = max(elapsed, entry.credited_time or 0)
+    entry.duration = entry.credited_time
+
+def stop_timer(entry, end_time):
+    """Close a timer entry at end_time (caller commits)"""
+    if entry.paused_at:
+        end_time = entry.paused_at  # Time spent paused does not count
+    
+    credit_timer(entry, end_time)
+    entry.end_time = max(end_time, entry.start_time)
+    entry.paused_at = None
+
+def timer_to_dict(entry):
+    """Serialize an open timer with its live elapsed time"""
+    data = entry.to_dict()
+    now = entry.paused_at or datetime.utcnow()
+    elapsed = (now - entry.start_time).total_seconds() - (entry.paused_seconds or 0)
+    data['elapsed_seconds'] = max(0, int(elapsed))
+    data['idle_cutoff'] = Config.TIMER_IDLE_CUTOFF
+    return data
+
+def recover_dangling_timers():
+    """Close timers left open by a previous process that died mid-session"""
+    open_timers = TimeEntry.query.filter(
+        TimeEntry.entry_type == 'timer',
+        TimeEntry.end_time.is_(None)
+    ).order_by(TimeEntry.start_time.desc()).all()
+    
+    now = datetime.utcnow()
+    for i, entry in enumerate(open_timers):
+        if i > 0:
+            # Only the newest timer may stay open
+            stop_timer(entry, entry.last_heartbeat or entry.start_time)
+        else:
+            get_active_timer(now)
     
-    return send_file(img, mimetype='image/png')
+    db.session.commit()
+
+def local_today():
+    return datetime.now(ZoneInfo(Config.TIMEZONE)).date()
+
+def parse_timestamp(value):
+    """An ISO 8601 timestamp from a client as naive UTC (raises ValueError)"""
+    return naive_utc(datetime.fromisoformat(value))
+
+def check_analytics_range(start_year, end_year):
+    """Error message for a year range the analytics API will not serve, else None"""
+    if start_year > end_year:
+        return 'start is after end'
+    if end_year - start_year + 1 > Config.ANALYTICS_MAX_YEARS:
+        return f'At most {Config.ANALYTICS_MAX_YEARS} years per request'
+    if start_year < 1970 or end_year > 9998:
+        return 'Year out of range'
+    return None
+
+def replay_operation(operation, replayed):
+    """Apply one outbox operation through its route, or return the result recorded the first time"""
+    op_id = str(operation.get('id') or '')
+    if not op_id or len(op_id) > 64:
+        return {'id': op_id, 'status': 400, 'body': {'error': 'Operation id required'}}
+    if op_id in replayed:
+        return replayed[op_id]
+    
+    method = str(operation.get('method', '')).upper()
+    try:
+        path = OP_REFERENCE.sub(lambda match: str(created_id(match.group(1), replayed)), str(operation.get('path', '')))
+        body = resolve_references(operation.get('body'), replayed)
+    except LookupError as error:
+        return {'id': op_id, 'status': 409, 'body': {'error': f'Operation {error} created nothing to refer to'}}
+    if method not in SYNC_METHODS or not path.startswith('/api/') or path.startswith('/api/sync/'):
+        return {'id': op_id, 'status': 400, 'body': {'error': 'Only POST, PUT and DELETE on /api/ routes can be replayed'}}
+    
+    record = SyncOperation(id=op_id, method=method, path=path[:255])
+    db.session.add(record)  # Committed by the view together with its own write
+    try:
+        status, payload = dispatch_write(method, path, body)
+    except Exception:
+        db.session.rollback()
+        forget_operation(op_id)
+        current_app.logger.exception('Replaying %s %s failed', method, path)
+        return {'id': op_id, 'status': 500, 'body': {'error': 'Internal server error'}}
+    
+    result = {'id': op_id, 'status': status, 'body': payload}
+    if status >= 400:
+        # Drop whatever the view left uncommitted; a client error is final and is recorded alone
+        db.session.rollback()
+        if status >= 500:
+            forget_operation(op_id)
+            return result
+        db.session.add(record)
+    
+    record.status_code = status
+    record.response = json.dumps(payload)
+    db.session.commit()
+    replayed[op_id] = result
+    return result
+
+def forget_operation(op_id):
+    """Drop the record a failing view may already have committed, so a resend replays the operation"""
+    SyncOperation.query.filter_by(id=op_id, status_code=None).delete(synchronize_session=False)
+    db.session.commit()
+
+def dispatch_write(method, path, body):
+    """Call the view behind `method path` as a request would, returning (status, JSON body)"""
+    with current_app.test_request_context(path, method=method, json=body):
+        try:
+            if request.routing_exception:
+                raise request.routing_exception
+            view = current_app.view_functions[request.endpoint]
+            response = current_app.make_response(view(**request.view_args))
+        except HTTPException as error:
+            return error.code, {'error': error.description}
+        return response.status_code, response.get_json(silent=True)
+
+def resolve_references(value, replayed):
+    """Replace "$op:<id>" values in a request body with the ids those operations created"""
+    if isinstance(value, str) and OP_REFERENCE.fullmatch(value):
+        return created_id(value[len('$op:'):], replayed)
+    if isinstance(value, list):
+        return [resolve_references(item, replayed) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_references(item, replayed) for key, item in value.items()}
+    return value
+
+def created_id(op_id, replayed):
+    """Id of the row a replayed operation created"""
+    body = replayed[op_id]['body'] if op_id in replayed else None
+    if not isinstance(body, dict) or 'id' not in body:
+        raise LookupError(op_id)
+    return body['id']
 
 # ============================================================================
-# Helper Functions
+# Background Jobs
 # ============================================================================
 
-def update_user_stats(action):
-    """Update user statistics based on action"""
-    stats = UserStats.query.first()
-    if not stats:
-        stats = UserStats()
-        db.session.add(stats)
-    
-    if action == 'task_completed':
-        stats.tasks_completed += 1
-        stats.total_points += Config.POINTS_PER_TASK
-    elif action == 'pomodoro_completed':
-        stats.pomodoros_completed += 1
-        stats.total_points += Config.POINTS_PER_POMODORO
-    elif action == 'note_created':
-        stats.notes_created += 1
-        stats.total_points += Config.POINTS_PER_NOTE
-    
-    # Update level
-    stats.level = ai_engine.calculate_level(stats.total_points)
-    
-    # Update streak
-    today = datetime.utcnow().date()
-    last_activity = stats.last_activity.date() if stats.last_activity else None
-    
-    if last_activity == today:
-        pass  # Same day, no change
-    elif last_activity == today - timedelta(days=1):
-        stats.current_streak += 1  # Consecutive day
-        if stats.current_streak > stats.longest_streak:
-            stats.longest_streak = stats.current_streak
-    else:
-        stats.current_streak = 1  # Streak broken
-    
-    stats.last_activity = datetime.utcnow()
-    
-    # Update badges
-    badges = ai_engine.check_badges(stats.to_dict())
-    stats.badges = json.dumps([b['id'] for b in badges])
-    
+@job_queue.task('auto_tag_note')
+def auto_tag_note(note_id):
+    """Merge extracted keywords into a note's tags"""
+    note = db.session.get(Note, note_id)
+    if not note:
+        return None
+    content = note.content
+    db.session.commit()  # Hold no transaction open while keywords are extracted
+    
+    keywords = ai_engine.extract_keywords(content, timeout=Config.LLM_BACKGROUND_TIMEOUT)
+    stored = store_keywords({note_id: (content, keywords)})
+    return {'tags': stored.get(note_id)}
+
+def merge_tags(raw_tags, keywords):
+    """A note's tags plus its top three keywords"""
+    existing_tags = json.loads(raw_tags) if raw_tags else []
+    return list(set(existing_tags + keywords[:3]))  # Merge and deduplicate
+
+def store_keywords(extracted, summaries=None):
+    """
+    Merge keywords into notes' tags as they are now, not as they were read
+    `extracted` maps note id -> (content the keywords came from, keywords).
+    Tags edited while keywords were extracted are kept; a note whose content
+    changed meanwhile is skipped, since its edit queued a fresh job. A
+    machine retag leaves updated_at alone. Returns note id -> tags stored.
+    """
+    notes = Note.__table__
+    current = db.session.execute(select(notes.c.id, notes.c.content, notes.c.tags).where(
+        notes.c.id.in_(list(extracted))).with_for_update())
+    rows = [{'note_id': note_id, 'merged_tags': merge_tags(tags, extracted[note_id][1])}
+            for note_id, content, tags in current if content == extracted[note_id][0]]
+    
+    if rows:
+        values = {'tags': bindparam('new_tags'), 'updated_at': notes.c.updated_at}
+        if summaries is not None:
+            values['summary'] = bindparam('new_summary')
+        params = [{'note_id': row['note_id'], 'new_tags': json.dumps(row['merged_tags']),
+                   'new_summary': (summaries or {}).get(row['note_id'])} for row in rows]
+        # Core UPDATE skips the flush, so bump the cache version here
+        db.session.execute(update(notes).where(notes.c.id == bindparam('note_id')).values(values), params)
+        bump_version('notes')
+    db.session.commit()
+    return {row['note_id']: row['merged_tags'] for row in rows}
+
+@job_queue.task('retag_notes')
+def retag_notes(summaries=False):
+    """Re-extract keywords for every note, a batch at a time on the CPU pool"""
+    last_id, retagged = 0, 0
+    while True:
+        query = db.session.query(Note.id, Note.content).filter(Note.id > last_id)
+        rows = query.order_by(Note.id).limit(cpu_pool.batch_size).all()
+        db.session.commit()  # Hold no transaction open while the pool works
+        if not rows:
+            break
+        
+        contents = [content for _, content in rows]
+        keywords = ai_engine.extract_keywords_many(contents, timeout=Config.LLM_BACKGROUND_TIMEOUT)
+        summarized = None
+        if summaries:
+            summarized = dict(zip((note_id for note_id, _ in rows),
+                                  ai_engine.summarize_notes(contents, timeout=Config.LLM_BACKGROUND_TIMEOUT)))
+        
+        retagged += len(store_keywords({note_id: (content, found) for (note_id, content), found in zip(rows, keywords)},
+                                       summarized))
+        last_id = rows[-1].id
+    return {'notes': retagged}
+
+@job_queue.task('summarize_note')
+def summarize_note(note_id):
+    """Store a summary of a note"""
+    note = db.session.get(Note, note_id)
+    if not note:
+        return None
+    
+    note.summary = ai_engine.summarize_note(note.content, timeout=Config.LLM_BACKGROUND_TIMEOUT)
+    db.session.commit()
+    return {'summary': note.summary}
+
+@job_queue.task('reset_streaks')
+def reset_streaks():
+    """Break the streak if there was no activity yesterday (local time)"""
+    stats = get_user_stats()
+    refresh_streak(stats)
     db.session.commit()
+    return {'current_streak': stats.current_streak}
+
+@job_queue.task('refit_estimator')
+def refit_estimator():
+    """Refit the duration estimator from scratch (picks up edits to finished tasks)"""
+    duration_estimator.refit()
+    return {'samples': duration_estimator.samples}
+
+@job_queue.task('import_calendar_url')
+def import_calendar_url(url):
+    """Stream a remote .ics file into the events table"""
+    # Checked again here: DNS may have changed since the request was accepted
+    with open_calendar_url(url, Config.ICAL_FETCH_TIMEOUT) as remote:
+        return import_calendar(remote)
+
+@job_queue.task('prune_jobs')
+def prune_jobs():
+    """Delete completed and failed jobs finished more than JOB_RETENTION_DAYS ago"""
+    cutoff = datetime.utcnow() - timedelta(days=Config.JOB_RETENTION_DAYS)
+    deleted = Job.query.filter(
+        Job.status.in_(('completed', 'failed')),
+        Job.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted': deleted}
+
+@job_queue.task('prune_sync_operations')
+def prune_sync_operations():
+    """Forget replayed outbox operations older than SYNC_RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=Config.SYNC_RETENTION_DAYS)
+    deleted = SyncOperation.query.filter(SyncOperation.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted': deleted}
+
+@job_queue.task('archive_history')
+def archive_old_history():
+    """Move completed tasks and time entries past ARCHIVE_AFTER_DAYS into the archive tables"""
+    if not Config.ARCHIVE_ENABLED:
+        return {'skipped': True}
+    return archive_history()
+
+@job_queue.task('rebuild_analytics_grids')
+def rebuild_analytics_grids():
+    """Recompute the analytics grids (picks up tag edits and bulk-written entries)"""
+    return analytics_grids.rebuild()
+
+# Midnight maintenance in the configured time zone
+job_queue.schedule('reset_streaks', hour=0, minute=0)
+job_queue.schedule('prune_jobs', hour=0, minute=1)
+job_queue.schedule('refit_estimator', hour=0, minute=2)
+job_queue.schedule('prune_sync_operations', hour=0, minute=3)
+job_queue.schedule('archive_history', hour=0, minute=4)
+job_queue.schedule('rebuild_analytics_grids', hour=0, minute=5)
 
 # ============================================================================
 # Run Application
 # ============================================================================
 
+app = create_app()
+
 if __name__ == '__main__':
+    with app.app_context():
+        init_db()
+    
     print("🚀 NEXUS AI - Personal Productivity Command Center")
     print("=" * 60)
     print("📍 Running on: http://localhost:5000")
@@ -0,0 +1,119 @@
+"""
+Archive tier for completed tasks and old time entries
+
+Completed tasks and finished time entries older than ARCHIVE_AFTER_DAYS
+are moved, in batches and under their original ids, from `tasks` and
+`time_entries` into `tasks_archive` and `time_entries_archive`. Everyday
+queries only ever see the hot tables, so they stay the same size however
+much history piles up. Reads that ask for history (long analysis
+windows, ?include_archived=1) add the archive rows themselves; criteria
+written against the hot model are rewritten for its archive table with
+on_archive().
+
+A task is archived only once nothing live points at it: no subtasks, no
+time entries and no events still in the hot tables. Its time entries
+reach the cutoff no later than it does, so they leave first and the task
+follows in the same run.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, delete, exists, insert, literal, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.visitors import replacement_traverse
+
+from config import Config
+from models import db, Task, TaskDependency, Event, TimeEntry, ArchivedTask, ArchivedTimeEntry
+from response_cache import bump_version
+
+ARCHIVES = {Task: ArchivedTask, TimeEntry: ArchivedTimeEntry}
+
+
+def archive_cutoff(now=None):
+    """Rows that finished before this belong to the archive"""
+    return (now or datetime.utcnow()) - timedelta(days=Config.ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(since):
+    """Whether a query for rows since `since` needs the archive as well"""
+    return since is None or since < archive_cutoff()
+
+
+def on_archive(criterion, model):
+    """`criterion` on `model`'s columns, rewritten for its archive table"""
+    hot, archive = model.__table__, ARCHIVES[model].__table__
+
+    def replace(element):
+        if isinstance(element, Column) and element.table is hot:
+            return archive.c[element.name]
+        return None
+
+    return replacement_traverse(criterion, {}, replace)
+
+
+def task_policy(cutoff):
+    subtask = aliased(Task)
+    return (
+        Task.status == 'completed',
+        Task.completed_at < cutoff,
+        ~exists().where(subtask.parent_id == Task.id),
+        ~exists().where(TimeEntry.task_id == Task.id),
+        ~exists().where(Event.task_id == Task.id),
+    )
+
+
+def time_entry_policy(cutoff):
+    return (
+        TimeEntry.end_time.isnot(None),
+        TimeEntry.end_time < cutoff,
+    )
+
+
+def move_batch(model, criteria, batch_size, now):
+    """Copy up to batch_size matching rows into the archive and delete them, in one transaction"""
+    # Ids are never reused (AUTOINCREMENT on SQLite, sequences on PostgreSQL), so any row can go
+    ids = [row_id for (row_id,) in db.session.query(model.id).filter(
+        *criteria).order_by(model.id).limit(batch_size)]
+    if not ids:
+        return 0
+
+    hot, archive = model.__table__, ARCHIVES[model].__table__
+    names = [column.name for column in archive.columns if column.name != 'archived_at']
+    rows = select(*(hot.c[name] for name in names), literal(now, archive.c.archived_at.type)).where(model.id.in_(ids))
+    db.session.execute(insert(archive).from_select(names + ['archived_at'], rows))
+    if model is Task:
+        # Finished tasks block nothing any more
+        db.session.execute(delete(TaskDependency.__table__).where(
+            TaskDependency.blocker_id.in_(ids) | TaskDependency.blocked_id.in_(ids)))
+    db.session.execute(delete(hot).where(model.id.in_(ids)))
+    bump_version(hot.name, archive.name, 'task_dependencies')
+    db.session.commit()
+    return len(ids)
+
+
+def archive_history(now=None, batch_size=None):
+    """Move everything past the policy into the archive; returns rows moved per table"""
+    now = now or datetime.utcnow()
+    cutoff = archive_cutoff(now)
+    batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+    moved = {}
+    # Time entries first, so the tasks they point at become eligible in this run
+    for model, criteria in ((TimeEntry, time_entry_policy(cutoff)), (Task, task_policy(cutoff))):
+        moved[model.__tablename__] = 0
+        while True:
+            count = move_batch(model, criteria, batch_size, now)
+            moved[model.__tablename__] += count
+            if count < batch_size:
+                break
+    return moved
+
+
+def archive_stats():
+    return {
+        'enabled': Config.ARCHIVE_ENABLED,
+        'after_days': Config.ARCHIVE_AFTER_DAYS,
+        'cutoff': archive_cutoff().isoformat(),
+        'tasks': db.session.query(Task.id).count(),
+        'tasks_archived': db.session.query(ArchivedTask.id).count(),
+        'time_entries': db.session.query(TimeEntry.id).count(),
+        'time_entries_archived': db.session.query(ArchivedTimeEntry.id).count(),
+    }
@@ -0,0 +1,64 @@
+"""
+Micro-benchmarks for AIEngine on synthetic workspaces of increasing size
+
+    python benchmarks/ai_engine_bench.py --sizes 100 1000 10000 --json bench_results.json
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_workspace
+
+from ai_engine import AIEngine
+from estimator import DurationEstimator
+
+
+def run(sizes, seed):
+    engine = AIEngine()
+    results = {}
+
+    for size in sizes:
+        workspace = generate_workspace(tasks=size, events=max(10, size // 10), notes=max(10, size // 10),
+                                       time_entries=size * 2, seed=seed)
+        now = workspace['now']
+        tasks, events, entries = workspace['tasks'], workspace['events'], workspace['time_entries']
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_events = [e for e in events if e['start'][:10] == day.date().isoformat()]
+        week_entries = [e for e in entries if e['start_time'] >= (now - timedelta(days=7)).isoformat()]
+
+        rng = random.Random(seed)
+        notes = [n['content'] for n in workspace['notes']]
+        history = [(t['estimated_time'], t['actual_time'], t['pomodoros_completed'], t['priority'], t['tags'])
+                   for t in tasks if t['status'] == 'completed']
+        estimator = DurationEstimator().fit(history)
+
+        cases = {
+            'suggest_next_task': lambda: engine.suggest_next_task(tasks, now),
+            'analyze_productivity': lambda: engine.analyze_productivity(tasks, entries, 365),
+            'analyze_productivity_week': lambda: engine.analyze_productivity(tasks, week_entries, 7),
+            'suggest_time_blocks': lambda: engine.suggest_time_blocks(tasks, day_events, day),
+            'suggest_time_blocks_learned': lambda: engine.suggest_time_blocks(tasks, day_events, day, estimator),
+            'fit_duration_estimator': lambda: DurationEstimator().fit(history),
+            'extract_keywords': lambda: engine.extract_keywords(rng.choice(notes)),
+            'summarize_note': lambda: engine.summarize_note(rng.choice(notes)),
+        }
+        for name, func in cases.items():
+            results[f"{name}[n={size}]"] = measure(func)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark AIEngine methods')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed)
+    print_table(results)
+    write_results(args.json, 'ai_engine', results, sizes=args.sizes, seed=args.seed)
+    if args.baseline:
+        compare(args.json, args.baseline, 'ai_engine')
@@ -0,0 +1,111 @@
+"""
+Long-range analytics from precomputed grids versus scanning time entries
+
+For workspaces holding 1 to N years of time entries, times the analytics
+routes (yearly heatmap, whole-range heatmap, weekday x hour grid, weekly
+tag trends) served from the stored grids, next to a scan that bins the
+same time entries on every request. Also reports how long a full
+rebuild takes and what the incremental grid update adds to a time entry
+write.
+
+    python benchmarks/analytics_grids_bench.py --years 1 5 10 --json bench_results.json
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_workspace, populate
+
+from config import Config
+from app import create_app, init_db
+from analytics_grids import analytics_grids, _update_flushed_entries
+from models import db, TimeEntry
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def scan_heatmap(start, end):
+    """What a heatmap costs without grids: read every entry in range and bin it"""
+    tz = ZoneInfo(Config.TIMEZONE)
+    minutes = [0] * ((end - start).days + 1)
+    rows = db.session.query(TimeEntry.start_time, TimeEntry.duration).filter(
+        TimeEntry.start_time >= datetime.combine(start, datetime.min.time()) - timedelta(days=1),
+        TimeEntry.duration > 0).yield_per(Config.DB_STREAM_BATCH_SIZE)
+    for start_time, duration in rows:
+        day = (start_time.replace(tzinfo=timezone.utc).astimezone(tz).date() - start).days
+        if 0 <= day < len(minutes):
+            minutes[day] += duration
+    return minutes
+
+
+def run(years_list, entries_per_year, seed):
+    results, rebuilds = {}, {}
+    for years in years_list:
+        workdir = tempfile.mkdtemp(prefix='nexus-grids-')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            BACKGROUND_SERVICES = False
+            RESPONSE_CACHE_ENABLED = False  # Time the grids, not the cache
+            THROTTLE_ENABLED = False
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        now = datetime.utcnow()
+        today = now.date()
+        start = date(today.year - years + 1, 1, 1)
+        routes = {
+            'heatmap_year': '/api/analytics/heatmap',
+            'heatmap_range': f"/api/analytics/heatmap?start={start}&end={today}",
+            'focus_grid': f"/api/analytics/focus-grid?start_year={start.year}&end_year={today.year}",
+            'tag_trends_weekly': f"/api/analytics/tag-trends?start={start}&end={today}&bucket=week",
+        }
+
+        with app.app_context():
+            init_db()
+            populate(generate_workspace(tasks=2000 * years, events=100, notes=10,
+                                        time_entries=entries_per_year * years, seed=seed, now=now,
+                                        history_days=365 * years))
+            rebuilt = measure(analytics_grids.rebuild, min_runs=3)
+            results[f"rebuild[years={years}]"] = rebuilt
+            rebuilds[years] = analytics_grids.rebuild()
+
+            for name, path in routes.items():
+                results[f"{name}[grids,years={years}]"] = measure(lambda: client.get(path).get_data())
+            results[f"heatmap_range[scan,years={years}]"] = measure(lambda: scan_heatmap(start, today), min_runs=3)
+
+            def write_entry():
+                ended = datetime.utcnow()
+                client.post('/api/time-entries', json={
+                    'task_id': 1, 'start_time': (ended - timedelta(minutes=30)).isoformat(),
+                    'end_time': ended.isoformat(), 'duration': 30,
+                }).get_data()
+
+            results[f"time_entry_write[grids,years={years}]"] = measure(write_entry, min_runs=20)
+            event.remove(Session, 'after_flush', _update_flushed_entries)
+            results[f"time_entry_write[no grids,years={years}]"] = measure(write_entry, min_runs=20)
+            event.listen(Session, 'after_flush', _update_flushed_entries)
+            db.engine.dispose()
+    return results, rebuilds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark analytics grids against scanning time entries')
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5, 10], help='history sizes to build')
+    parser.add_argument('--entries-per-year', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results, rebuilds = run(args.years, args.entries_per_year, args.seed)
+    print_table(results)
+    for years, rebuilt in rebuilds.items():
+        print(f"grids after {years} year(s): {rebuilt}")
+    write_results(args.json, 'analytics_grids', results, years=args.years,
+                  entries_per_year=args.entries_per_year, seed=args.seed, rebuilds=rebuilds)
+    if args.baseline:
+        compare(args.json, args.baseline, 'analytics_grids')
@@ -0,0 +1,101 @@
+"""
+Day-to-day query cost as history grows, with and without the archive tier
+
+Builds workspaces holding 1 to N years of history at a steady rate of
+new tasks and time entries (anything older than a few weeks is done),
+and times the everyday routes with all of it in the hot tables, then
+again after archive_history() has moved the old rows out. With the
+archive the hot routes should cost the same at every history size. Also
+times the archiver itself and a 365-day analysis that reads through to
+the archive.
+
+    python benchmarks/archive_bench.py --years 1 2 4 8 --json bench_results.json
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_workspace, populate
+
+from config import Config
+from app import create_app, init_db
+from archive import archive_history
+from models import db
+
+ROUTES = {
+    'tasks': '/api/tasks',
+    'time_entries': '/api/time-entries',
+    'suggest_task': '/api/ai/suggest-task',
+    'analysis_30d': '/api/ai/productivity-analysis?days=30',
+}
+HISTORY_ROUTES = {
+    'analysis_365d': '/api/ai/productivity-analysis?days=365',
+}
+
+
+def build_workspace(years, tasks_per_year, entries_per_year, seed):
+    now = datetime.utcnow()
+    workspace = generate_workspace(tasks=tasks_per_year * years, events=200, notes=50,
+                                   time_entries=entries_per_year * years, seed=seed, now=now,
+                                   history_days=365 * years)
+    # Old tasks are finished; only recent ones are still open
+    settled = now - timedelta(days=30)
+    for task in workspace['tasks']:
+        created = datetime.fromisoformat(task['created_at'])
+        if created < settled and task['status'] != 'completed':
+            task['status'] = 'completed'
+            task['completed_at'] = (created + timedelta(days=3)).isoformat()
+    return workspace
+
+
+def run(years_list, tasks_per_year, entries_per_year, seed):
+    results, archived = {}, {}
+    for years in years_list:
+        workdir = tempfile.mkdtemp(prefix='nexus-archive-')
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            BACKGROUND_SERVICES = False
+            RESPONSE_CACHE_ENABLED = False  # Time the queries, not the cache
+            THROTTLE_ENABLED = False
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+        with app.app_context():
+            init_db()
+            populate(build_workspace(years, tasks_per_year, entries_per_year, seed))
+
+            def timed_routes(tier):
+                for name, path in {**ROUTES, **HISTORY_ROUTES}.items():
+                    results[f"{name}[{tier},years={years}]"] = measure(lambda: client.get(path).get_data(), min_runs=3)
+
+            timed_routes('hot')
+            started = time.perf_counter()
+            archived[years] = archive_history()
+            archived[years]['seconds'] = round(time.perf_counter() - started, 2)
+            timed_routes('archived')
+            db.engine.dispose()
+    return results, archived
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark everyday routes as history grows, with and without archiving')
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 2, 4, 8], help='history sizes to build')
+    parser.add_argument('--tasks-per-year', type=int, default=2000)
+    parser.add_argument('--entries-per-year', type=int, default=8000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results, archived = run(args.years, args.tasks_per_year, args.entries_per_year, args.seed)
+    print_table(results)
+    for years, moved in archived.items():
+        print(f"archived after {years} year(s): {moved}")
+    write_results(args.json, 'archive', results, years=args.years, tasks_per_year=args.tasks_per_year,
+                  entries_per_year=args.entries_per_year, seed=args.seed, archived=archived)
+    if args.baseline:
+        compare(args.json, args.baseline, 'archive')
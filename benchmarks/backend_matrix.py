@@ -0,0 +1,145 @@
+"""
+Run the whole API against every storage backend and compare the results
+
+Each backend gets the same synthetic workspace and request sequence (see
+http_load.py). The run fails if any route errors or answers with
+different status codes on different backends. The backend-specific
+storage paths - text_search, json_array_contains, reset_sequences and
+the id migration with archiving - are also checked directly on each
+backend, and their outcome is printed and written with the results.
+
+    python benchmarks/backend_matrix.py --postgres postgresql://localhost/nexus_matrix
+
+The PostgreSQL database is a scratch database: its tables are dropped.
+Without --postgres (or $NEXUS_TEST_POSTGRES_URL) only SQLite runs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from common import print_table, write_results
+
+import http_load
+from config import Config
+from app import create_app, init_db
+from archive import archive_history
+from migrations import upgrade
+from models import db, Task, Note, SchemaMigration
+from storage import text_search, json_array_contains, reset_sequences
+
+
+def check_storage(url):
+    """Run each backend-specific storage path once; returns {check: 'ok' or the failure}"""
+    workdir = tempfile.mkdtemp(prefix='nexus-matrix-')
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url or f"sqlite:///{os.path.join(workdir, 'checks.db')}"
+        BACKGROUND_SERVICES = False
+
+    def search():
+        db.session.add_all([Note(title='Quarterly planning', content='Roadmap review with the team'),
+                            Note(title='Groceries', content='Milk, eggs and bread')])
+        db.session.commit()
+        found = [note.title for note in Note.query.filter(text_search((Note.title, Note.content), 'roadmap'))]
+        assert found == ['Quarterly planning'], found
+
+    def tags():
+        db.session.add_all([Task(title='Tagged', tags='["work", "deep"]'), Task(title='Other', tags='["home"]')])
+        db.session.commit()
+        found = [task.title for task in Task.query.filter(json_array_contains(Task.tags, 'work'))]
+        assert found == ['Tagged'], found
+
+    def sequences():
+        db.session.execute(Task.__table__.insert().values(id=1000, title='Explicit id', created_at=datetime.utcnow()))
+        reset_sequences(Task.__table__)
+        db.session.commit()
+        task = Task(title='Next')
+        db.session.add(task)
+        db.session.commit()
+        assert task.id == 1001, task.id
+
+    def archived_ids():
+        # Migration 9 again on the populated database, then archive the newest rows and delete the live one
+        SchemaMigration.query.filter_by(version=9).delete()
+        db.session.commit()
+        upgrade()
+        done = datetime.utcnow() - timedelta(days=Config.ARCHIVE_AFTER_DAYS + 30)
+        db.session.add_all([Task(title='Old', status='completed', completed_at=done) for _ in range(2)])
+        live = Task(title='Live')
+        db.session.add(live)
+        db.session.commit()
+        newest = live.id
+        archive_history()
+        db.session.delete(live)
+        db.session.commit()
+        task = Task(title='After archive')
+        db.session.add(task)
+        db.session.commit()
+        assert task.id > newest, (task.id, newest)
+
+    outcomes = {}
+    app = create_app(CheckConfig)
+    with app.app_context():
+        if url:
+            db.drop_all()  # A scratch database is reused between runs
+        init_db()
+        for name, check in (('text_search', search), ('json_array_contains', tags),
+                            ('reset_sequences', sequences), ('migration 9 + archive ids', archived_ids)):
+            try:
+                check()
+                outcomes[name] = 'ok'
+            except Exception as error:
+                db.session.rollback()
+                outcomes[name] = f"{type(error).__name__}: {error}"
+        db.session.remove()
+        db.engine.dispose()
+    return outcomes
+
+
+def run(backends, tasks, requests, seed):
+    results, statuses, checks = {}, {}, {}
+    for name, url in backends.items():
+        print(f"== {name}")
+        checks[name] = check_storage(url)
+        for check, outcome in checks[name].items():
+            print(f"  {check}: {outcome}")
+        args = SimpleNamespace(database=url, tasks=tasks, requests=requests, seed=seed, no_cache=False)
+        latencies, _, statuses[name] = http_load.run(args)
+        results.update({f"{label} [{name}]": stats for label, stats in latencies.items()})
+
+    mismatches = []
+    reference, *others = backends
+    for label, codes in statuses[reference].items():
+        for name in others:
+            if statuses[name].get(label) != codes:
+                mismatches.append(f"{label}: {reference} {codes} vs {name} {statuses[name].get(label)}")
+    for name, outcomes in checks.items():
+        mismatches.extend(f"{check} [{name}]: {outcome}" for check, outcome in outcomes.items() if outcome != 'ok')
+    return results, checks, mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the API against SQLite and PostgreSQL')
+    parser.add_argument('--postgres', default=os.environ.get('NEXUS_TEST_POSTGRES_URL'),
+                        help='SQLAlchemy URL of a scratch PostgreSQL database')
+    parser.add_argument('--tasks', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    args = parser.parse_args()
+
+    backends = {'sqlite': None}
+    if args.postgres:
+        backends['postgresql'] = args.postgres
+    else:
+        print("No PostgreSQL URL given, running SQLite only", file=sys.stderr)
+
+    results, checks, mismatches = run(backends, args.tasks, args.requests, args.seed)
+    print_table(results)
+    write_results(args.json, 'backend_matrix', results, backends=list(backends), tasks=args.tasks,
+                  requests=args.requests, seed=args.seed, checks=checks, mismatches=mismatches)
+    if mismatches:
+        sys.exit("Backends disagree or failed a check:\n  " + '\n  '.join(mismatches))
@@ -0,0 +1,98 @@
+"""
+Dashboard reload bursts against the expensive analytics routes
+
+Simulates a server with a fixed pool of worker threads: a burst of
+dashboard tabs (each a different client) requests the analytics routes
+at once, while cheap CRUD reads keep arriving. Runs once without and
+once with the throttle, and reports how many computations ran, how many
+requests were coalesced or shed, and the latency of the CRUD reads that
+were queued behind the burst.
+
+    python benchmarks/burst_bench.py --tabs 24 --workers 8 --json bench_results.json
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from common import summarize, print_table, write_results, compare
+from synthetic import generate_workspace, populate
+
+from config import Config
+from app import create_app, init_db
+from models import db
+from throttle import throttle
+
+HEAVY = ('/api/ai/productivity-analysis?days=365', '/api/ai/suggest-time-blocks', '/api/stats/chart?type=monthly')
+
+
+def run(tasks, tabs, workers, crud, seed):
+    workdir = tempfile.mkdtemp(prefix='nexus-burst-')
+    database = os.path.join(workdir, 'bench.db')
+    workspace = generate_workspace(tasks, tasks // 2, 100, tasks * 5, seed, now=datetime.utcnow())
+    results, outcomes = {}, {}
+
+    for enabled in (False, True):
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+            BACKGROUND_SERVICES = False
+            THROTTLE_ENABLED = enabled
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            init_db()
+            if not enabled:
+                populate(workspace)
+        throttle.computed = throttle.coalesced = throttle.rate_limited = throttle.shed = 0
+
+        def request(path, client, submitted):
+            # Latency counts from submission, so time spent waiting for a free worker is included
+            response = app.test_client().get(path, environ_base={'REMOTE_ADDR': client})
+            return response.status_code, (time.perf_counter() - submitted) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            heavy = [pool.submit(request, path, f"10.0.{tab}.1", time.perf_counter())
+                     for tab in range(tabs) for path in HEAVY]
+            reads = [pool.submit(request, f"/api/notes/{1 + i % 100}", '10.1.0.1', time.perf_counter())
+                     for i in range(crud)]
+            heavy = [f.result() for f in heavy]
+            reads = [f.result() for f in reads]
+        wall = (time.perf_counter() - started) * 1000
+
+        label = 'throttled' if enabled else 'unthrottled'
+        results[f"crud_read[{label}]"] = summarize([ms for _, ms in reads])
+        results[f"analytics[{label}]"] = summarize([ms for _, ms in heavy])
+        outcomes[label] = {
+            'wall_ms': round(wall, 1),
+            'statuses': dict(Counter(code for code, _ in heavy)),
+            **{k: v for k, v in throttle.stats().items() if k in ('computed', 'coalesced', 'rate_limited', 'shed')},
+        }
+        with app.app_context():
+            db.engine.dispose()
+
+    return results, outcomes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark analytics bursts with and without the throttle')
+    parser.add_argument('--tasks', type=int, default=5000, help='workspace size (other tables scale with it)')
+    parser.add_argument('--tabs', type=int, default=24, help='dashboard tabs reloading at once')
+    parser.add_argument('--workers', type=int, default=8, help='server worker threads')
+    parser.add_argument('--crud', type=int, default=50, help='cheap reads arriving during the burst')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results, outcomes = run(args.tasks, args.tabs, args.workers, args.crud, args.seed)
+    print_table(results)
+    for label, outcome in outcomes.items():
+        print(f"{label}: {outcome}")
+    write_results(args.json, 'burst', results, tasks=args.tasks, tabs=args.tabs, workers=args.workers,
+                  crud=args.crud, seed=args.seed, outcomes=outcomes)
+    if args.baseline:
+        compare(args.json, args.baseline, 'burst')
@@ -0,0 +1,93 @@
+"""Shared helpers for the NEXUS AI benchmark scripts"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def measure(func, min_time=0.2, min_runs=5, max_runs=1000):
+    """Call func repeatedly and return per-call latency stats in milliseconds"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Latency summary (ms) of a list of samples"""
+    ordered = sorted(samples)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {
+        'runs': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'min_ms': round(ordered[0], 4),
+        'p50_ms': round(pct(50), 4),
+        'p95_ms': round(pct(95), 4),
+        'p99_ms': round(pct(99), 4),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def write_results(path, benchmark, results, **meta):
+    """Write results as JSON, merging into an existing file from other benchmarks"""
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data.setdefault('meta', {}).update({
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.utcnow().isoformat(),
+    })
+    data[benchmark] = {'meta': meta, 'results': results}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"Results written to {path}")
+
+
+def compare(path, baseline_path, benchmark, threshold=0.2):
+    """Print results whose p50 regressed by more than `threshold` against a baseline file"""
+    with open(path) as f:
+        current = json.load(f).get(benchmark, {}).get('results', {})
+    with open(baseline_path) as f:
+        baseline = json.load(f).get(benchmark, {}).get('results', {})
+
+    regressions = []
+    for name, stats in sorted(current.items()):
+        before = baseline.get(name)
+        if before and before['p50_ms'] > 0:
+            change = stats['p50_ms'] / before['p50_ms'] - 1
+            if change > threshold:
+                regressions.append(name)
+                print(f"REGRESSION {name}: p50 {before['p50_ms']:.3f} -> {stats['p50_ms']:.3f} ms ({change:+.0%})")
+    if not regressions:
+        print(f"No {benchmark} regressions above {threshold:.0%}")
+    return regressions
+
+
+def print_table(results):
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'p50 ms':>10}  {'p95 ms':>10}  {'p99 ms':>10}  {'runs':>6}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['p50_ms']:>10.3f}  {stats['p95_ms']:>10.3f}  "
+              f"{stats['p99_ms']:>10.3f}  {stats['runs']:>6}")
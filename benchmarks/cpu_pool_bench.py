@@ -0,0 +1,116 @@
+"""
+Re-tagging notes on the CPU pool as workers are added
+
+Extracts keywords for N synthetic notes with AIEngine.extract_keywords_many
+inline and on 1, 2, 4 ... worker processes, and reports the speedup over
+inline. Pool start-up is timed separately; the batches run on a warm
+pool. With --end-to-end it also times the retag_notes job, which reads
+the notes from SQLite and writes their tags back, inline and with every
+core. Speedup can only be near-linear up to the number of physical cores
+the machine has.
+
+    python benchmarks/cpu_pool_bench.py --notes 100000 --json bench_results.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_notes, populate
+
+from config import Config
+from ai_engine import AIEngine, _keywords
+from cpu_pool import cpu_pool
+
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    counts = {0, cores}
+    workers = 1
+    while workers < cores:
+        counts.add(workers)
+        workers *= 2
+    return sorted(counts)
+
+
+def use_workers(workers, chunk_size):
+    """Point the shared pool at a new worker count and start it; returns start-up seconds"""
+    cpu_pool.shutdown()
+    cpu_pool.workers, cpu_pool.chunk_size = workers, chunk_size
+    started = time.perf_counter()
+    if workers:
+        cpu_pool.map(_keywords, ['warm up'] * max(cpu_pool.inline_threshold, chunk_size * workers))
+    return time.perf_counter() - started
+
+
+def run_engine(texts, workers_list, chunk_size):
+    results, startup = {}, {}
+    engine = AIEngine()
+    expected = None
+    for workers in workers_list:
+        startup[workers] = round(use_workers(workers, chunk_size), 3)
+        keywords = engine.extract_keywords_many(texts)
+        if expected is None:
+            expected = keywords
+        assert keywords == expected, 'pool results differ from inline'
+        results[f"extract_keywords_many[workers={workers}]"] = measure(
+            lambda: engine.extract_keywords_many(texts), min_time=0, min_runs=3)
+    return results, startup
+
+
+def run_end_to_end(notes, workers_list, chunk_size):
+    from app import create_app, init_db, retag_notes
+    from models import db
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='nexus-cpu-')
+    for workers in (workers_list[0], workers_list[-1]):
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            BACKGROUND_SERVICES = False
+            CPU_WORKERS = workers
+            CPU_CHUNK_SIZE = chunk_size
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            if not results:
+                init_db()
+                populate({'tasks': [], 'events': [], 'notes': notes, 'time_entries': []})
+            use_workers(workers, chunk_size)
+            results[f"retag_notes_job[workers={workers}]"] = measure(retag_notes, min_time=0, min_runs=1)
+            db.engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark note re-tagging on the CPU pool')
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers(), help='pool sizes (0 = inline)')
+    parser.add_argument('--chunk-size', type=int, default=Config.CPU_CHUNK_SIZE)
+    parser.add_argument('--end-to-end', action='store_true', help='also time the retag_notes job against SQLite')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    notes = generate_notes(args.notes, random.Random(args.seed), datetime.utcnow())
+    workers_list = sorted(set(args.workers))
+    results, startup = run_engine([note['content'] for note in notes], workers_list, args.chunk_size)
+    if args.end_to_end:
+        results.update(run_end_to_end(notes, workers_list, args.chunk_size))
+    cpu_pool.shutdown()
+
+    print_table(results)
+    inline = results[f"extract_keywords_many[workers={workers_list[0]}]"]['p50_ms']
+    for workers in workers_list:
+        p50 = results[f"extract_keywords_many[workers={workers}]"]['p50_ms']
+        print(f"workers={workers}: {inline / p50:.2f}x vs workers={workers_list[0]} "
+              f"(pool start-up {startup[workers]:.2f} s)")
+    write_results(args.json, 'cpu_pool', results, notes=args.notes, workers=workers_list,
+                  chunk_size=args.chunk_size, cores=os.cpu_count(), startup_seconds=startup)
+    if args.baseline:
+        compare(args.json, args.baseline, 'cpu_pool')
@@ -0,0 +1,236 @@
+"""
+HTTP load scenario for every /api/* route, driven through Flask's test client
+against a temporary SQLite database (or --database) filled with a synthetic workspace
+
+    python benchmarks/http_load.py --tasks 5000 --requests 50 --json bench_results.json
+    python benchmarks/http_load.py --database postgresql://localhost/nexus_bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import summarize, print_table, write_results, compare
+from synthetic import generate_workspace, populate
+
+from config import Config
+from app import create_app, init_db
+from jobs import job_queue
+from models import db
+
+
+class Scenario:
+    """One route exercised `requests` times; `request` returns (path, json body)"""
+
+    def __init__(self, method, rule, request, label=None):
+        self.method = method
+        self.rule = rule
+        self.request = request
+        self.label = label or f"{method} {rule}"
+
+
+def build_scenarios(ctx):
+    rng = ctx['rng']
+    now = datetime.utcnow()
+
+    def pick(kind):
+        return rng.choice(ctx[kind])
+
+    def pop(kind):
+        return ctx[kind].pop() if len(ctx[kind]) > 1 else ctx[kind][0]
+
+    def new_task(_):
+        return '/api/tasks', {'title': f"Load task {rng.random():.6f}", 'priority': 'high',
+                              'tags': ['load'], 'estimated_time': 30}
+
+    def new_event(_):
+        start = now + timedelta(hours=rng.randint(1, 48))
+        return '/api/events', {'title': 'Load event', 'start': start.isoformat(),
+                               'end': (start + timedelta(minutes=30)).isoformat()}
+
+    def new_dependency(_):
+        # Edges always point from lower to higher ids, so they never form a cycle
+        blocker, blocked = sorted(rng.sample(ctx['task_ids'], 2))
+        ctx['dependencies'].append((blocker, blocked))
+        return f"/api/tasks/{blocked}/dependencies", {'blocked_by': blocker}
+
+    def new_note(_):
+        return '/api/notes', {'title': 'Load note', 'content': 'Benchmark note about python performance testing.'}
+
+    def sync_batch(i):
+        # An offline session: create a task, edit it through its "$op:" reference, log a pomodoro on it
+        ops = [f"load-{i}-{rng.random():.9f}-{n}" for n in range(3)]
+        return '/api/sync/batch', {'operations': [
+            {'id': ops[0], 'method': 'POST', 'path': '/api/tasks', 'body': {'title': f"Offline task {i}"}},
+            {'id': ops[1], 'method': 'PUT', 'path': f"/api/tasks/$op:{ops[0]}", 'body': {'priority': 'high'}},
+            {'id': ops[2], 'method': 'POST', 'path': '/api/pomodoro/complete',
+             'body': {'task_id': f"$op:{ops[0]}", 'duration': 25}},
+        ]}
+
+    return [
+        Scenario('GET', '/api/tasks', lambda i: ('/api/tasks', None)),
+        Scenario('GET', '/api/tasks', lambda i: ('/api/tasks?status=pending', None), 'GET /api/tasks?status'),
+        Scenario('POST', '/api/tasks', new_task),
+        Scenario('PUT', '/api/tasks/<int:task_id>',
+                 lambda i: (f"/api/tasks/{pick('task_ids')}", {'priority': rng.choice(['low', 'high'])})),
+        Scenario('POST', '/api/tasks/reorder', lambda i: (
+            '/api/tasks/reorder', {'tasks': [{'id': t, 'order': n} for n, t in enumerate(rng.sample(ctx['task_ids'], 20))]})),
+        Scenario('POST', '/api/tasks/<int:task_id>/dependencies', new_dependency),
+        Scenario('GET', '/api/tasks/<int:task_id>/dependencies',
+                 lambda i: (f"/api/tasks/{rng.choice(ctx['dependencies'])[1]}/dependencies", None)),
+        Scenario('GET', '/api/tasks/ready', lambda i: ('/api/tasks/ready', None)),
+        Scenario('GET', '/api/tasks/critical-path', lambda i: ('/api/tasks/critical-path', None)),
+        Scenario('DELETE', '/api/tasks/<int:task_id>/dependencies/<int:blocker_id>', lambda i: (
+            '/api/tasks/{1}/dependencies/{0}'.format(*ctx['dependencies'].pop()), None)),
+        Scenario('GET', '/api/events', lambda i: ('/api/events', None)),
+        Scenario('GET', '/api/events', lambda i: (
+            f"/api/events?start={(now - timedelta(days=7)).date()}&end={(now + timedelta(days=7)).date()}", None),
+            'GET /api/events?range'),
+        Scenario('POST', '/api/events', new_event),
+        Scenario('PUT', '/api/events/<int:event_id>',
+                 lambda i: (f"/api/events/{pick('event_ids')}", {'location': 'Load room'})),
+        Scenario('GET', '/api/calendar/feed.ics', lambda i: ('/api/calendar/feed.ics', None)),
+        Scenario('POST', '/api/calendar/import',
+                 lambda i: ('/api/calendar/import', {'url': f"https://calendar.example.com/{i}.ics"})),
+        Scenario('GET', '/api/notes', lambda i: ('/api/notes', None)),
+        Scenario('GET', '/api/notes', lambda i: ('/api/notes?search=python', None), 'GET /api/notes?search'),
+        Scenario('POST', '/api/notes', new_note),
+        Scenario('GET', '/api/notes/<int:note_id>', lambda i: (f"/api/notes/{pick('note_ids')}", None)),
+        Scenario('PUT', '/api/notes/<int:note_id>',
+                 lambda i: (f"/api/notes/{pick('note_ids')}", {'content': f"Edited {i} about planning and research."})),
+        Scenario('GET', '/api/notes/<int:note_id>/summary',
+                 lambda i: (f"/api/notes/{pick('note_ids')}/summary", None)),
+        Scenario('POST', '/api/notes/retag', lambda i: ('/api/notes/retag', {})),
+        Scenario('GET', '/api/time-entries', lambda i: (f"/api/time-entries?task_id={pick('task_ids')}", None)),
+        Scenario('POST', '/api/time-entries', lambda i: ('/api/time-entries', {
+            'task_id': pick('task_ids'), 'start_time': (now - timedelta(hours=1)).isoformat(),
+            'end_time': now.isoformat(), 'duration': 60})),
+        Scenario('POST', '/api/pomodoro/complete',
+                 lambda i: ('/api/pomodoro/complete', {'task_id': pick('task_ids'), 'duration': 25})),
+        Scenario('POST', '/api/timer/start', lambda i: ('/api/timer/start', {'task_id': pick('task_ids')})),
+        Scenario('GET', '/api/timer', lambda i: ('/api/timer', None)),
+        Scenario('POST', '/api/timer/heartbeat', lambda i: ('/api/timer/heartbeat', {})),
+        Scenario('POST', '/api/timer/pause', lambda i: ('/api/timer/pause', {})),
+        Scenario('POST', '/api/timer/resume', lambda i: ('/api/timer/resume', {})),
+        Scenario('POST', '/api/timer/stop', lambda i: ('/api/timer/stop', {})),
+        Scenario('GET', '/api/ai/suggest-task', lambda i: ('/api/ai/suggest-task', None)),
+        Scenario('GET', '/api/ai/productivity-analysis',
+                 lambda i: (f"/api/ai/productivity-analysis?days={rng.choice([7, 30, 365])}", None)),
+        Scenario('GET', '/api/ai/suggest-time-blocks', lambda i: (
+            f"/api/ai/suggest-time-blocks?date={(now + timedelta(days=rng.randint(0, 6))).date()}", None)),
+        Scenario('GET', '/api/stats', lambda i: ('/api/stats', None)),
+        Scenario('GET', '/api/activity', lambda i: ('/api/activity?limit=50', None)),
+        Scenario('POST', '/api/stats/recompute', lambda i: ('/api/stats/recompute', {})),
+        Scenario('GET', '/api/stats/chart',
+                 lambda i: (f"/api/stats/chart?type={rng.choice(['weekly', 'monthly'])}", None)),
+        Scenario('POST', '/api/sync/batch', sync_batch),
+        Scenario('GET', '/api/analytics/heatmap',
+                 lambda i: (f"/api/analytics/heatmap?year={now.year - rng.randint(0, 2)}", None)),
+        Scenario('GET', '/api/analytics/focus-grid',
+                 lambda i: (f"/api/analytics/focus-grid?start_year={now.year - 5}&end_year={now.year}", None)),
+        Scenario('GET', '/api/analytics/tag-trends',
+                 lambda i: (f"/api/analytics/tag-trends?bucket={rng.choice(['week', 'month'])}", None)),
+        Scenario('GET', '/api/archive', lambda i: ('/api/archive', None)),
+        Scenario('POST', '/api/archive/run', lambda i: ('/api/archive/run', {})),
+        Scenario('GET', '/api/cache/stats', lambda i: ('/api/cache/stats', None)),
+        Scenario('GET', '/api/jobs', lambda i: ('/api/jobs', None)),
+        Scenario('GET', '/api/jobs/<int:job_id>', lambda i: (f"/api/jobs/{ctx['job_id']}", None)),
+        Scenario('DELETE', '/api/tasks/<int:task_id>', lambda i: (f"/api/tasks/{pop('task_ids')}", None)),
+        Scenario('DELETE', '/api/events/<int:event_id>', lambda i: (f"/api/events/{pop('event_ids')}", None)),
+        Scenario('DELETE', '/api/notes/<int:note_id>', lambda i: (f"/api/notes/{pop('note_ids')}", None)),
+    ]
+
+
+def check_coverage(app, scenarios):
+    """Warn about /api routes the load scenario does not exercise"""
+    covered = {(s.method, s.rule) for s in scenarios}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith('/api/'):
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    if missing:
+        print("WARNING: routes without a load scenario: " + ', '.join(sorted(missing)), file=sys.stderr)
+    return missing
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='nexus-bench-')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        BACKGROUND_SERVICES = False  # Keep job workers from competing with the measured requests
+        RESPONSE_CACHE_ENABLED = not args.no_cache
+        THROTTLE_ENABLED = False  # One client measuring latency, not a burst (see burst_bench.py)
+
+    app = create_app(BenchConfig)
+    # Anchor the history at the real clock so the routes' date windows see data
+    workspace = generate_workspace(args.tasks, args.tasks // 2, args.tasks // 2, args.tasks * 5, args.seed,
+                                   now=datetime.utcnow())
+    with app.app_context():
+        if args.database:
+            db.drop_all()  # A scratch database is reused between runs
+        init_db()
+        populate(workspace)
+        job = job_queue.enqueue('refit_estimator')
+        db.session.commit()
+        job_id = job.id
+
+    ctx = {
+        'rng': random.Random(args.seed),
+        'task_ids': [t['id'] for t in workspace['tasks']],
+        'event_ids': [e['id'] for e in workspace['events']],
+        'note_ids': [n['id'] for n in workspace['notes']],
+        'dependencies': [],
+        'job_id': job_id,
+    }
+    scenarios = build_scenarios(ctx)
+    missing = check_coverage(app, scenarios)
+
+    client = app.test_client()
+    results = {}
+    statuses = {}
+    for scenario in scenarios:
+        samples = []
+        codes = set()
+        for i in range(args.requests):
+            path, body = scenario.request(i)
+            start = time.perf_counter()
+            response = client.open(path, method=scenario.method, json=body)
+            response.get_data()  # Streamed bodies are only produced as they are read
+            response.close()
+            samples.append((time.perf_counter() - start) * 1000)
+            codes.add(response.status_code)
+            if response.status_code >= 500:
+                sys.exit(f"{scenario.label} failed with {response.status_code}: {response.get_data(as_text=True)[:500]}")
+        results[scenario.label] = summarize(samples)
+        statuses[scenario.label] = sorted(codes)
+
+    with app.app_context():
+        db.engine.dispose()
+    return results, missing, statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test every /api route through the Flask test client')
+    parser.add_argument('--tasks', type=int, default=2000, help='workspace size (other tables scale with it)')
+    parser.add_argument('--requests', type=int, default=30, help='requests per route')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--database', help='SQLAlchemy URL of a scratch database (its tables are dropped)')
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results, missing, _ = run(args)
+    print_table(results)
+    write_results(args.json, 'http', results, tasks=args.tasks, requests=args.requests,
+                  seed=args.seed, cache=not args.no_cache, uncovered_routes=missing,
+                  backend=(args.database or 'sqlite').split(':')[0])
+    if args.baseline:
+        compare(args.json, args.baseline, 'http')
@@ -0,0 +1,160 @@
+"""
+iCalendar import/export on large calendars
+
+Checks the parser against benchmarks/fixtures/sample.ics (folding, TZID,
+all-day, RRULE, RECURRENCE-ID, CANCELLED, VALARM), then imports a
+generated .ics file twice - the second pass must only update, through the
+UID index - and exports it through the streamed feed. Peak Python memory
+is tracked so whole-file buffering shows up as a regression.
+
+    python benchmarks/ical_bench.py --events 10000 50000 --json bench_results.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from common import ROOT, summarize, print_table, write_results, compare
+
+from config import Config
+from app import create_app, init_db
+from models import db, Event
+import ical
+
+FIXTURE = os.path.join(ROOT, 'benchmarks', 'fixtures', 'sample.ics')
+
+
+def check_fixture():
+    """The fixture parses into the rows a calendar client would expect"""
+    with open(FIXTURE, 'rb') as f:
+        rows = [ical.to_row(p, ZoneInfo('UTC')) for p in ical.parse_events(f)]
+    by_uid = {row['uid']: row for row in rows if row}
+
+    assert rows.count(None) == 1, 'event without UID should be skipped'
+    standup = by_uid['standup@example.com']
+    assert standup['start_time'] == datetime(2026, 1, 5, 8, 30), standup['start_time']  # CET -> UTC
+    assert standup['recurrence_rule'] == 'weekly' and standup['rrule'].endswith('BYDAY=MO,TU,WE,TH,FR')
+    assert standup['description'] == 'Blockers, progress; plans', 'VALARM leaked into the event'
+    assert by_uid['standup@example.com#20260107T093000']['start_time'] == datetime(2026, 1, 7, 10, 0)
+    offsite = by_uid['offsite@example.com']
+    assert (offsite['start_time'], offsite['end_time']) == (datetime(2026, 2, 10), datetime(2026, 2, 12))
+    assert offsite['location'] == 'Lake house, north shore'
+    assert 'draft so we can go' in offsite['description'] and '\n' in offsite['description']
+    assert by_uid['review@example.com']['end_time'] == datetime(2026, 1, 15, 15, 30)
+    assert by_uid['dentist@example.com']['cancelled']
+
+
+def write_calendar(path, count, seed):
+    """Write a calendar of `count` events, a tenth of them recurring"""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 8, 0)
+    with open(path, 'w', newline='') as f:
+        f.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Bench//EN\r\n')
+        for i in range(count):
+            begin = start + timedelta(days=rng.randint(0, 365), minutes=15 * rng.randint(0, 40))
+            end = begin + timedelta(minutes=rng.choice([15, 30, 60, 90]))
+            lines = [
+                'BEGIN:VEVENT',
+                f"UID:bench-{i}@example.com",
+                f"DTSTART;TZID=Europe/Berlin:{begin:%Y%m%dT%H%M%S}",
+                f"DTEND;TZID=Europe/Berlin:{end:%Y%m%dT%H%M%S}",
+                f"SUMMARY:Meeting {i}",
+                f"DESCRIPTION:{ical.escape('Agenda item, ' * rng.randint(1, 12))}",
+            ]
+            if rng.random() < 0.1:
+                lines.append('RRULE:FREQ=WEEKLY;COUNT=10')
+            lines.append('END:VEVENT')
+            f.write(''.join(ical.fold(line) for line in lines))
+        f.write('END:VCALENDAR\r\n')
+
+
+def timed(func):
+    """(result, seconds) of one call"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def peak_memory(func):
+    """Peak traced MB of one call (traced separately, tracing slows the call down)"""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def run(sizes, seed):
+    workdir = tempfile.mkdtemp(prefix='nexus-ical-')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        BACKGROUND_SERVICES = False
+        RESPONSE_CACHE_ENABLED = False
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    results = {}
+
+    for size in sizes:
+        path = os.path.join(workdir, f"calendar-{size}.ics")
+        write_calendar(path, size, seed)
+        file_mb = os.path.getsize(path) / 1e6
+
+        with app.app_context():
+            db.drop_all()
+            init_db()
+
+            def import_file():
+                with open(path, 'rb') as f:
+                    return ical.import_calendar(f)
+
+            counts, first = timed(import_file)
+            assert counts['created'] == size, counts
+            counts, second = timed(import_file)
+            assert counts['updated'] == size and counts['created'] == 0, counts
+            assert Event.query.count() == size
+            import_peak = peak_memory(import_file)
+
+        def export():
+            response = client.get('/api/calendar/feed.ics')
+            return response.status_code, sum(len(chunk) for chunk in response.response), response.headers['ETag']
+
+        (status, length, etag), exported = timed(export)
+        assert status == 200
+        assert client.get('/api/calendar/feed.ics', headers={'If-None-Match': etag}).status_code == 304
+        export_peak = peak_memory(export)
+
+        for name, seconds, peak in (('import', first, import_peak), ('reimport', second, import_peak),
+                                    ('export', exported, export_peak)):
+            results[f"{name}[n={size}]"] = {
+                **summarize([seconds * 1000]),
+                'events_per_sec': round(size / seconds),
+                'peak_mb': round(peak, 2),
+                'file_mb': round(file_mb if name != 'export' else length / 1e6, 2),
+            }
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark iCalendar import and export')
+    parser.add_argument('--events', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    check_fixture()
+    print(f"Fixture OK: {FIXTURE}")
+    results = run(args.events, args.seed)
+    print_table(results)
+    for name, stats in results.items():
+        print(f"{name}: {stats['events_per_sec']} events/s, peak {stats['peak_mb']} MB for a {stats['file_mb']} MB calendar")
+    write_results(args.json, 'ical', results, sizes=args.events, seed=args.seed)
+    if args.baseline:
+        compare(args.json, args.baseline, 'ical')
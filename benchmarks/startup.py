@@ -0,0 +1,78 @@
+"""
+Cold-start benchmark for NEXUS AI
+
+Imports the app and builds it in fresh interpreters under
+`python -X importtime`, reports the slowest imports and fails when the
+median cold start exceeds the budget:
+
+    python benchmarks/startup.py --runs 5 --budget-ms 1000
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT, summarize, write_results
+STARTUP_CODE = "from app import create_app; create_app()"
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_once():
+    """Return (wall seconds, {module: cumulative microseconds}) for one cold start"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='0')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Startup failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure NEXUS AI cold-start time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000.0, help='fail if the median exceeds this')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to list')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    run_once()  # Warm the bytecode cache so runs measure imports, not compilation
+    runs = [run_once() for _ in range(args.runs)]
+    walls = [wall * 1000 for wall, _ in runs]
+    median = statistics.median(walls)
+    modules = runs[-1][1]
+
+    print(f"Cold start: median {median:.0f} ms, min {min(walls):.0f} ms, max {max(walls):.0f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print(f"Slowest top-level imports (cumulative):")
+    top_level = {name: us for name, us in modules.items() if '.' not in name}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    heavy = [name for name in ('matplotlib', 'numpy', 'pandas', 'nltk', 'apscheduler', 'httpx') if name in modules]
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+
+    if args.json:
+        write_results(args.json, 'startup', {'cold_start': summarize(walls)},
+                      budget_ms=args.budget_ms, heavy_modules=heavy,
+                      top_imports_ms={name: round(us / 1000, 1) for name, us in top_level.items()})
+
+    if median > args.budget_ms:
+        sys.exit(f"Cold start {median:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Synthetic workspace generator for NEXUS AI benchmarks
+
+Produces tasks, events, notes and time entries with realistic shapes:
+Zipf-distributed tags, skewed priorities, optional and overdue
+deadlines, habitual underestimation, recurring events and time entries
+clustered around working-hour peaks. Rows come out in the same dict
+shape as the models' to_dict(), so they feed AIEngine directly or can be
+inserted into a database:
+
+    python benchmarks/synthetic.py --tasks 10000 --database sqlite:////tmp/bench.db
+"""
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+from common import ROOT  # noqa: F401  (puts the app on sys.path)
+
+TAG_VOCABULARY = [
+    'work', 'personal', 'urgent', 'meeting', 'email', 'research', 'writing', 'coding', 'review',
+    'planning', 'health', 'finance', 'errands', 'learning', 'reading', 'design', 'admin', 'travel',
+    'family', 'project-x', 'project-y', 'bugfix', 'docs', 'ops', 'hiring', 'fitness', 'home',
+]
+WORDS = [
+    'meeting', 'project', 'deadline', 'design', 'review', 'python', 'database', 'customer', 'budget',
+    'report', 'roadmap', 'feature', 'release', 'testing', 'research', 'notes', 'idea', 'strategy',
+    'learning', 'reading', 'summary', 'planning', 'weekly', 'quarterly', 'analysis', 'metrics',
+    'performance', 'interview', 'architecture', 'refactor', 'documentation', 'migration', 'backlog',
+]
+PRIORITIES = (('low', 0.2), ('medium', 0.45), ('high', 0.25), ('urgent', 0.1))
+STATUSES = (('pending', 0.55), ('in_progress', 0.15), ('completed', 0.3))
+RECURRENCE = (('daily', 0.3), ('weekly', 0.5), ('monthly', 0.2))
+# Relative likelihood of starting focused work at each hour of the day
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 1, 3, 6, 10, 12, 9, 4, 6, 9, 10, 8, 5, 3, 3, 4, 3, 1, 0]
+
+
+def _weighted(rng, choices):
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+def _zipf_tags(rng, max_tags=3):
+    weights = [1 / (rank + 1) for rank in range(len(TAG_VOCABULARY))]
+    count = rng.choices(range(max_tags + 1), weights=[0.2, 0.4, 0.3, 0.1])[0]
+    return sorted(set(rng.choices(TAG_VOCABULARY, weights=weights, k=count)))
+
+
+def _sentence(rng, min_words=6, max_words=16):
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _work_hour(rng):
+    return rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+
+
+def generate_tasks(n, rng, now, history_days=365):
+    tasks = []
+    for i in range(n):
+        created = now - timedelta(days=rng.random() * history_days, minutes=rng.randint(0, 1440))
+        status = _weighted(rng, STATUSES)
+
+        deadline = None
+        if rng.random() < 0.6:
+            # Most deadlines land within a few weeks of creation, some slip into the past
+            deadline = created + timedelta(days=rng.lognormvariate(1.5, 1.0))
+
+        estimated = None
+        if rng.random() < 0.7:
+            estimated = int(min(480, max(5, rng.lognormvariate(math.log(45), 0.7))))
+
+        completed_at = None
+        actual = 0
+        if status == 'completed':
+            completed_at = min(now, created + timedelta(days=rng.expovariate(1 / 4)))
+            # People underestimate: actual ~ 1.3x estimate with wide spread
+            base = estimated or 60
+            actual = int(base * rng.lognormvariate(math.log(1.3), 0.4))
+        elif status == 'in_progress':
+            actual = int((estimated or 60) * rng.random())
+
+        tasks.append({
+            'id': i + 1,
+            'title': f"{_sentence(rng, 2, 5)[:-1]} #{i + 1}",
+            'description': _sentence(rng) if rng.random() < 0.5 else '',
+            'priority': _weighted(rng, PRIORITIES),
+            'status': status,
+            'deadline': deadline.isoformat() if deadline else None,
+            'created_at': created.isoformat(),
+            'completed_at': completed_at.isoformat() if completed_at else None,
+            'order_index': i,
+            'tags': _zipf_tags(rng),
+            'estimated_time': estimated,
+            'actual_time': actual,
+            'pomodoros_completed': actual // 25,
+        })
+    return tasks
+
+
+def generate_events(n, rng, now, span_days=120, task_ids=()):
+    events = []
+    for i in range(n):
+        day = now.date() + timedelta(days=rng.randint(-span_days // 2, span_days // 2))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.choice(range(8, 19)), minutes=rng.choice((0, 15, 30, 45)))
+        end = start + timedelta(minutes=rng.choice((15, 30, 30, 45, 60, 60, 90, 120)))
+        recurring = rng.random() < 0.2
+        events.append({
+            'id': i + 1,
+            'title': _sentence(rng, 2, 4)[:-1],
+            'description': _sentence(rng) if rng.random() < 0.3 else '',
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'location': rng.choice(('', '', 'Office', 'Zoom', 'Cafe')),
+            'color': rng.choice(('#00ffff', '#ff00ff', '#00ff88', '#ffaa00')),
+            'is_recurring': recurring,
+            'recurrence_rule': _weighted(rng, RECURRENCE) if recurring else None,
+            'task_id': rng.choice(task_ids) if task_ids and rng.random() < 0.1 else None,
+        })
+    return events
+
+
+def generate_notes(n, rng, now, history_days=365):
+    notes = []
+    for i in range(n):
+        created = now - timedelta(days=rng.random() * history_days)
+        content = ' '.join(_sentence(rng) for _ in range(int(rng.lognormvariate(1.5, 0.7)) + 1))
+        notes.append({
+            'id': i + 1,
+            'title': _sentence(rng, 2, 5)[:-1],
+            'content': content,
+            'tags': _zipf_tags(rng),
+            'linked_notes': rng.sample(range(1, i + 1), min(i, rng.choice((0, 0, 1, 2)))) if i else [],
+            'created_at': created.isoformat(),
+            'updated_at': (created + timedelta(days=rng.random() * 10)).isoformat(),
+            'is_favorite': rng.random() < 0.05,
+        })
+    return notes
+
+
+def generate_time_entries(n, rng, now, task_ids=(), history_days=365):
+    entries = []
+    for i in range(n):
+        day = now.date() - timedelta(days=int(rng.random() * history_days))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=_work_hour(rng), minutes=rng.randint(0, 59))
+        pomodoro = rng.random() < 0.4
+        duration = 25 if pomodoro else int(max(5, rng.lognormvariate(math.log(40), 0.6)))
+        entries.append({
+            'id': i + 1,
+            'task_id': rng.choice(task_ids) if task_ids and rng.random() < 0.85 else None,
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(minutes=duration)).isoformat(),
+            'duration': duration,
+            'entry_type': 'pomodoro' if pomodoro else 'manual',
+        })
+    return entries
+
+
+def generate_workspace(tasks=1000, events=500, notes=500, time_entries=5000, seed=42, now=None, history_days=365):
+    """Return {'tasks': [...], 'events': [...], 'notes': [...], 'time_entries': [...]}"""
+    rng = random.Random(seed)
+    now = now or datetime(2026, 1, 15, 10, 0)
+    task_list = generate_tasks(tasks, rng, now, history_days)
+    task_ids = [t['id'] for t in task_list]
+    return {
+        'now': now,
+        'tasks': task_list,
+        'events': generate_events(events, rng, now, task_ids=task_ids),
+        'notes': generate_notes(notes, rng, now, history_days),
+        'time_entries': generate_time_entries(time_entries, rng, now, task_ids=task_ids, history_days=history_days),
+    }
+
+
+def populate(workspace):
+    """Bulk-insert a generated workspace into the current app's database"""
+    from models import db, Task, Event, Note, TimeEntry
+    from storage import reset_sequences
+
+    def dt(value):
+        return datetime.fromisoformat(value) if value else None
+
+    db.session.bulk_insert_mappings(Task, [{
+        **t,
+        'deadline': dt(t['deadline']),
+        'created_at': dt(t['created_at']),
+        'completed_at': dt(t['completed_at']),
+        'tags': json.dumps(t['tags']),
+    } for t in workspace['tasks']])
+    db.session.bulk_insert_mappings(Event, [{
+        **{k: v for k, v in e.items() if k not in ('start', 'end')},
+        'start_time': dt(e['start']),
+        'end_time': dt(e['end']),
+    } for e in workspace['events']])
+    db.session.bulk_insert_mappings(Note, [{
+        **n,
+        'tags': json.dumps(n['tags']),
+        'linked_notes': json.dumps(n['linked_notes']),
+        'created_at': dt(n['created_at']),
+        'updated_at': dt(n['updated_at']),
+    } for n in workspace['notes']])
+    db.session.bulk_insert_mappings(TimeEntry, [{
+        **e,
+        'start_time': dt(e['start_time']),
+        'end_time': dt(e['end_time']),
+    } for e in workspace['time_entries']])
+    # Rows came with explicit ids; keep PostgreSQL's id sequences ahead of them
+    reset_sequences(Task.__table__, Event.__table__, Note.__table__, TimeEntry.__table__)
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic NEXUS AI workspace')
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--notes', type=int, default=500)
+    parser.add_argument('--time-entries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', help='SQLAlchemy URL to populate (otherwise print JSON)')
+    args = parser.parse_args()
+
+    workspace = generate_workspace(args.tasks, args.events, args.notes, args.time_entries, args.seed)
+    if args.database:
+        from config import Config
+        from app import create_app, init_db
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = args.database
+            BACKGROUND_SERVICES = False
+
+        with create_app(BenchConfig).app_context():
+            init_db()
+            populate(workspace)
+        print(f"Populated {args.database}: " + ', '.join(
+            f"{len(workspace[k])} {k}" for k in ('tasks', 'events', 'notes', 'time_entries')))
+    else:
+        workspace['now'] = workspace['now'].isoformat()
+        print(json.dumps(workspace, indent=2))
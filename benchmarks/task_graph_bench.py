@@ -0,0 +1,73 @@
+"""
+Dependency graph operations on large synthetic projects
+
+Each task gets a few blockers among earlier tasks (so the graph is a DAG)
+and some are grouped under parents, the shape of a big interconnected
+project. Every operation should scale near-linearly with tasks + edges.
+
+    python benchmarks/task_graph_bench.py --sizes 1000 10000 50000 --json bench_results.json
+"""
+import argparse
+import random
+from datetime import datetime
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_tasks
+
+from ai_engine import AIEngine
+from task_graph import TaskGraph
+
+
+def generate_graph(size, seed, edges_per_task=3):
+    """(task rows, dependency rows) in the shape TaskGraph.load() selects"""
+    rng = random.Random(seed)
+    tasks = generate_tasks(size, rng, datetime(2026, 1, 15, 10, 0))
+    rows, dependencies = [], []
+    for task in tasks:
+        task_id = task['id']
+        parent_id = rng.randint(1, task_id - 1) if task_id > 1 and rng.random() < 0.2 else None
+        task['parent_id'] = parent_id
+        rows.append((task_id, task['status'], task['estimated_time'], parent_id))
+        if task_id > 1:
+            for blocker in {rng.randint(max(1, task_id - 200), task_id - 1) for _ in range(rng.randint(0, edges_per_task * 2))}:
+                if blocker != parent_id:
+                    dependencies.append((blocker, task_id))
+    return tasks, rows, dependencies
+
+
+def run(sizes, seed):
+    engine = AIEngine()
+    results = {}
+
+    for size in sizes:
+        tasks, rows, dependencies = generate_graph(size, seed)
+        graph = TaskGraph(rows, dependencies)
+        rng = random.Random(seed)
+
+        cases = {
+            'build': lambda: TaskGraph(rows, dependencies),
+            'ready_frontier': lambda: graph.ready(),
+            'critical_path': lambda: TaskGraph(rows, dependencies).critical_path(),
+            # Edges from late to early tasks always walk a long way before finding the cycle
+            'cycle_check': lambda: graph.would_create_cycle(rng.randint(size // 2, size), rng.randint(1, size // 2)),
+            'suggest_next_task': lambda: engine.suggest_next_task(tasks, graph=graph),
+        }
+        for name, func in cases.items():
+            results[f"{name}[n={size},e={len(dependencies)}]"] = measure(func)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark task dependency graph operations')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed)
+    print_table(results)
+    write_results(args.json, 'task_graph', results, sizes=args.sizes, seed=args.seed)
+    if args.baseline:
+        compare(args.json, args.baseline, 'task_graph')
@@ -0,0 +1,106 @@
+"""
+AIEngine working set: ORM objects + to_dict() versus compact records
+
+For each AI route, compares the old path (ORM query, to_dict() with ISO
+strings, AIEngine parsing them back) with the record path (column select
+into __slots__ records). Reports latency per call, the peak memory of a
+call and the memory the loaded working set itself holds.
+
+    python benchmarks/working_set_bench.py --rows 100000 --json bench_results.json
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+from datetime import timedelta
+
+from common import measure, print_table, write_results, compare
+from synthetic import generate_workspace, populate
+
+from config import Config
+from app import create_app, init_db
+from ai_engine import AIEngine
+from models import db, Task, Event, TimeEntry
+from working_set import load_tasks, load_events, load_time_entries
+
+
+def traced(func):
+    """(peak MB during the call, MB still held by its result)"""
+    tracemalloc.start()
+    result = func()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return round(peak / 1e6, 2), round(held / 1e6, 2)
+
+
+def run(rows, seed):
+    workdir = tempfile.mkdtemp(prefix='nexus-ws-')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        BACKGROUND_SERVICES = False
+
+    app = create_app(BenchConfig)
+    workspace = generate_workspace(tasks=rows, events=rows // 5, notes=10, time_entries=rows, seed=seed)
+    now = workspace['now']
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    since = now - timedelta(days=365)
+    engine = AIEngine()
+    results, memory = {}, {}
+
+    with app.app_context():
+        init_db()
+        populate(workspace)
+
+        def orm_dicts(query):
+            rows = [row.to_dict() for row in query]
+            db.session.expunge_all()  # Let each run start from an empty identity map, as a request does
+            return rows
+
+        loads = {
+            'tasks': (lambda: orm_dicts(Task.query.filter_by(status='pending')),
+                      lambda: load_tasks(Task.status == 'pending')),
+            'time_entries': (lambda: orm_dicts(TimeEntry.query.filter(TimeEntry.start_time >= since)),
+                             lambda: load_time_entries(TimeEntry.start_time >= since)),
+            'events': (lambda: orm_dicts(Event.query.filter(Event.start_time >= day)),
+                       lambda: load_events(Event.start_time >= day)),
+        }
+        calls = {
+            'suggest_next_task': lambda tasks, entries, events: engine.suggest_next_task(tasks, now),
+            'analyze_productivity': lambda tasks, entries, events: engine.analyze_productivity(tasks, entries, 365),
+            'suggest_time_blocks': lambda tasks, entries, events: engine.suggest_time_blocks(tasks, events, day),
+        }
+
+        for kind, index in (('dicts', 0), ('records', 1)):
+            tasks, entries, events = (loads[name][index]() for name in ('tasks', 'time_entries', 'events'))
+            for name, (dict_load, record_load) in loads.items():
+                load = (dict_load, record_load)[index]
+                results[f"load_{name}[{kind},n={rows}]"] = measure(load, min_runs=3)
+                memory[f"load_{name}[{kind},n={rows}]"] = traced(load)
+            for name, call in calls.items():
+                # Engine time alone, on an already loaded working set
+                results[f"{name}[{kind},n={rows}]"] = measure(lambda: call(tasks, entries, events), min_runs=3)
+                # Load + engine, what a route pays
+                end_to_end = lambda: call(*(loads[n][index]() for n in ('tasks', 'time_entries', 'events')))
+                memory[f"{name}[{kind},n={rows}]"] = traced(end_to_end)
+
+    return results, memory
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare AIEngine on ORM dicts and compact records')
+    parser.add_argument('--rows', type=int, default=100000, help='tasks and time entries (events are a fifth)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', default='bench_results.json', help='results file (merged per benchmark)')
+    parser.add_argument('--baseline', help='earlier results file to check for regressions')
+    args = parser.parse_args()
+
+    results, memory = run(args.rows, args.seed)
+    print_table(results)
+    print(f"\n{'memory (MB)':<52}  {'peak':>8}  {'held':>8}")
+    for name, (peak, held) in memory.items():
+        print(f"{name:<52}  {peak:>8.2f}  {held:>8.2f}")
+    write_results(args.json, 'working_set', results, rows=args.rows, seed=args.seed, memory_mb=memory)
+    if args.baseline:
+        compare(args.json, args.baseline, 'working_set')
@@ -0,0 +1,114 @@
+import logging
+import pickle
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CPUPool:
+    """
+    Worker processes for CPU-bound AIEngine work
+    Pure-Python text processing holds the GIL, so a bulk re-tag run on a
+    job thread slows every request the process serves. map() cuts a batch
+    into chunks and runs them on a process pool while the caller waits
+    with the GIL released. Small batches, CPU_WORKERS = 0, a platform
+    without working multiprocessing and a pool that dies all fall back to
+    running the same function inline.
+    """
+
+    def __init__(self, preload=()):
+        self.workers = 0
+        self.chunk_size = 500
+        self.inline_threshold = 200
+        self.preload = list(preload)
+        self.available = True
+        self.offloaded = 0
+        self.inline = 0
+        self.failures = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = max(0, app.config.get('CPU_WORKERS', 0))
+        self.chunk_size = max(1, app.config.get('CPU_CHUNK_SIZE', 500))
+        self.inline_threshold = app.config.get('CPU_INLINE_THRESHOLD', 200)
+
+    @property
+    def batch_size(self):
+        """Items worth reading per round so every worker gets a couple of chunks"""
+        return self.chunk_size * max(1, self.workers) * 2
+
+    def map(self, func, items):
+        """
+        func(chunk) -> list for each chunk of items, results in input order
+        func must be a module-level function free of side effects, since a
+        failed pool reruns the whole batch inline
+        """
+        items = list(items)
+        executor = self._get_executor() if len(items) >= max(1, self.inline_threshold) else None
+        if executor is None:
+            self.inline += 1
+            return func(items)
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        try:
+            results = list(executor.map(func, chunks))
+        except (BrokenProcessPool, pickle.PicklingError) as error:
+            logger.warning("CPU pool failed (%s), running %d items inline", error, len(items))
+            self.failures += 1
+            self._discard(executor)
+            self.inline += 1
+            return func(items)
+
+        self.offloaded += 1
+        return [result for chunk in results for result in chunk]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'workers': self.workers if self.available else 0,
+            'running': self._executor is not None,
+            'offloaded': self.offloaded,
+            'inline': self.inline,
+            'failures': self.failures,
+        }
+
+    def _get_executor(self):
+        """The pool, started on first use (never at import, to keep startup cheap)"""
+        if not self.workers or not self.available:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # Imported here so importing the app stays cheap
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                try:
+                    # Never fork: the app process runs job, scheduler and LLM threads
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    context = multiprocessing.get_context(method)
+                    if method == 'forkserver':
+                        context.set_forkserver_preload(self.preload)
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                except (OSError, ImportError, NotImplementedError, ValueError) as error:
+                    logger.warning("CPU pool unavailable (%s), running inline", error)
+                    self.available = False
+            return self._executor
+
+    def _discard(self, executor):
+        # The next batch starts a fresh pool
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Workers import ai_engine once, not whatever script started the app
+cpu_pool = CPUPool(preload=['ai_engine'])
@@ -0,0 +1,185 @@
+"""
+Learned task duration estimator
+
+Fits how far actual_time strays from estimated_time on completed tasks.
+The model is additive in log space:
+
+    log(actual / estimated) ~ bias + priority offset + mean(tag offsets)
+
+Each group keeps only its sample count and sum of log ratios, so a newly
+completed task updates the model in O(tags) and a full refit is a few
+NumPy bincounts. Offsets are shrunk towards zero until a group has seen
+enough tasks, and predictions are dict lookups on the cached factors.
+"""
+import json
+import math
+import threading
+
+from config import Config
+from models import db, Task, ArchivedTask
+
+DEFAULT_MINUTES = 60  # Same fallback AIEngine used before the estimator existed
+SHRINKAGE = 5  # Pseudo-count pulling sparse groups towards no correction
+MIN_FACTOR, MAX_FACTOR = 0.25, 4.0
+
+
+def _actual_minutes(actual_time, pomodoros_completed):
+    return actual_time or (pomodoros_completed or 0) * Config.POMODORO_WORK_TIME
+
+
+def _tags(value):
+    if isinstance(value, str):
+        return json.loads(value) if value else []
+    return value or []
+
+
+class DurationEstimator:
+    """Per-priority and per-tag correction factors for estimated_time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.is_fitted = False
+        self.database = None
+        self._reset()
+
+    def _reset(self):
+        self.samples = 0
+        self.log_ratio_sum = 0.0
+        self.groups = {}  # (kind, key) -> [count, sum of log ratios]
+        self.typical = {}  # priority -> [count, sum of log actual minutes], for tasks without estimates
+        self.bias = 0.0
+        self.offsets = {}
+
+    def fit(self, rows):
+        """Refit from (estimated_time, actual_time, pomodoros_completed, priority, tags) rows"""
+        import numpy as np
+
+        rows = [(est or 0, _actual_minutes(act, pomos), priority or 'medium', _tags(tags))
+                for est, act, pomos, priority, tags in rows]
+        rows = [row for row in rows if row[1] > 0]
+
+        with self.lock:
+            self._reset()
+            if rows:
+                estimated = np.array([r[0] for r in rows], dtype=np.float64)
+                actual = np.array([r[1] for r in rows], dtype=np.float64)
+                priorities, priority_idx = np.unique([r[2] for r in rows], return_inverse=True)
+
+                # Typical durations by priority, from every completed task
+                counts = np.bincount(priority_idx, minlength=len(priorities))
+                sums = np.bincount(priority_idx, weights=np.log(actual), minlength=len(priorities))
+                self.typical = {str(p): [int(n), float(s)] for p, n, s in zip(priorities, counts, sums)}
+
+                # Correction factors, from tasks that had an estimate
+                has_estimate = estimated > 0
+                log_ratio = np.zeros_like(actual)
+                log_ratio[has_estimate] = np.log(actual[has_estimate] / estimated[has_estimate])
+                self.samples = int(has_estimate.sum())
+                self.log_ratio_sum = float(log_ratio.sum())
+
+                counts = np.bincount(priority_idx[has_estimate], minlength=len(priorities))
+                sums = np.bincount(priority_idx, weights=log_ratio, minlength=len(priorities))
+                for p, n, s in zip(priorities, counts, sums):
+                    if n:
+                        self.groups[('priority', str(p))] = [int(n), float(s)]
+
+                # One (row, tag) pair per tag occurrence
+                pairs = [(i, tag) for i, r in enumerate(rows) if r[0] > 0 for tag in r[3]]
+                if pairs:
+                    tag_names, tag_idx = np.unique([t for _, t in pairs], return_inverse=True)
+                    row_idx = np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs))
+                    counts = np.bincount(tag_idx, minlength=len(tag_names))
+                    sums = np.bincount(tag_idx, weights=log_ratio[row_idx], minlength=len(tag_names))
+                    for t, n, s in zip(tag_names, counts, sums):
+                        self.groups[('tag', str(t))] = [int(n), float(s)]
+
+            self._update_offsets()
+            self.is_fitted = True
+        return self
+
+    def observe(self, task):
+        """Fold one newly completed task (a to_dict() row) into the model"""
+        if not self.is_fitted:
+            return  # The first fit reads it from the database
+        actual = _actual_minutes(task.get('actual_time'), task.get('pomodoros_completed'))
+        if actual <= 0:
+            return
+        estimated = task.get('estimated_time') or 0
+        priority = task.get('priority') or 'medium'
+
+        with self.lock:
+            stats = self.typical.setdefault(priority, [0, 0.0])
+            stats[0] += 1
+            stats[1] += math.log(actual)
+            if estimated > 0:
+                log_ratio = math.log(actual / estimated)
+                self.samples += 1
+                self.log_ratio_sum += log_ratio
+                for key in [('priority', priority)] + [('tag', t) for t in _tags(task.get('tags'))]:
+                    stats = self.groups.setdefault(key, [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += log_ratio
+                self._update_offsets()
+
+    def _update_offsets(self):
+        # Shrunk means: sparse groups stay close to the overall bias, and the bias close to 1x
+        self.bias = self.log_ratio_sum / (self.samples + SHRINKAGE)
+        self.offsets = {key: (s - n * self.bias) / (n + SHRINKAGE) for key, (n, s) in self.groups.items()}
+
+    def factor(self, priority, tags=()):
+        """Multiplier to apply to a user estimate"""
+        log_factor = self.bias + self.offsets.get(('priority', priority or 'medium'), 0.0)
+        tag_offsets = [self.offsets[('tag', t)] for t in tags if ('tag', t) in self.offsets]
+        if tag_offsets:
+            log_factor += sum(tag_offsets) / len(tag_offsets)
+        return min(MAX_FACTOR, max(MIN_FACTOR, math.exp(log_factor)))
+
+    def predict(self, task):
+        """Expected minutes for a task dict, corrected for estimation habits"""
+        return self.expected_minutes(task.get('estimated_time'), task.get('priority'), task.get('tags'))
+
+    def expected_minutes(self, estimated, priority, tags=None):
+        """predict() for callers holding the columns rather than a dict"""
+        if estimated:
+            return max(1, round(estimated * self.factor(priority, _tags(tags))))
+
+        n, log_sum = self.typical.get(priority or 'medium', (0, 0.0))
+        if n >= SHRINKAGE:
+            return max(1, round(math.exp(log_sum / n)))
+        return DEFAULT_MINUTES
+
+    def summary(self):
+        by_tag = sorted(
+            ((key[1], math.exp(self.bias + self.offsets[key])) for key, (n, _) in self.groups.items()
+             if key[0] == 'tag' and n >= SHRINKAGE),
+            key=lambda item: item[1], reverse=True
+        )
+        return {
+            'samples': self.samples,
+            'overall_factor': round(math.exp(self.bias), 2),
+            'by_priority': {key[1]: round(self.factor(key[1]), 2) for key in self.groups if key[0] == 'priority'},
+            'most_underestimated_tags': [{'tag': t, 'factor': round(f, 2)} for t, f in by_tag[:3] if f > 1],
+        }
+
+    def refit(self):
+        """Refit from every completed task in the database"""
+        self.fit(load_rows())
+        self.database = str(db.engine.url)
+        return self
+
+    def fitted(self):
+        """The model, fitted from the database on first use"""
+        if not self.is_fitted or self.database != str(db.engine.url):
+            self.refit()
+        return self
+
+
+def load_rows():
+    # Archived tasks are most of the history the model learns from
+    for model in (Task, ArchivedTask):
+        yield from db.session.query(
+            model.estimated_time, model.actual_time, model.pomodoros_completed, model.priority, model.tags
+        ).filter(model.status == 'completed').yield_per(Config.DB_STREAM_BATCH_SIZE)
+
+
+duration_estimator = DurationEstimator()
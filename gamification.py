@@ -0,0 +1,226 @@
+import json
+from collections import defaultdict
+from datetime import datetime, date, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func
+
+from config import Config
+from models import db, ActivityEvent, Task, Note, TimeEntry, UserStats, ArchivedTask, ArchivedTimeEntry
+from ai_engine import AIEngine, BADGES
+
+EPOCH = date(1970, 1, 1)
+
+# event type -> (UserStats counter it increments, points awarded)
+EVENT_TYPES = {
+    'task_completed': ('tasks_completed', Config.POINTS_PER_TASK),
+    'pomodoro_completed': ('pomodoros_completed', Config.POINTS_PER_POMODORO),
+    'note_created': ('notes_created', Config.POINTS_PER_NOTE),
+    'time_logged': (None, 0),  # Counts towards streaks only
+}
+
+_engine = AIEngine()
+
+# Only rules whose metric an event can change are re-evaluated for it
+BADGES_BY_METRIC = defaultdict(list)
+for _badge in BADGES:
+    BADGES_BY_METRIC[_badge.metric].append(_badge)
+
+
+def naive_utc(moment):
+    """A datetime as the naive UTC the database stores (offset-aware ones are converted)"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def local_day(moment, tz=None):
+    """Index of the local calendar day (days since 1970-01-01) of a naive UTC datetime"""
+    tz = tz or ZoneInfo(Config.TIMEZONE)
+    return (moment.replace(tzinfo=timezone.utc).astimezone(tz).date() - EPOCH).days
+
+
+def today_index():
+    return (datetime.now(ZoneInfo(Config.TIMEZONE)).date() - EPOCH).days
+
+
+def get_user_stats():
+    stats = UserStats.query.first()
+    if not stats:
+        stats = UserStats(total_points=0, tasks_completed=0, pomodoros_completed=0, notes_created=0,
+                          current_streak=0, longest_streak=0, level=1)
+        db.session.add(stats)
+    return stats
+
+
+def record_activity(event_type, occurred_at=None, subject_id=None):
+    """
+    Append an activity event and fold it into the stats incrementally
+    The caller commits, so the event and the stats change land together
+    """
+    counter, points = EVENT_TYPES[event_type]
+    stats = get_user_stats()
+    ensure_timezone(stats)
+
+    occurred_at = naive_utc(occurred_at) if occurred_at else datetime.utcnow()
+    day = local_day(occurred_at)
+    last = stats.streak_last_day
+    # A day that already had activity cannot change any streak
+    known_day = day == last or (last is not None and day < last and _day_has_activity(day))
+    
+    db.session.add(ActivityEvent(event_type=event_type, occurred_at=occurred_at, day=day,
+                                 points=points, subject_id=subject_id))
+
+    changed = set()
+    if counter:
+        setattr(stats, counter, (getattr(stats, counter) or 0) + 1)
+        changed.add(counter)
+    stats.total_points = (stats.total_points or 0) + points
+    stats.level = _engine.calculate_level(stats.total_points)
+
+    if not known_day:
+        changed |= _advance_streak(stats, day)
+
+    if not stats.last_activity or occurred_at > stats.last_activity:
+        stats.last_activity = occurred_at
+
+    evaluate_badges(stats, changed)
+    return stats
+
+
+def refresh_streak(stats):
+    """Break the current streak once a full local day has passed without activity"""
+    ensure_timezone(stats)
+    if stats.streak_last_day is not None and stats.streak_last_day < today_index() - 1 and stats.current_streak:
+        stats.current_streak = 0
+        evaluate_badges(stats, {'current_streak'})
+
+
+def evaluate_badges(stats, metrics=None):
+    """Re-check badge rules for the given metrics (all rules when None)"""
+    earned = set(json.loads(stats.badges) if stats.badges else [])
+    rules = BADGES if metrics is None else [b for m in metrics for b in BADGES_BY_METRIC.get(m, ())]
+    for badge in rules:
+        if (getattr(stats, badge.metric) or 0) >= badge.threshold:
+            earned.add(badge.id)
+        else:
+            earned.discard(badge.id)
+    # Keep the declaration order so the list is stable
+    stats.badges = json.dumps([b.id for b in BADGES if b.id in earned])
+
+
+def _day_has_activity(day):
+    return db.session.query(ActivityEvent.id).filter(ActivityEvent.day == day).first() is not None
+
+
+def _advance_streak(stats, day):
+    """Fold activity on a new day into the streak; returns the metrics that changed"""
+    before = (stats.current_streak, stats.longest_streak)
+    last = stats.streak_last_day
+
+    if last is None or day > last + 1:
+        stats.current_streak = 1
+        stats.streak_last_day = day
+    elif day == last + 1 and stats.current_streak:
+        stats.current_streak += 1
+        stats.streak_last_day = day
+    else:
+        # Backfilled or late activity may bridge a gap anywhere in history
+        db.session.flush()
+        recompute_streaks(stats)
+
+    stats.longest_streak = max(stats.longest_streak or 0, stats.current_streak)
+    return {metric for metric, old, new in zip(('current_streak', 'longest_streak'), before,
+                                                (stats.current_streak, stats.longest_streak)) if old != new}
+
+
+def recompute_streaks(stats):
+    """Derive current and longest streak from every active day in one NumPy pass"""
+    import numpy as np
+
+    days = np.fromiter(
+        (d for (d,) in db.session.query(ActivityEvent.day).distinct().order_by(ActivityEvent.day)
+         .yield_per(Config.DB_STREAM_BATCH_SIZE)),
+        dtype=np.int64
+    )
+    if days.size == 0:
+        stats.current_streak = stats.longest_streak = 0
+        stats.streak_last_day = None
+        return
+
+    # Runs of consecutive days start wherever the gap to the previous day is not 1
+    starts = np.flatnonzero(np.diff(days, prepend=days[0] - 2) != 1)
+    runs = np.diff(np.append(starts, days.size))
+
+    stats.longest_streak = int(runs.max())
+    stats.streak_last_day = int(days[-1])
+    stats.current_streak = int(runs[-1]) if days[-1] >= today_index() - 1 else 0
+
+
+def recompute_all(stats=None):
+    """Rebuild counters, points, streaks and badges from the full event log"""
+    stats = stats or get_user_stats()
+
+    totals = dict(db.session.query(ActivityEvent.event_type, func.count()).group_by(ActivityEvent.event_type))
+    for event_type, (counter, _) in EVENT_TYPES.items():
+        if counter:
+            setattr(stats, counter, totals.get(event_type, 0))
+    stats.total_points = db.session.query(func.coalesce(func.sum(ActivityEvent.points), 0)).scalar()
+    stats.level = _engine.calculate_level(stats.total_points)
+    stats.last_activity = db.session.query(func.max(ActivityEvent.occurred_at)).scalar() or stats.last_activity
+
+    recompute_streaks(stats)
+    evaluate_badges(stats)
+    return stats
+
+
+def ensure_timezone(stats):
+    """Re-index activity days after Config.TIMEZONE changes"""
+    if stats.streak_timezone == Config.TIMEZONE:
+        return
+
+    tz = ZoneInfo(Config.TIMEZONE)
+    rows = [
+        {'id': event_id, 'day': local_day(occurred_at, tz)}
+        for event_id, occurred_at in db.session.query(ActivityEvent.id, ActivityEvent.occurred_at)
+        .yield_per(Config.DB_STREAM_BATCH_SIZE)
+    ]
+    if rows:
+        db.session.bulk_update_mappings(ActivityEvent, rows)
+    stats.streak_timezone = Config.TIMEZONE
+    if rows:
+        recompute_all(stats)
+
+
+def backfill_activity():
+    """Seed the event log from existing rows the first time it is created"""
+    if db.session.query(ActivityEvent.id).first():
+        return
+
+    tz = ZoneInfo(Config.TIMEZONE)
+    events = []
+    for task in (Task, ArchivedTask):
+        for task_id, completed_at in db.session.query(task.id, task.completed_at).filter(task.completed_at.isnot(None)):
+            events.append(('task_completed', completed_at, task_id))
+    for entry in (TimeEntry, ArchivedTimeEntry):
+        for task_id, end_time in db.session.query(entry.task_id, entry.end_time).filter(
+                entry.entry_type == 'pomodoro', entry.end_time.isnot(None)):
+            events.append(('pomodoro_completed', end_time, task_id))
+    for note_id, created_at in db.session.query(Note.id, Note.created_at):
+        events.append(('note_created', created_at, note_id))
+
+    if not events:
+        return
+
+    db.session.bulk_insert_mappings(ActivityEvent, [{
+        'event_type': event_type,
+        'occurred_at': occurred_at,
+        'day': local_day(occurred_at, tz),
+        'points': EVENT_TYPES[event_type][1],
+        'subject_id': subject_id,
+    } for event_type, occurred_at, subject_id in events])
+
+    stats = get_user_stats()
+    stats.streak_timezone = Config.TIMEZONE
+    recompute_all(stats)
+    db.session.commit()
@@ -0,0 +1,363 @@
+"""
+iCalendar (RFC 5545) import and export for calendar events
+
+The parser reads a byte stream in chunks and yields one event at a time,
+so importing a calendar with tens of thousands of events keeps only the
+current batch in memory. Imports upsert in batches keyed by the unique
+Event.uid index. Exports are generated row by row from a streamed query.
+
+Times are stored the way the rest of the app stores events: naive wall
+clock time in Config.TIMEZONE.
+"""
+import ipaddress
+import re
+import socket
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import Config
+from models import db, Event
+from response_cache import bump_version
+
+PRODID = '-//NEXUS AI//Productivity App//EN'
+CHUNK_SIZE = 64 * 1024
+
+# RRULE FREQ -> Event.recurrence_rule
+FREQUENCIES = {'DAILY': 'daily', 'WEEKLY': 'weekly', 'MONTHLY': 'monthly', 'YEARLY': 'yearly'}
+
+DURATION_RE = re.compile(r'([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+UNESCAPE_RE = re.compile(r'\\([\\;,nN])')
+
+
+# ============================================================================
+# Parsing
+# ============================================================================
+
+def _physical_lines(stream):
+    """Lines of a binary stream, read in fixed-size chunks"""
+    pending = b''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8', errors='replace')
+    if pending:
+        yield pending.rstrip(b'\r').decode('utf-8', errors='replace')
+
+
+def content_lines(stream):
+    """Unfolded content lines (continuation lines start with a space or tab)"""
+    current = None
+    for line in _physical_lines(stream):
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """'NAME;PARAM=x:value' -> (NAME, {PARAM: x}, value)"""
+    colon = line.find(':')
+    if colon < 0:
+        return None, {}, ''
+    if ';' not in line[:colon]:
+        return line[:colon].upper(), {}, line[colon + 1:]
+    if '"' not in line[:colon]:
+        head, value = line[:colon], line[colon + 1:]
+        name, *params = head.split(';')
+        return name.upper(), dict(p.split('=', 1) for p in params if '=' in p), value
+
+    # The first colon outside a quoted parameter value ends the name/params part
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return None, {}, ''
+
+    name, *params = head.split(';')
+    return name.upper(), dict(p.split('=', 1) for p in params if '=' in p), value
+
+
+def parse_events(stream):
+    """Yield one dict of (name -> (params, value)) per VEVENT in an .ics stream"""
+    event = None
+    depth = 0  # Nested components inside a VEVENT (VALARM) are skipped
+    for line in content_lines(stream):
+        name, params, value = parse_line(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and event is None:
+                event = {}
+            elif event is not None:
+                depth += 1
+        elif name == 'END':
+            if event is not None and depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT' and event is not None:
+                yield event
+                event = None
+        elif event is not None and not depth and name:
+            event.setdefault(name, (params, value))
+
+
+def unescape(value):
+    return UNESCAPE_RE.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def parse_datetime(params, value, tz):
+    """A DATE or DATE-TIME value as naive wall clock time in `tz`; returns (datetime, is_date)"""
+    value = value.strip()
+    if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+        return datetime(int(value[:4]), int(value[4:6]), int(value[6:8])), True
+
+    # Fixed-width YYYYMMDDTHHMMSS, sliced directly (strptime dominated import time)
+    if len(value) < 15 or value[8] not in 'Tt':
+        raise ValueError(f"Invalid DATE-TIME: {value}")
+    moment = datetime(int(value[:4]), int(value[4:6]), int(value[6:8]),
+                      int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if value[-1:] in ('Z', 'z'):
+        source = timezone.utc
+    else:
+        try:
+            source = ZoneInfo(params['TZID'].strip('"')) if 'TZID' in params else None
+        except (ZoneInfoNotFoundError, ValueError):
+            source = None  # Unknown zone ids (e.g. Windows names) are read as floating time
+    if source is None:
+        return moment, False
+    return moment.replace(tzinfo=source).astimezone(tz).replace(tzinfo=None), False
+
+
+def parse_duration(value):
+    match = DURATION_RE.match(value.strip())
+    if not match:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+
+def parse_rrule(value):
+    """RRULE value -> (recurrence_rule, full rule)"""
+    parts = dict(p.split('=', 1) for p in value.upper().split(';') if '=' in p)
+    return FREQUENCIES.get(parts.get('FREQ')), value
+
+
+def to_row(properties, tz):
+    """Map a parsed VEVENT to Event column values (None if it cannot be stored)"""
+    if 'UID' not in properties or 'DTSTART' not in properties:
+        return None
+
+    uid = properties['UID'][1].strip()
+    if 'RECURRENCE-ID' in properties:
+        # A modified occurrence shares the series UID; keep it as its own row
+        uid = f"{uid}#{properties['RECURRENCE-ID'][1].strip()}"
+
+    start, is_date = parse_datetime(*properties['DTSTART'], tz)
+    if 'DTEND' in properties:
+        end = parse_datetime(*properties['DTEND'], tz)[0]
+    elif 'DURATION' in properties:
+        end = start + (parse_duration(properties['DURATION'][1]) or timedelta())
+    else:
+        end = start + timedelta(days=1) if is_date else start
+
+    rule, rrule = parse_rrule(properties['RRULE'][1]) if 'RRULE' in properties else (None, None)
+    recurring = rrule is not None
+    if recurring and len(rrule) > 500:
+        rrule = None  # Too long for Event.rrule; a clipped rule would mean something else, so keep just FREQ
+    return {
+        'uid': uid[:255],
+        'title': unescape(properties.get('SUMMARY', ({}, ''))[1])[:200] or '(No title)',
+        'description': unescape(properties.get('DESCRIPTION', ({}, ''))[1]),
+        'start_time': start,
+        'end_time': max(start, end),
+        'location': unescape(properties.get('LOCATION', ({}, ''))[1])[:200],
+        'is_recurring': recurring,
+        'recurrence_rule': rule,
+        'rrule': rrule,
+        'cancelled': properties.get('STATUS', ({}, ''))[1].strip().upper() == 'CANCELLED',
+    }
+
+
+# ============================================================================
+# Import
+# ============================================================================
+
+def calendar_url(url):
+    """
+    A subscribed calendar URL as the http(s) URL to fetch (webcal:// is https)
+    Raises ValueError for other schemes and, unless ICAL_ALLOW_PRIVATE_URLS
+    is set, for hosts resolving to loopback, private, link-local or other
+    non-public addresses, so a URL import cannot reach internal services.
+    """
+    url = 'https://' + url[len('webcal://'):] if url.startswith('webcal://') else url
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('url must be http(s) or webcal')
+    if Config.ICAL_ALLOW_PRIVATE_URLS:
+        return url
+
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Cannot resolve {parts.hostname}")
+    for *_, sockaddr in addresses:
+        # Strip an IPv6 zone id ("fe80::1%eth0") before parsing
+        if not ipaddress.ip_address(sockaddr[0].split('%')[0]).is_global:
+            raise ValueError(f"{parts.hostname} is not a public address")
+    return url
+
+
+def open_calendar_url(url, timeout):
+    """urlopen() for a calendar URL, re-checking the host and every redirect target"""
+    # Imported here so importing the app stays cheap
+    from urllib.request import HTTPRedirectHandler, build_opener
+
+    class CheckedRedirects(HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            calendar_url(newurl)
+            return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+    return build_opener(CheckedRedirects).open(calendar_url(url), timeout=timeout)
+
+
+def import_calendar(stream, batch_size=None):
+    """Upsert every VEVENT of an .ics byte stream; returns counts per outcome"""
+    batch_size = batch_size or Config.ICAL_IMPORT_BATCH_SIZE
+    tz = ZoneInfo(Config.TIMEZONE)
+    counts = {'created': 0, 'updated': 0, 'cancelled': 0, 'skipped': 0}
+
+    batch = {}
+    for properties in parse_events(stream):
+        try:
+            row = to_row(properties, tz)
+        except ValueError:
+            row = None
+        if row is None:
+            counts['skipped'] += 1
+            continue
+        batch[row['uid']] = row  # A UID repeated within a batch: last one wins
+        if len(batch) >= batch_size:
+            _upsert(batch, counts)
+            batch = {}
+    if batch:
+        _upsert(batch, counts)
+
+    if counts['created'] or counts['updated'] or counts['cancelled']:
+        bump_version('events')  # Bulk writes skip the flush hook
+    db.session.commit()
+    return counts
+
+
+def _upsert(batch, counts):
+    existing = dict(db.session.query(Event.uid, Event.id).filter(Event.uid.in_(list(batch))))
+    now = datetime.utcnow()
+
+    cancelled = [existing[uid] for uid, row in batch.items() if row['cancelled'] and uid in existing]
+    if cancelled:
+        # Only events that were stored count; a cancellation for an unknown UID is skipped
+        counts['cancelled'] += Event.query.filter(Event.id.in_(cancelled)).delete(synchronize_session=False)
+    counts['skipped'] += sum(1 for row in batch.values() if row['cancelled']) - len(cancelled)
+
+    inserts, updates = [], []
+    for uid, row in batch.items():
+        if row.pop('cancelled'):
+            continue
+        row['updated_at'] = now
+        if uid in existing:
+            updates.append({**row, 'id': existing[uid]})
+        else:
+            inserts.append({**row, 'created_at': now, 'color': '#00ffff'})
+
+    if inserts:
+        # render_nulls keeps rows with and without an RRULE in one executemany
+        db.session.bulk_insert_mappings(Event, inserts, render_nulls=True)
+    if updates:
+        db.session.bulk_update_mappings(Event, updates)
+    counts['created'] += len(inserts)
+    counts['updated'] += len(updates)
+
+
+# ============================================================================
+# Export
+# ============================================================================
+
+def escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # Never split a multi-byte character
+        pieces.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def format_utc(moment, tz):
+    return moment.replace(tzinfo=tz).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_to_ics(event, tz):
+    """One VEVENT block for an Event row"""
+    # DTSTAMP follows the row, not the clock, so an unchanged feed is byte-identical under its ETag
+    stamp = (event.updated_at or event.created_at or datetime(1970, 1, 1)).strftime('%Y%m%dT%H%M%SZ')
+    all_day = (event.start_time.time() == event.end_time.time() == datetime.min.time()
+               and event.end_time > event.start_time)
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{event.uid or f'event-{event.id}@nexus-ai'}",
+        f"DTSTAMP:{stamp}",
+    ]
+    if all_day:
+        lines.append(f"DTSTART;VALUE=DATE:{event.start_time:%Y%m%d}")
+        lines.append(f"DTEND;VALUE=DATE:{event.end_time:%Y%m%d}")
+    else:
+        lines.append(f"DTSTART:{format_utc(event.start_time, tz)}")
+        lines.append(f"DTEND:{format_utc(event.end_time, tz)}")
+    lines.append(f"SUMMARY:{escape(event.title)}")
+    if event.description:
+        lines.append(f"DESCRIPTION:{escape(event.description)}")
+    if event.location:
+        lines.append(f"LOCATION:{escape(event.location)}")
+    if event.rrule:
+        lines.append(f"RRULE:{event.rrule}")
+    elif event.recurrence_rule:
+        lines.append(f"RRULE:FREQ={event.recurrence_rule.upper()}")
+    if event.updated_at:
+        lines.append(f"LAST-MODIFIED:{event.updated_at:%Y%m%dT%H%M%SZ}")
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def generate_calendar(events, name='NEXUS AI'):
+    """Yield the .ics document piece by piece for an iterable of Event rows"""
+    tz = ZoneInfo(Config.TIMEZONE)
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape(name)}', f'X-WR-TIMEZONE:{Config.TIMEZONE}',
+    ))
+    for event in events:
+        yield event_to_ics(event, tz)
+    yield fold('END:VCALENDAR')
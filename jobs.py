@@ -0,0 +1,199 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Persistent background job queue for NEXUS AI
+    Jobs are rows in the `jobs` table, claimed atomically and run on a
+    bounded thread pool, so deferred work survives restarts and retries
+    """
+
+    def __init__(self):
+        self.app = None
+        self.handlers = {}
+        self.periodic = []
+        self.executor = None
+        self.scheduler = None
+        self._wakeup = threading.Event()
+        self._slots = None
+        self._stopping = False
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', 2)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', 5)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 3)
+        self.retry_delay = app.config.get('JOB_RETRY_DELAY', 30)
+        self.timeout = app.config.get('JOB_TIMEOUT', 600)
+        self.timezone = app.config.get('TIMEZONE', 'UTC')
+
+        # Wake the dispatcher as soon as a transaction with new jobs commits
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+
+    def task(self, name, max_attempts=None):
+        """Register a job handler under `name`"""
+        def decorator(func):
+            self.handlers[name] = (func, max_attempts)
+            return func
+        return decorator
+
+    def schedule(self, name, **cron):
+        """Enqueue job `name` on a cron schedule (evaluated in Config.TIMEZONE)"""
+        self.periodic.append((name, cron))
+
+    def enqueue(self, name, payload=None, delay=0, dedupe_key=None):
+        """Add a job to the current session; it runs once the caller commits"""
+        if name not in self.handlers:
+            raise ValueError(f"Unknown job: {name}")
+
+        _, max_attempts = self.handlers[name]
+        job = Job(
+            name=name,
+            payload=json.dumps(payload or {}),
+            max_attempts=max_attempts or self.max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+            dedupe_key=dedupe_key
+        )
+        db.session.add(job)
+        db.session.info['jobs_enqueued'] = True
+        return job
+
+    def start(self):
+        """Start the worker pool, dispatcher and periodic schedules"""
+        if self.executor:
+            return
+
+        # Imported here so importing the app stays cheap
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from apscheduler.triggers.cron import CronTrigger
+
+        self._requeue_stale()
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='nexus-job')
+        self._slots = threading.BoundedSemaphore(self.workers)
+        threading.Thread(target=self._dispatch_loop, name='nexus-job-dispatcher', daemon=True).start()
+
+        self.scheduler = BackgroundScheduler(timezone=self.timezone)
+        for name, cron in self.periodic:
+            self.scheduler.add_job(self._enqueue_periodic, CronTrigger(timezone=self.timezone, **cron),
+                                   args=[name], id=name, coalesce=True, max_instances=1)
+        self.scheduler.start()
+
+    def shutdown(self):
+        """Stop accepting work and wait for running jobs"""
+        self._stopping = True
+        self._wakeup.set()
+        if self.scheduler:
+            self.scheduler.shutdown(wait=False)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+    # ------------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------------
+
+    def _after_commit(self, session):
+        if session.info.pop('jobs_enqueued', False):
+            self._wakeup.set()
+
+    def _enqueue_periodic(self, name):
+        # Every process runs the same schedule; only the first to claim this minute's slot enqueues
+        slot = datetime.utcnow().replace(second=0, microsecond=0)
+        with self.app.app_context():
+            self.enqueue(name, dedupe_key=f"{name}@{slot.isoformat()}")
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+    def _requeue_stale(self):
+        """Put jobs left 'running' by a dead process back in the queue"""
+        with self.app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=self.timeout)
+            Job.query.filter(Job.status == 'running', Job.started_at < cutoff).update(
+                {Job.status: 'pending', Job.run_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+
+    def _dispatch_loop(self):
+        while not self._stopping:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self._dispatch()
+            except Exception:
+                logger.exception("Job dispatch failed")
+
+    def _dispatch(self):
+        with self.app.app_context():
+            while self._slots.acquire(blocking=False):
+                job_id = self._claim_next()
+                if job_id is None:
+                    self._slots.release()
+                    break
+                self.executor.submit(self._run, job_id)
+
+    def _claim_next(self):
+        """Atomically mark the next due job as running and return its id"""
+        now = datetime.utcnow()
+        candidates = db.session.query(Job.id).filter(
+            Job.status == 'pending',
+            Job.run_at <= now
+        ).order_by(Job.run_at).limit(self.workers).all()
+
+        for (job_id,) in candidates:
+            claimed = Job.query.filter(Job.id == job_id, Job.status == 'pending').update(
+                {Job.status: 'running', Job.started_at: now, Job.attempts: Job.attempts + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                return job_id
+        return None
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                job = db.session.get(Job, job_id)
+                handler, _ = self.handlers.get(job.name, (None, None))
+                try:
+                    if handler is None:
+                        raise ValueError(f"No handler registered for {job.name}")
+                    result = handler(**json.loads(job.payload or '{}'))
+                    job.status = 'completed'
+                    job.result = json.dumps(result) if result is not None else None
+                    job.last_error = None
+                except Exception as e:
+                    db.session.rollback()
+                    job = db.session.get(Job, job_id)
+                    job.last_error = f"{type(e).__name__}: {e}"
+                    if job.attempts < job.max_attempts:
+                        # Exponential backoff between attempts
+                        delay = self.retry_delay * (2 ** (job.attempts - 1))
+                        job.status = 'pending'
+                        job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+                    else:
+                        job.status = 'failed'
+                        logger.exception("Job %s (%s) failed", job.id, job.name)
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+try:
+    import httpx
+except ImportError:  # Optional dependency - the app falls back to local heuristics
+    httpx = None
+
+from models import db, LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+PROMPTS = {
+    'summary': (
+        "Summarize the user's note in at most three sentences. "
+        "Reply with the summary only."
+    ),
+    'tags': (
+        "For each numbered text, give up to 5 lowercase single-word topic tags. "
+        "Reply with a JSON array containing one array of tags per text, in order."
+    ),
+    'suggestion': (
+        "You are a productivity coach. In one short upbeat sentence, tell the user "
+        "why they should work on the given task now. Reply with the sentence only."
+    ),
+}
+
+
+class ResponseCache:
+    """
+    Prompt -> response cache with a bounded in-memory LRU in front of the
+    llm_cache table. Entries expire after `ttl`; the table is trimmed to
+    `max_entries` by least recent use
+    """
+
+    def __init__(self, app, ttl, max_entries, memory_entries=512):
+        self.app = app
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (created_at, response)
+        self._lock = threading.Lock()
+        self._stores = 0
+
+    def get(self, key):
+        now = datetime.utcnow()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit:
+                if now - hit[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    return hit[1]
+                del self._memory[key]
+
+        with self.app.app_context():
+            entry = db.session.get(LLMCacheEntry, key)
+            if not entry or now - entry.created_at >= self.ttl:
+                return None
+            entry.last_used_at = now
+            db.session.commit()
+            self._remember(key, entry.created_at, entry.response)
+            return entry.response
+
+    def set(self, key, kind, response):
+        now = datetime.utcnow()
+        self._remember(key, now, response)
+
+        with self.app.app_context():
+            entry = db.session.get(LLMCacheEntry, key) or LLMCacheEntry(key=key, kind=kind)
+            entry.response = response
+            entry.created_at = now
+            entry.last_used_at = now
+            db.session.add(entry)
+            db.session.commit()
+
+            self._stores += 1
+            if self._stores % 100 == 0:
+                self._evict(now)
+
+    def _remember(self, key, created_at, response):
+        with self._lock:
+            self._memory[key] = (created_at, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        """Drop expired rows, then the least recently used beyond the size bound"""
+        LLMCacheEntry.query.filter(LLMCacheEntry.created_at < now - self.ttl).delete(synchronize_session=False)
+        overflow = LLMCacheEntry.query.count() - self.max_entries
+        if overflow > 0:
+            oldest = db.session.query(LLMCacheEntry.key).order_by(LLMCacheEntry.last_used_at).limit(overflow)
+            LLMCacheEntry.query.filter(LLMCacheEntry.key.in_(oldest.scalar_subquery())).delete(synchronize_session=False)
+        db.session.commit()
+
+
+class LLMClient:
+    """
+    Non-blocking client for an OpenAI-compatible chat completions API
+    Calls run on a private asyncio loop with a pooled HTTP client. Identical
+    prompts in flight share one call, tagging prompts are batched, and
+    callers never wait longer than their timeout - a late answer still
+    lands in the cache for the next request
+    """
+
+    def __init__(self, app):
+        config = app.config
+        self.api_key = config.get('OPENAI_API_KEY')
+        self.base_url = config.get('OPENAI_BASE_URL').rstrip('/')
+        self.model = config.get('OPENAI_MODEL')
+        self.timeout = config.get('LLM_TIMEOUT')
+        self.request_timeout = config.get('LLM_REQUEST_TIMEOUT')
+        self.max_connections = config.get('LLM_MAX_CONNECTIONS')
+        self.batch_window = config.get('LLM_BATCH_WINDOW')
+        self.batch_size = config.get('LLM_BATCH_SIZE')
+        self.cache = ResponseCache(app, config.get('LLM_CACHE_TTL'), config.get('LLM_CACHE_MAX_ENTRIES'))
+
+        self._loop = None
+        self._http = None
+        self._tag_queue = None
+        self._inflight = {}  # cache key -> concurrent future
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return bool(self.api_key) and httpx is not None
+
+    def summarize(self, text, timeout=None):
+        return self.ask('summary', text, timeout)
+
+    def suggest(self, task, timeout=None):
+        prompt = f"Task: {task['title']}\nPriority: {task['priority']}\nDeadline: {task['deadline'] or 'none'}"
+        return self.ask('suggestion', prompt, timeout)
+
+    def tags(self, text, timeout=None):
+        response = self.ask('tags', text, timeout)
+        return json.loads(response) if response else None
+
+    def ask(self, kind, prompt, timeout=None):
+        """Return the model's answer, or None if it is unavailable or too slow"""
+        if not self.available:
+            return None
+
+        key = hashlib.sha256(f"{kind}\0{self.model}\0{prompt}".encode()).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self._fetch(kind, prompt), self._ensure_loop())
+                self._inflight[key] = future
+                future.add_done_callback(lambda f: self._finish(key, kind, f))
+
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            return None  # Keeps running; the result is cached when it arrives
+        except Exception as e:
+            logger.warning("LLM %s request failed: %s", kind, e)
+            return None
+
+    def close(self):
+        if self._loop:
+            if self._http:
+                asyncio.run_coroutine_threadsafe(self._http.aclose(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ------------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------------
+
+    def _ensure_loop(self):
+        """Start the event loop thread on first use"""
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='nexus-llm', daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+            self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={'Authorization': f'Bearer {self.api_key}'},
+            timeout=self.request_timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections)
+        )
+        self._tag_queue = asyncio.Queue()
+        asyncio.get_running_loop().create_task(self._batch_tags())
+
+    def _finish(self, key, kind, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if future.cancelled() or future.exception():
+            return
+        # Keep database writes off the event loop
+        self._loop.run_in_executor(None, self._store, key, kind, future.result())
+
+    def _store(self, key, kind, response):
+        try:
+            self.cache.set(key, kind, response)
+        except Exception as e:
+            logger.warning("Could not cache LLM response: %s", e)
+
+    async def _fetch(self, kind, prompt):
+        if kind == 'tags':
+            waiter = asyncio.get_running_loop().create_future()
+            await self._tag_queue.put((prompt, waiter))
+            return await waiter
+        return await self._chat(PROMPTS[kind], prompt)
+
+    async def _chat(self, system_prompt, user_prompt):
+        response = await self._http.post('/chat/completions', json={
+            'model': self.model,
+            'messages': [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': user_prompt},
+            ],
+            'temperature': 0.3,
+        })
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content'].strip()
+
+    async def _batch_tags(self):
+        """Collect tagging prompts for a short window and send them as one call"""
+        while True:
+            batch = [await self._tag_queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._tag_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.get_running_loop().create_task(self._send_tag_batch(batch))
+
+    async def _send_tag_batch(self, batch):
+        texts = '\n\n'.join(f"{i + 1}. {prompt}" for i, (prompt, _) in enumerate(batch))
+        try:
+            results = json.loads(await self._chat(PROMPTS['tags'], texts))
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise ValueError("Tag batch response does not match request size")
+        except Exception as e:
+            for _, waiter in batch:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        for (_, waiter), tags in zip(batch, results):
+            if not waiter.done():
+                waiter.set_result(json.dumps([str(t).lower() for t in tags][:5]))
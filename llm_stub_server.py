@@ -0,0 +1,75 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API
+
+Lets the language model path run fully offline:
+
+    python llm_stub_server.py --port 8089 --delay 0.2
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+
+Answers are deterministic so cached and fresh responses can be compared.
+"""
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_completion(system_prompt, user_prompt):
+    """Produce a plausible answer for each prompt kind the client sends"""
+    if 'JSON array' in system_prompt:
+        texts = re.split(r'(?:^|\n\n)\d+\. ', user_prompt)[1:]
+        tags = []
+        for text in texts:
+            words = re.findall(r'\b[a-z]{4,}\b', text.lower())
+            tags.append([w for w, _ in Counter(words).most_common(3)])
+        return json.dumps(tags)
+    if 'Summarize' in system_prompt:
+        return f"[stub] {user_prompt.strip()[:120]}"
+    task = user_prompt.splitlines()[0].replace('Task: ', '')
+    return f"[stub] Now is the perfect time for '{task}'!"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    calls = 0
+
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        messages = {m['role']: m['content'] for m in body['messages']}
+        StubHandler.calls += 1
+        time.sleep(self.delay)
+
+        content = fake_completion(messages.get('system', ''), messages.get('user', ''))
+        payload = json.dumps({
+            'id': f'stub-{StubHandler.calls}',
+            'object': 'chat.completion',
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        print(f"[stub #{StubHandler.calls}] {format % args}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline stub for the chat completions API')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before answering')
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
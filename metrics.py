@@ -0,0 +1,285 @@
+import hmac
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import g, request, has_request_context, Response, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values"""
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = _format_labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class CounterMetric:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into collapsed stacks"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, name='nexus-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+
+    def _sample(self):
+        while self._running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def report(self):
+        """Collapsed stacks (flamegraph.pl / speedscope format), hottest first"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class Metrics:
+    """
+    Request-level instrumentation for NEXUS AI
+    Records route latency, SQL query counts and durations (with N+1
+    detection), serialization time and AIEngine method timings, exposed in
+    Prometheus text format at /metrics and per request as Server-Timing
+    """
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            'nexus_http_request_duration_seconds', 'HTTP request latency', ('method', 'route', 'status'))
+        self.sql_queries = Histogram(
+            'nexus_sql_queries_per_request', 'SQL statements executed per request', ('route',), COUNT_BUCKETS)
+        self.sql_duration = Histogram(
+            'nexus_sql_query_duration_seconds', 'SQL statement latency', ('route',))
+        self.serialization = Histogram(
+            'nexus_serialization_seconds', 'Time spent in to_dict() per request', ('route',))
+        self.ai_duration = Histogram(
+            'nexus_ai_engine_duration_seconds', 'AIEngine method latency', ('method',))
+        self.n_plus_one = CounterMetric(
+            'nexus_sql_n_plus_one_total', 'Requests repeating one SQL statement past the threshold', ('route',))
+        self.collectors = []  # callables returning {metric name: value} gauges
+        self.n_plus_one_threshold = 10
+        self.profiling_enabled = False
+        self.token = None
+
+    def init_app(self, app):
+        self.n_plus_one_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+        self.profiling_enabled = app.config.get('PROFILING_ENABLED', False)
+        self.token = app.config.get('METRICS_TOKEN')
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        # Route names, latencies and SQL counts are not for everyone who can reach the app
+        if app.config.get('METRICS_ENABLED', False):
+            app.add_url_rule('/metrics', 'metrics', self.expose)
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def instrument_serialization(self, *models):
+        """Time every model's to_dict() and charge it to the current request"""
+        for model in models:
+            if getattr(model.to_dict, '_instrumented', False):
+                continue
+            model.to_dict = _timed_to_dict(model.to_dict)
+
+    def instrument_ai_engine(self, engine, methods):
+        """Record latency of the given AIEngine methods"""
+        for name in methods:
+            method = getattr(engine, name)
+            if not getattr(method, '_instrumented', False):
+                setattr(engine, name, self._timed_method(name, method))
+
+    def expose(self):
+        if self.token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {self.token}"):
+            abort(401)
+        lines = []
+        for metric in (self.request_duration, self.sql_queries, self.sql_duration,
+                       self.serialization, self.ai_duration, self.n_plus_one):
+            lines.extend(metric.expose())
+        for collector in self.collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    # ------------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------------
+
+    def _timed_method(self, name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.ai_duration.observe(elapsed, name)
+                if has_request_context():
+                    g.ai_time = g.get('ai_time', 0) + elapsed
+        wrapper._instrumented = True
+        return wrapper
+
+    def _before_request(self):
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.sql_statements = Counter()
+        g.serialize_time = 0.0
+        g.ai_time = 0.0
+
+        if self.profiling_enabled and (request.args.get('_profile') or request.headers.get('X-Profile')):
+            g.profiler = SamplingProfiler(threading.get_ident())
+            g.profiler.start()
+
+    def _after_request(self, response):
+        if 'request_start' not in g:
+            return response
+
+        total = time.perf_counter() - g.request_start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+        self.request_duration.observe(total, request.method, route, str(response.status_code))
+        self.sql_queries.observe(g.sql_count, route)
+        self.serialization.observe(g.serialize_time, route)
+
+        statement, repeats = (g.sql_statements.most_common(1) or [(None, 0)])[0]
+        if repeats > self.n_plus_one_threshold:
+            self.n_plus_one.inc(route)
+            logger.warning("Possible N+1 on %s: %d x %s", route, repeats, statement[:120])
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'sql;dur={g.sql_time * 1000:.2f};desc="{g.sql_count} queries"',
+            f'serialize;dur={g.serialize_time * 1000:.2f}',
+            f'ai;dur={g.ai_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        profiler = g.pop('profiler', None)
+        if profiler:
+            profiler.stop()
+            return Response(profiler.report() + '\n', status=response.status_code, mimetype='text/plain',
+                            headers={'Server-Timing': response.headers['Server-Timing']})
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when the view raises; never leave a sampler running
+        profiler = g.pop('profiler', None)
+        if profiler:
+            profiler.stop()
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+_LITERALS = re.compile(r"'[^']*'|\b\d+\b")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'sql_statements' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.sql_count += 1
+        g.sql_time += elapsed
+        g.sql_statements[_LITERALS.sub('?', statement)] += 1
+    else:
+        route = 'background'
+    metrics.sql_duration.observe(elapsed, route)
+
+
+def _timed_to_dict(to_dict):
+    @wraps(to_dict)
+    def wrapper(self):
+        start = time.perf_counter()
+        try:
+            return to_dict(self)
+        finally:
+            if has_request_context() and 'serialize_time' in g:
+                g.serialize_time += time.perf_counter() - start
+    wrapper._instrumented = True
+    return wrapper
+
+
+metrics = Metrics()
@@ -0,0 +1,150 @@
+"""
+Portable schema migrations
+
+db.create_all() only creates missing tables, so columns and indexes added
+to existing tables are brought in here. Every migration is idempotent
+and written against SQLAlchemy constructs, so the same list upgrades
+SQLite and PostgreSQL databases. Fresh databases run them too; they just
+find nothing to do and get recorded.
+"""
+import logging
+
+from sqlalchemy import String, cast, func, inspect, literal, select, text
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+from models import db, Task, Event, Note, TimeEntry, UserStats, Job, SchemaMigration, ArchivedTask, ArchivedTimeEntry
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(conn, column):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    table = column.table.name
+    if column.name in {c['name'] for c in inspect(conn).get_columns(table)}:
+        return
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+def create_index(conn, index):
+    index.create(conn, checkfirst=True)
+
+
+def timer_state(conn):
+    for column in ('last_heartbeat', 'paused_at', 'paused_seconds', 'credited_time'):
+        add_column(conn, TimeEntry.__table__.c[column])
+    for index in TimeEntry.__table__.indexes:
+        create_index(conn, index)
+
+
+def note_summaries(conn):
+    add_column(conn, Note.__table__.c.summary)
+
+
+def streak_day_index(conn):
+    add_column(conn, UserStats.__table__.c.streak_last_day)
+    add_column(conn, UserStats.__table__.c.streak_timezone)
+
+
+def jsonb_columns(conn):
+    """Convert JSON text columns created before JSONB support"""
+    if conn.dialect.name != 'postgresql':
+        return
+    for table, column in ((Task.__table__, 'tags'), (Note.__table__, 'tags'), (Note.__table__, 'linked_notes')):
+        current = {c['name']: c['type'] for c in inspect(conn).get_columns(table.name)}[column]
+        if current.__class__.__name__ != 'JSONB':
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column} TYPE jsonb "
+                f"USING NULLIF({column}, '')::jsonb"
+            ))
+
+
+def notes_search(conn):
+    if conn.dialect.name == 'postgresql':
+        for index in Note.__table__.indexes:
+            create_index(conn, index)
+
+
+def task_hierarchy(conn):
+    add_column(conn, Task.__table__.c.parent_id)
+    for index in Task.__table__.indexes:
+        create_index(conn, index)
+
+
+def event_uids(conn):
+    events = Event.__table__
+    for column in ('rrule', 'uid', 'updated_at'):
+        add_column(conn, events.c[column])
+    # Events created before import support get a stable UID for export and re-import
+    conn.execute(events.update().where(events.c.uid.is_(None)).values(
+        uid=literal('event-') + cast(events.c.id, String) + literal('@nexus-ai')
+    ))
+    for index in events.indexes:
+        create_index(conn, index)
+
+
+def job_dedupe_keys(conn):
+    add_column(conn, Job.__table__.c.dedupe_key)
+    for index in Job.__table__.indexes:
+        create_index(conn, index)
+
+
+def autoincrement_ids(conn):
+    """
+    Rebuild SQLite's tasks and time_entries with AUTOINCREMENT
+    Without it SQLite hands out max(id) + 1, so once the newest rows are
+    archived or deleted a new row can take an id already in the archive.
+    The sequence starts past both tables. PostgreSQL sequences never go
+    back, so there is nothing to do there.
+    """
+    if conn.dialect.name != 'sqlite':
+        return
+    for model, archive in ((Task, ArchivedTask), (TimeEntry, ArchivedTimeEntry)):
+        table = model.__table__
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {'name': table.name}).scalar()
+        if 'AUTOINCREMENT' not in sql.upper():
+            rebuilt = f"{table.name}_rebuild"
+            ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+            conn.execute(text(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)))
+            existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+            columns = ', '.join(c.name for c in table.columns if c.name in existing)
+            conn.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+            conn.execute(text(f"DROP TABLE {table.name}"))
+            conn.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+            for index in table.indexes:
+                create_index(conn, index)
+
+        highest = max(conn.execute(select(func.coalesce(func.max(column), 0))).scalar()
+                      for column in (table.c.id, archive.__table__.c.id))
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                     {'name': table.name, 'seq': highest})
+
+
+# (version, migration) in the order they were added - never renumber
+MIGRATIONS = [
+    (1, timer_state),
+    (2, note_summaries),
+    (3, streak_day_index),
+    (4, jsonb_columns),
+    (5, notes_search),
+    (6, task_hierarchy),
+    (7, event_uids),
+    (8, job_dedupe_keys),
+    (9, autoincrement_ids),
+]
+
+
+def upgrade():
+    """Apply pending migrations, each in its own transaction"""
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    db.session.commit()
+
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        with db.engine.begin() as conn:
+            migration(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(version=version, name=migration.__name__))
+        logger.info("Applied migration %s %s", version, migration.__name__)
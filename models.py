@@ -1,9 +1,48 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects import postgresql  # noqa: F401 - registers func.to_tsvector() before the index below uses it
+from sqlalchemy.types import TypeDecorator, String
 from datetime import datetime
 import json
+import uuid
 
 db = SQLAlchemy()
 
+class JSONText(TypeDecorator):
+    """
+    A JSON document held in Python as its JSON string
+    Stored as JSONB on PostgreSQL and as plain text everywhere else, so the
+    models keep their json.loads()/json.dumps() handling on every backend
+    """
+    impl = String
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import JSONB
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(self.impl)
+    
+    def process_bind_param(self, value, dialect):
+        if dialect.name == 'postgresql' and value is not None:
+            return json.loads(value) if value else None
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if dialect.name == 'postgresql' and value is not None:
+            return json.dumps(value)
+        return value
+
+# Text search configuration of the notes search index (fixed once the index exists)
+SEARCH_CONFIG = text("'english'::regconfig")
+
+def search_vector(*columns):
+    """tsvector over text columns, as indexed by ix_notes_search (queries must use the same expression)"""
+    document = func.coalesce(columns[0], literal_column("''"))
+    for column in columns[1:]:
+        document = document.op('||')(literal_column("' '")).op('||')(func.coalesce(column, literal_column("''")))
+    return func.to_tsvector(SEARCH_CONFIG, document)
+
 class Task(db.Model):
     """Task model for to-do list"""
     __tablename__ = 'tasks'
@@ -17,14 +56,19 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     order_index = db.Column(db.Integer, default=0)
-    tags = db.Column(db.String(500))  # JSON string of tags
+    tags = db.Column(JSONText(500))  # JSON string of tags (JSONB on PostgreSQL)
     estimated_time = db.Column(db.Integer)  # in minutes
     actual_time = db.Column(db.Integer, default=0)  # in minutes
     pomodoros_completed = db.Column(db.Integer, default=0)
+    parent_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), index=True)  # Subtask of
+    
+    # Never reuse an id: archived tasks keep theirs in tasks_archive
+    __table_args__ = {'sqlite_autoincrement': True}
     
     def to_dict(self):
         return {
             'id': self.id,
+            'parent_id': self.parent_id,
             'title': self.title,
             'description': self.description,
             'priority': self.priority,
@@ -39,6 +83,24 @@ class Task(db.Model):
             'pomodoros_completed': self.pomodoros_completed
         }
 
+class TaskDependency(db.Model):
+    """Blocker edge: `blocked_id` cannot start until `blocker_id` is completed"""
+    __tablename__ = 'task_dependencies'
+    
+    blocker_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+    blocked_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), primary_key=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'blocker_id': self.blocker_id,
+            'blocked_id': self.blocked_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+def new_event_uid():
+    return f"{uuid.uuid4()}@nexus-ai"
+
 class Event(db.Model):
     """Calendar event model"""
     __tablename__ = 'events'
@@ -52,8 +114,11 @@ class Event(db.Model):
     color = db.Column(db.String(20), default='#00ffff')  # Neon cyan default
     is_recurring = db.Column(db.Boolean, default=False)
     recurrence_rule = db.Column(db.String(100))  # daily, weekly, monthly
+    rrule = db.Column(db.String(500))  # Full iCalendar RRULE when imported, exported as-is
     task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'))
+    uid = db.Column(db.String(255), unique=True, index=True, default=new_event_uid)  # iCalendar UID, the import dedup key
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
         return {
@@ -66,6 +131,8 @@ class Event(db.Model):
             'color': self.color,
             'is_recurring': self.is_recurring,
             'recurrence_rule': self.recurrence_rule,
+            'rrule': self.rrule,
+            'uid': self.uid,
             'task_id': self.task_id
         }
 
@@ -76,17 +143,25 @@ class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    tags = db.Column(db.String(500))  # JSON string of tags
-    linked_notes = db.Column(db.String(500))  # JSON string of note IDs
+    tags = db.Column(JSONText(500))  # JSON string of tags (JSONB on PostgreSQL)
+    linked_notes = db.Column(JSONText(500))  # JSON string of note IDs (JSONB on PostgreSQL)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_favorite = db.Column(db.Boolean, default=False)
+    summary = db.Column(db.Text)  # Filled in by the background summarizer
+    
+    __table_args__ = (
+        # Full-text search (PostgreSQL only, SQLite falls back to LIKE)
+        db.Index('ix_notes_search', search_vector(title, content),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'content': self.content,
+            'summary': self.summary,
             'tags': json.loads(self.tags) if self.tags else [],
             'linked_notes': json.loads(self.linked_notes) if self.linked_notes else [],
             'created_at': self.created_at.isoformat(),
@@ -103,9 +178,81 @@ class TimeEntry(db.Model):
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime)
     duration = db.Column(db.Integer)  # in minutes
-    entry_type = db.Column(db.String(20), default='manual')  # manual, pomodoro
+    entry_type = db.Column(db.String(20), default='manual')  # manual, pomodoro, timer
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Live timer state (only used while entry_type == 'timer' and end_time is NULL)
+    last_heartbeat = db.Column(db.DateTime)
+    paused_at = db.Column(db.DateTime)
+    paused_seconds = db.Column(db.Integer, default=0)
+    credited_time = db.Column(db.Integer, default=0)  # minutes already added to task.actual_time
+    
+    __table_args__ = (
+        # Fast lookup of running entries per task
+        db.Index('ix_time_entries_running', task_id,
+                 sqlite_where=end_time.is_(None), postgresql_where=end_time.is_(None)),
+        # At most one open timer at a time
+        db.Index('uq_time_entries_active_timer', entry_type, unique=True,
+                 sqlite_where=end_time.is_(None) & (entry_type == 'timer'),
+                 postgresql_where=end_time.is_(None) & (entry_type == 'timer')),
+        # Never reuse an id: archived entries keep theirs in time_entries_archive
+        {'sqlite_autoincrement': True},
+    )
+    
+    @property
+    def is_running(self):
+        return self.entry_type == 'timer' and self.end_time is None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'start_time': self.start_time.isoformat(),
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'duration': self.duration,
+            'entry_type': self.entry_type,
+            'is_running': self.is_running,
+            'is_paused': self.is_running and self.paused_at is not None
+        }
+
+class ArchivedTask(db.Model):
+    """Completed task moved out of `tasks` by the archiver (see archive.py), under its original id"""
+    __tablename__ = 'tasks_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    priority = db.Column(db.String(20))
+    status = db.Column(db.String(20))
+    deadline = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime, index=True)
+    order_index = db.Column(db.Integer)
+    tags = db.Column(JSONText(500))
+    estimated_time = db.Column(db.Integer)
+    actual_time = db.Column(db.Integer)
+    pomodoros_completed = db.Column(db.Integer)
+    parent_id = db.Column(db.Integer)  # No foreign key: the parent may still be live, or gone
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        data = Task.to_dict(self)
+        data['archived'] = True
+        return data
+
+class ArchivedTimeEntry(db.Model):
+    """Finished time entry moved out of `time_entries` by the archiver, under its original id"""
+    __tablename__ = 'time_entries_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    task_id = db.Column(db.Integer, index=True)  # Live or archived task
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
+    end_time = db.Column(db.DateTime)
+    duration = db.Column(db.Integer)
+    entry_type = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -113,9 +260,22 @@ class TimeEntry(db.Model):
             'start_time': self.start_time.isoformat(),
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'duration': self.duration,
-            'entry_type': self.entry_type
+            'entry_type': self.entry_type,
+            'is_running': False,
+            'is_paused': False,
+            'archived': True
         }
 
+class AnalyticsGrid(db.Model):
+    """One year of logged minutes as a packed int16 array (see analytics_grids.py)"""
+    __tablename__ = 'analytics_grids'
+    
+    kind = db.Column(db.String(20), primary_key=True)  # daily, hours, tag
+    key = db.Column(db.String(100), primary_key=True, default='')  # Tag name for kind == 'tag'
+    year = db.Column(db.Integer, primary_key=True)  # Local calendar year
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class UserStats(db.Model):
     """User statistics and gamification"""
     __tablename__ = 'user_stats'
@@ -130,6 +290,8 @@ class UserStats(db.Model):
     badges = db.Column(db.String(1000))  # JSON string of earned badges
     level = db.Column(db.Integer, default=1)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
+    streak_last_day = db.Column(db.Integer)  # Local day index of the latest active day
+    streak_timezone = db.Column(db.String(50))  # Time zone the activity day index was computed in
     
     def to_dict(self):
         return {
@@ -144,3 +306,107 @@ class UserStats(db.Model):
             'level': self.level,
             'last_activity': self.last_activity.isoformat()
         }
+
+class Job(db.Model):
+    """Persistent background job"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON string of handler kwargs
+    status = db.Column(db.String(20), default='pending')  # pending, running, completed, failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON string
+    last_error = db.Column(db.Text)
+    dedupe_key = db.Column(db.String(100))  # Periodic jobs: name@slot, so each slot is enqueued once across processes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', status, run_at),
+        db.Index('uq_jobs_dedupe_key', dedupe_key, unique=True),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'payload': json.loads(self.payload) if self.payload else {},
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result': json.loads(self.result) if self.result else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat()
+        }
+
+class LLMCacheEntry(db.Model):
+    """Cached language model response, keyed by a hash of the prompt"""
+    __tablename__ = 'llm_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of kind + model + prompt
+    kind = db.Column(db.String(20), nullable=False)  # summary, tags, suggestion
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class DataVersion(db.Model):
+    """Per-table change counter, bumped on every flush that writes the table"""
+    __tablename__ = 'data_versions'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+class ActivityEvent(db.Model):
+    """Append-only log of gamified activity; streaks and badges derive from it"""
+    __tablename__ = 'activity_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(30), nullable=False)  # task_completed, pomodoro_completed, note_created, time_logged
+    occurred_at = db.Column(db.DateTime, nullable=False)  # UTC, may be backfilled
+    day = db.Column(db.Integer, nullable=False, index=True)  # Local day index (days since 1970-01-01 in UserStats.streak_timezone)
+    points = db.Column(db.Integer, default=0)
+    subject_id = db.Column(db.Integer)  # Task/note id the activity refers to
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_type': self.event_type,
+            'occurred_at': self.occurred_at.isoformat(),
+            'day': self.day,
+            'points': self.points,
+            'subject_id': self.subject_id
+        }
+
+class SchemaMigration(db.Model):
+    """Schema migrations applied to this database (see migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncOperation(db.Model):
+    """Write replayed from a client's offline outbox, kept so a resent batch is not applied twice"""
+    __tablename__ = 'sync_operations'
+    
+    id = db.Column(db.String(64), primary_key=True)  # Client-generated operation id
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    status_code = db.Column(db.Integer)
+    response = db.Column(db.Text)  # JSON string of the view's response body
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status_code,
+            'body': json.loads(self.response) if self.response else None
+        }
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from models import db, DataVersion
+
+
+class MemoryBackend:
+    """In-process LRU bounded by total body size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> CachedResponse
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self.bytes,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class SQLiteBackend:
+    """Cache file shared by every worker process on the host"""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    entry BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT entry FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def set(self, key, entry):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, entry, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(entry), entry.size, time.time())
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.evictions += 1
+
+    def clear(self):
+        self._connect().execute("DELETE FROM responses")
+
+    def stats(self):
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'backend': 'sqlite', 'entries': entries, 'bytes': size,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class CachedResponse:
+    __slots__ = ('body', 'mimetype', 'etag', 'created')
+
+    def __init__(self, body, mimetype, etag, created):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.created = created
+
+    def __getstate__(self):
+        return (self.body, self.mimetype, self.etag, self.created)
+
+    def __setstate__(self, state):
+        self.body, self.mimetype, self.etag, self.created = state
+
+    @property
+    def size(self):
+        return len(self.body)
+
+
+class ResponseCache:
+    """
+    Cache for read-heavy GET endpoints
+    Entries are keyed by route, query args and the data versions of the
+    tables the route reads, so any committed write makes them unreachable.
+    Responses carry strong ETags and honour If-None-Match
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+
+        if app.config.get('RESPONSE_CACHE_BACKEND') == 'sqlite':
+            path = app.config.get('RESPONSE_CACHE_PATH') or os.path.join(app.instance_path, 'response_cache.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path, max_bytes)
+        else:
+            self.backend = MemoryBackend(max_bytes)
+
+        # Bump table versions inside the same transaction as the write
+        if not event.contains(Session, 'after_flush', _bump_flushed_tables):
+            event.listen(Session, 'after_flush', _bump_flushed_tables)
+
+    def cached(self, *tables, max_age=None):
+        """
+        Serve a GET view from the cache while `tables` are unchanged
+        `max_age` (seconds) bounds entries whose output also depends on the clock
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                versions = get_versions(tables)
+                key = self._key(versions)
+                entry = self.backend.get(key)
+                if entry and max_age is not None and time.time() - entry.created > max_age:
+                    entry = None
+
+                if entry:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    body = response.get_data()
+                    entry = CachedResponse(body, response.mimetype, hashlib.sha256(body).hexdigest()[:32], time.time())
+                    self.backend.set(key, entry)
+
+                response = make_response(entry.body)
+                response.mimetype = entry.mimetype
+                response.set_etag(entry.etag)
+                response.headers['Cache-Control'] = 'no-cache'  # Always revalidate
+                response = response.make_conditional(request)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            **self.backend.stats()
+        }
+
+    def _key(self, versions):
+        args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        version_part = ','.join(f"{t}:{versions.get(t, 0)}" for t in sorted(versions))
+        return hashlib.sha256(f"{request.path}?{args}|{version_part}".encode()).hexdigest()
+
+
+def get_versions(tables):
+    """Current data version of each table"""
+    rows = db.session.query(DataVersion.table_name, DataVersion.version).filter(
+        DataVersion.table_name.in_(tables)
+    ).all()
+    versions = {table: 0 for table in tables}
+    versions.update(rows)
+    return versions
+
+
+def bump_version(*tables):
+    """Invalidate cached reads of `tables` after a bulk write that skips the ORM flush"""
+    db.session.execute(
+        update(DataVersion)
+        .where(DataVersion.table_name.in_(tables))
+        .values(version=DataVersion.version + 1)
+    )
+
+
+def seed_versions():
+    """Create a version row for every table so bumps are plain UPDATEs"""
+    existing = {name for (name,) in db.session.query(DataVersion.table_name)}
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing and table.name != DataVersion.__tablename__:
+            db.session.add(DataVersion(table_name=table.name, version=0))
+    db.session.commit()
+
+
+def _bump_flushed_tables(session, flush_context):
+    tables = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if not isinstance(obj, DataVersion)
+    }
+    if tables:
+        session.connection().execute(
+            update(DataVersion)
+            .where(DataVersion.table_name.in_(tables))
+            .values(version=DataVersion.version + 1)
+        )
+
+
+response_cache = ResponseCache()
@@ -12,7 +12,14 @@ let pomodoroTimer = null;
 let pomodoroSeconds = 25 * 60;
 let pomodoroRunning = false;
 let pomodoroSessionsToday = 0;
+let pomodoroOnBreak = false;
+let timerHeartbeat = null;
+let pomodoroTimerLive = false;  // The server's live timer is tracking this session
 let recognition = null;
+let awaitingWrites = new Set();  // Outbox operations a sendWrite() call is still waiting on
+
+const WRITE_TIMEOUT = 1500;  // ms a write waits for the server before the UI moves on
+const SYNC_INTERVAL = 30 * 1000;  // ms between outbox replays while writes are queued
 
 // ============================================================================
 // Initialization
@@ -29,6 +36,7 @@ function initializeApp() {
     console.log('🚀 NEXUS AI - Initializing...');
     loadUserStats();
     setupNavigation();
+    setupOfflineSync();
     
     if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
         setupVoiceRecognition();
@@ -178,6 +186,130 @@ function loadViewData(view) {
     }
 }
 
+// ============================================================================
+// Offline Sync
+// ============================================================================
+
+function setupOfflineSync() {
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+        navigator.serviceWorker.addEventListener('message', event => {
+            if (event.data && event.data.type === 'synced') onSynced(event.data.results);
+        });
+    }
+    
+    window.addEventListener('online', flushOutbox);
+    setInterval(flushOutbox, SYNC_INTERVAL);
+    flushOutbox();
+}
+
+async function sendWrite(method, path, body = null) {
+    // Every write goes through the outbox, so one that times out is replayed later, exactly once
+    let operation;
+    try {
+        operation = await Outbox.add(method, path, body);
+    } catch (error) {
+        // No IndexedDB (some private windows): talk to the server directly
+        const response = await fetch(path, {
+            method,
+            headers: { 'Content-Type': 'application/json' },
+            body: body === null ? undefined : JSON.stringify(body)
+        });
+        return { ok: response.ok, queued: false, data: response.status === 204 ? null : await response.json() };
+    }
+    
+    awaitingWrites.add(operation.id);
+    try {
+        const results = await withTimeout(Outbox.flush(), WRITE_TIMEOUT).catch(() => []);
+        const result = results.find(r => r.id === operation.id);
+        if (result) {
+            return { ok: result.status < 400, queued: false, data: result.body };
+        }
+    } finally {
+        awaitingWrites.delete(operation.id);
+    }
+    
+    requestBackgroundSync();
+    return { ok: true, queued: true, data: null };
+}
+
+async function flushOutbox() {
+    if (!navigator.onLine) return;
+    const results = await Outbox.flush().catch(() => []);
+    onSynced(results);
+}
+
+function onSynced(results) {
+    // Writes replayed after their sendWrite() gave up waiting
+    const replayed = results.filter(result => !awaitingWrites.has(result.id));
+    if (replayed.length === 0) return;
+    
+    const rejected = replayed.filter(result => result.status >= 400).length;
+    if (rejected > 0) {
+        showNotification(`Synced offline changes, ${rejected} rejected by the server`, 'error');
+    } else {
+        showNotification(`☁️ Synced ${replayed.length} offline change${replayed.length === 1 ? '' : 's'}`, 'success');
+    }
+    loadViewData(currentView);
+    loadUserStats();
+}
+
+function requestBackgroundSync() {
+    // Lets the service worker replay the outbox even after this tab is closed
+    if ('serviceWorker' in navigator && 'SyncManager' in window) {
+        navigator.serviceWorker.ready
+            .then(registration => registration.sync.register('nexus-outbox'))
+            .catch(() => {});
+    }
+}
+
+async function withPendingWrites(items, collection) {
+    // Show queued writes as if the server had applied them; new rows use their "$op:<id>" placeholder
+    const pending = await Outbox.all().catch(() => []);
+    const base = `/api/${collection}`;
+    const defaults = {
+        tasks: { status: 'pending', priority: 'medium', tags: [], description: '' },
+        notes: { tags: [], is_favorite: false },
+        events: {}
+    }[collection];
+    let result = items.slice();
+    
+    pending.forEach(op => {
+        if (op.path === base && op.method === 'POST') {
+            result.unshift({ ...defaults, ...op.body, id: `$op:${op.id}`, updated_at: op.queued_at });
+        } else if (op.path.startsWith(`${base}/`) && !op.path.slice(base.length + 1).includes('/')) {
+            const id = op.path.slice(base.length + 1);
+            if (op.method === 'DELETE') {
+                result = result.filter(item => String(item.id) !== id);
+            } else if (op.method === 'PUT') {
+                result = result.map(item => String(item.id) === id ? { ...item, ...op.body } : item);
+            }
+        }
+    });
+    return result;
+}
+
+async function fetchList(url, collection) {
+    // A list endpoint's rows with queued writes applied; [] plus queued rows if it cannot be read
+    const response = await fetch(url);
+    const items = response.ok ? await response.json() : [];
+    return withPendingWrites(items, collection);
+}
+
+function withTimeout(promise, ms) {
+    return Promise.race([
+        promise,
+        new Promise((resolve, reject) => setTimeout(() => reject(new Error('timeout')), ms))
+    ]);
+}
+
+function utcNow() {
+    // Naive UTC, the format the API stores
+    return new Date().toISOString().slice(0, 19);
+}
+
 // ============================================================================
 // Dashboard
 // ============================================================================
@@ -198,11 +330,8 @@ async function loadDashboard() {
         
         await loadUserStats();
         
-        const tasksResponse = await fetch('/api/tasks');
-        tasks = await tasksResponse.json();
-        
-        const notesResponse = await fetch('/api/notes');
-        notes = await notesResponse.json();
+        tasks = await fetchList('/api/tasks', 'tasks');
+        notes = await fetchList('/api/notes', 'notes');
         
         document.getElementById('totalTasks').textContent = tasks.length;
         document.getElementById('completedTasks').textContent = 
@@ -258,8 +387,10 @@ function loadBadges() {
 async function loadTasks(filter = 'all') {
     try {
         const url = filter === 'all' ? '/api/tasks' : `/api/tasks?status=${filter}`;
-        const response = await fetch(url);
-        tasks = await response.json();
+        tasks = await fetchList(url, 'tasks');
+        if (filter !== 'all') {
+            tasks = tasks.filter(t => t.status === filter);  // Queued edits may have moved a task
+        }
         
         renderTasks(tasks);
         updatePomodoroTaskSelect();
@@ -314,15 +445,15 @@ function createTaskCard(task) {
             </div>
         ` : ''}
         <div class="task-actions">
-            <button class="btn-sm btn-primary" onclick="editTask(${task.id})">
+            <button class="btn-sm btn-primary" onclick="editTask('${task.id}')">
                 <i class="fas fa-edit"></i> Edit
             </button>
             ${task.status !== 'completed' ? `
-                <button class="btn-sm btn-secondary" onclick="completeTask(${task.id})">
+                <button class="btn-sm btn-secondary" onclick="completeTask('${task.id}')">
                     <i class="fas fa-check"></i> Complete
                 </button>
             ` : ''}
-            <button class="btn-sm btn-danger" onclick="deleteTask(${task.id})">
+            <button class="btn-sm btn-danger" onclick="deleteTask('${task.id}')">
                 <i class="fas fa-trash"></i> Delete
             </button>
         </div>
@@ -333,13 +464,10 @@ function createTaskCard(task) {
 
 async function completeTask(taskId) {
     try {
-        await fetch(`/api/tasks/${taskId}`, {
-            method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ status: 'completed' })
-        });
+        const result = await sendWrite('PUT', `/api/tasks/${taskId}`, { status: 'completed', completed_at: utcNow() });
+        if (!result.ok) throw new Error(result.data && result.data.error);
         
-        showNotification('🎉 Task completed! +10 points', 'success');
+        showNotification(result.queued ? '🎉 Task completed! Points arrive when back online' : '🎉 Task completed! +10 points', 'success');
         await loadTasks();
         await loadUserStats();
         
@@ -353,7 +481,8 @@ async function deleteTask(taskId) {
     if (!confirm('Are you sure you want to delete this task?')) return;
     
     try {
-        await fetch(`/api/tasks/${taskId}`, { method: 'DELETE' });
+        const result = await sendWrite('DELETE', `/api/tasks/${taskId}`);
+        if (!result.ok) throw new Error(result.data && result.data.error);
         showNotification('Task deleted', 'info');
         await loadTasks();
     } catch (error) {
@@ -362,7 +491,7 @@ async function deleteTask(taskId) {
 }
 
 function editTask(taskId) {
-    const task = tasks.find(t => t.id === taskId);
+    const task = tasks.find(t => String(t.id) === String(taskId));
     if (!task) return;
     
     document.getElementById('taskId').value = task.id;
@@ -398,21 +527,11 @@ async function handleTaskSubmit(e) {
     };
     
     try {
-        if (taskId) {
-            await fetch(`/api/tasks/${taskId}`, {
-                method: 'PUT',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(taskData)
-            });
-            showNotification('Task updated!', 'success');
-        } else {
-            await fetch('/api/tasks', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(taskData)
-            });
-            showNotification('Task created!', 'success');
-        }
+        const result = taskId
+            ? await sendWrite('PUT', `/api/tasks/${taskId}`, taskData)
+            : await sendWrite('POST', '/api/tasks', taskData);
+        if (!result.ok) throw new Error(result.data && result.data.error);
+        showNotification(taskId ? 'Task updated!' : 'Task created!', 'success');
         
         closeModal('taskModal');
         await loadTasks();
@@ -445,8 +564,7 @@ function loadCalendar() {
         },
         events: async function(info, successCallback, failureCallback) {
             try {
-                const response = await fetch(`/api/events?start=${info.startStr}&end=${info.endStr}`);
-                const events = await response.json();
+                const events = await fetchList(`/api/events?start=${info.startStr}&end=${info.endStr}`, 'events');
                 successCallback(events);
             } catch (error) {
                 failureCallback(error);
@@ -475,11 +593,8 @@ async function handleEventSubmit(e) {
     };
     
     try {
-        await fetch('/api/events', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(eventData)
-        });
+        const result = await sendWrite('POST', '/api/events', eventData);
+        if (!result.ok) throw new Error(result.data && result.data.error);
         
         showNotification('Event created!', 'success');
         closeModal('eventModal');
@@ -528,6 +643,18 @@ function updatePomodoroDisplay() {
 function startPomodoro() {
     if (pomodoroRunning) return;
     
+    if (!pomodoroOnBreak) {
+        const taskId = document.getElementById('pomodoroTaskSelect').value;
+        const workDuration = parseInt(document.getElementById('workDuration').value) * 60;
+        const body = { task_id: taskId || null };
+        const started = pomodoroSeconds < workDuration
+            // The server closes idle timers, so fall back to a fresh one
+            ? timerRequest('resume').then(ok => ok || timerRequest('start', body))
+            : timerRequest('start', body);
+        started.then(ok => { pomodoroTimerLive = ok; });
+        timerHeartbeat = setInterval(() => timerRequest('heartbeat'), 60 * 1000);
+    }
+    
     pomodoroRunning = true;
     document.getElementById('startPomodoroBtn').style.display = 'none';
     document.getElementById('pausePomodoroBtn').style.display = 'inline-flex';
@@ -544,15 +671,28 @@ function startPomodoro() {
 }
 
 function pausePomodoro() {
+    if (pomodoroRunning && !pomodoroOnBreak) {
+        timerRequest('pause');
+    }
+    stopPomodoroInterval();
+}
+
+function stopPomodoroInterval() {
     pomodoroRunning = false;
     clearInterval(pomodoroTimer);
+    clearInterval(timerHeartbeat);
     document.getElementById('startPomodoroBtn').style.display = 'inline-flex';
     document.getElementById('pausePomodoroBtn').style.display = 'none';
     document.getElementById('timerStatus').textContent = 'Paused';
 }
 
 function resetPomodoro() {
-    pausePomodoro();
+    stopPomodoroInterval();
+    if (!pomodoroOnBreak) {
+        timerRequest('stop');
+        pomodoroTimerLive = false;
+    }
+    pomodoroOnBreak = false;
     const workDuration = parseInt(document.getElementById('workDuration').value);
     pomodoroSeconds = workDuration * 60;
     updatePomodoroDisplay();
@@ -560,7 +700,11 @@ function resetPomodoro() {
 }
 
 async function completePomodoroSession() {
-    pausePomodoro();
+    stopPomodoroInterval();
+    if (pomodoroOnBreak) {
+        resetPomodoro();
+        return;
+    }
     showNotification('🎉 Pomodoro completed! Great work!', 'success');
     
     pomodoroSessionsToday++;
@@ -568,13 +712,15 @@ async function completePomodoroSession() {
     
     const taskId = document.getElementById('pomodoroTaskSelect').value;
     const duration = parseInt(document.getElementById('workDuration').value);
+    const session = { task_id: taskId || null, duration };
+    if (!pomodoroTimerLive) {
+        // No live timer saw this session (offline): the server records it as ending now
+        session.completed_at = utcNow();
+    }
+    pomodoroTimerLive = false;
     
     try {
-        await fetch('/api/pomodoro/complete', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ task_id: taskId || null, duration })
-        });
+        await sendWrite('POST', '/api/pomodoro/complete', session);
         
         await loadUserStats();
     } catch (error) {
@@ -588,11 +734,26 @@ async function completePomodoroSession() {
         parseInt(document.getElementById('shortBreak').value);
     
     pomodoroSeconds = breakDuration * 60;
+    pomodoroOnBreak = true;
     document.getElementById('timerStatus').textContent = 
         isLongBreak ? '☕ Long break time!' : '☕ Short break time!';
     updatePomodoroDisplay();
 }
 
+async function timerRequest(action, body = {}) {
+    try {
+        const response = await fetch(`/api/timer/${action}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        return response.ok;
+    } catch (error) {
+        console.error(`Error sending timer ${action}:`, error);
+        return false;
+    }
+}
+
 function addSessionDot() {
     const dotsContainer = document.getElementById('sessionDots');
     const dot = document.createElement('div');
@@ -607,8 +768,12 @@ function addSessionDot() {
 async function loadNotes(searchQuery = '') {
     try {
         const url = searchQuery ? `/api/notes?search=${encodeURIComponent(searchQuery)}` : '/api/notes';
-        const response = await fetch(url);
-        notes = await response.json();
+        if (searchQuery) {
+            const response = await fetch(url);
+            notes = response.ok ? await response.json() : [];
+        } else {
+            notes = await fetchList(url, 'notes');
+        }
         
         renderNotes(notes);
     } catch (error) {
@@ -663,7 +828,7 @@ function createNoteCard(note) {
 }
 
 function editNote(noteId) {
-    const note = notes.find(n => n.id === noteId);
+    const note = notes.find(n => String(n.id) === String(noteId));
     if (!note) return;
     
     document.getElementById('noteId').value = note.id;
@@ -689,21 +854,11 @@ async function handleNoteSubmit(e) {
     };
     
     try {
-        if (noteId) {
-            await fetch(`/api/notes/${noteId}`, {
-                method: 'PUT',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(noteData)
-            });
-            showNotification('Note updated!', 'success');
-        } else {
-            await fetch('/api/notes', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(noteData)
-            });
-            showNotification('Note created! +3 points', 'success');
-        }
+        const result = noteId
+            ? await sendWrite('PUT', `/api/notes/${noteId}`, noteData)
+            : await sendWrite('POST', '/api/notes', noteData);
+        if (!result.ok) throw new Error(result.data && result.data.error);
+        showNotification(noteId ? 'Note updated!' : 'Note created! +3 points', 'success');
         
         closeModal('noteModal');
         await loadNotes();
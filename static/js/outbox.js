@@ -0,0 +1,105 @@
+// ============================================================================
+// NEXUS AI - Offline Outbox
+// Writes made while the server is unreachable are kept in IndexedDB and
+// replayed in order through /api/sync/batch. Loaded by the page and by the
+// service worker, so either one can flush it.
+// ============================================================================
+
+const Outbox = (() => {
+    const DB_NAME = 'nexus-offline';
+    const STORE = 'outbox';
+    const BATCH_SIZE = 25;
+    let database = null;
+    let flushing = null;
+
+    function open() {
+        if (database) return database;
+        database = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                // seq keeps operations in the order they were made
+                request.result.createObjectStore(STORE, { keyPath: 'seq', autoIncrement: true });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+        return database;
+    }
+
+    async function transaction(mode, work) {
+        const db = await open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE, mode);
+            const result = work(tx.objectStore(STORE));
+            tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    function newId() {
+        if (self.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    async function add(method, path, body = null) {
+        const operation = { id: newId(), method, path, body, queued_at: new Date().toISOString() };
+        await transaction('readwrite', store => store.add(operation));
+        return operation;
+    }
+
+    function all() {
+        return transaction('readonly', store => store.getAll());
+    }
+
+    function peek(limit) {
+        return transaction('readonly', store => store.getAll(null, limit));
+    }
+
+    function count() {
+        return transaction('readonly', store => store.count());
+    }
+
+    function remove(seqs) {
+        return transaction('readwrite', store => seqs.forEach(seq => store.delete(seq)));
+    }
+
+    async function replay() {
+        const results = [];
+        while (true) {
+            const operations = await peek(BATCH_SIZE);
+            if (operations.length === 0) break;
+
+            let response;
+            try {
+                response = await fetch('/api/sync/batch', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        operations: operations.map(({ id, method, path, body }) => ({ id, method, path, body }))
+                    })
+                });
+            } catch (error) {
+                break;  // Still offline
+            }
+            if (!response.ok) break;
+
+            // Client errors are final; a server error stops the replay so order is kept
+            const replayed = (await response.json()).results.filter(result => result.status < 500);
+            const done = new Set(replayed.map(result => result.id));
+            await remove(operations.filter(op => done.has(op.id)).map(op => op.seq));
+            results.push(...replayed);
+            if (replayed.length < operations.length) break;
+        }
+        return results;
+    }
+
+    function flush() {
+        // One replay at a time per context; the server ignores operations it has already applied
+        if (!flushing) {
+            flushing = replay().finally(() => { flushing = null; });
+        }
+        return flushing;
+    }
+
+    return { add, all, count, flush };
+})();
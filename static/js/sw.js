@@ -0,0 +1,127 @@
+// ============================================================================
+// NEXUS AI - Service Worker
+// Serves the app shell from cache, answers API reads from the network with
+// a short timeout and a cached fallback, and replays the offline outbox
+// when the connection comes back.
+// ============================================================================
+
+importScripts('/static/js/outbox.js');
+
+const CACHE_VERSION = 'nexus-v1';
+const STATIC_CACHE = `${CACHE_VERSION}-static`;
+const API_CACHE = `${CACHE_VERSION}-api`;
+const STATIC_ASSETS = ['/', '/static/css/style.css', '/static/js/app.js', '/static/js/outbox.js'];
+const API_CACHE_LIMIT = 100;  // Recent API reads kept for offline use
+const NETWORK_TIMEOUT = 3000;  // ms before a slow API read is answered from cache
+const NO_CACHE_API = ['/api/sync/', '/api/timer', '/api/jobs', '/api/cache/'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(STATIC_ASSETS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => !key.startsWith(CACHE_VERSION)).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;  // Writes go through the page's outbox
+
+    const url = new URL(request.url);
+    if (url.origin === self.location.origin && url.pathname.startsWith('/api/')) {
+        if (!NO_CACHE_API.some(prefix => url.pathname.startsWith(prefix))) {
+            event.respondWith(networkFirst(request));
+        }
+    } else if (url.origin !== self.location.origin || url.pathname === '/' || url.pathname.startsWith('/static/')) {
+        // App shell, plus the fonts, icons and calendar library from CDNs
+        event.respondWith(staleWhileRevalidate(request));
+    }
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === 'nexus-outbox') {
+        event.waitUntil(flushOutbox());
+    }
+});
+
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'flush') {
+        event.waitUntil(flushOutbox());
+    }
+});
+
+// ============================================================================
+// Caching Strategies
+// ============================================================================
+
+async function staleWhileRevalidate(request) {
+    const cache = await caches.open(STATIC_CACHE);
+    const cached = await cache.match(request);
+    const network = fetch(request)
+        .then(response => {
+            if (response.ok || response.type === 'opaque') {
+                cache.put(request, response.clone());
+            }
+            return response;
+        })
+        .catch(() => cached);
+    return cached || network;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(API_CACHE);
+    const network = fetch(request).then(response => {
+        if (response.ok) {
+            cache.put(request, response.clone()).then(() => trimCache(cache));
+        }
+        return response;
+    });
+
+    try {
+        return await Promise.race([
+            network,
+            new Promise((resolve, reject) => setTimeout(() => reject(new Error('timeout')), NETWORK_TIMEOUT))
+        ]);
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        try {
+            return await network;  // Nothing cached: keep waiting on the slow server
+        } catch (networkError) {
+            return new Response(JSON.stringify({ error: 'Offline and not cached' }), {
+                status: 503,
+                headers: { 'Content-Type': 'application/json' }
+            });
+        }
+    }
+}
+
+async function trimCache(cache) {
+    // Keys come back in insertion order, so the oldest reads go first
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - API_CACHE_LIMIT)).map(key => cache.delete(key)));
+}
+
+// ============================================================================
+// Outbox Replay
+// ============================================================================
+
+async function flushOutbox() {
+    const results = await Outbox.flush();
+    if (results.length === 0) return;
+
+    // Replayed writes change what the API returns
+    await caches.delete(API_CACHE);
+    const windows = await self.clients.matchAll({ type: 'window' });
+    windows.forEach(client => client.postMessage({ type: 'synced', results }));
+}
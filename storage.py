@@ -0,0 +1,67 @@
+"""
+Storage backend helpers for NEXUS AI
+
+SQLite is the default. PostgreSQL is supported by pointing DATABASE_URL
+at it (postgres://, postgresql:// or postgresql+psycopg://). The helpers
+here keep the rest of the app backend-agnostic: JSON columns become
+JSONB, note search uses a tsvector index, and the engine gets a
+connection pool.
+"""
+
+from sqlalchemy import func, select, type_coerce
+
+from models import db, search_vector, SEARCH_CONFIG
+
+def normalize_database_url(url):
+    """Use the psycopg 3 driver for plain PostgreSQL URLs"""
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            return 'postgresql+psycopg://' + url[len(prefix):]
+    return url
+
+
+def engine_options(config):
+    """SQLAlchemy engine options for the configured database"""
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,  # Survive server restarts and idle disconnects
+    }
+
+
+def is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def text_search(columns, search):
+    """Filter clause matching `search` in any of `columns`"""
+    if is_postgres():
+        return search_vector(*columns).op('@@')(func.plainto_tsquery(SEARCH_CONFIG, search))
+    clause = columns[0].contains(search)
+    for column in columns[1:]:
+        clause = clause | column.contains(search)
+    return clause
+
+
+def json_array_contains(column, value):
+    """Filter clause for JSON array columns holding `value`"""
+    if is_postgres():
+        from sqlalchemy.dialects.postgresql import JSONB
+        return type_coerce(column, JSONB).contains([value])
+    return column.contains(value)
+
+
+def reset_sequences(*tables):
+    """Move PostgreSQL id sequences past rows inserted with explicit ids"""
+    if not is_postgres():
+        return
+    for table in tables:
+        db.session.execute(
+            select(func.setval(func.pg_get_serial_sequence(table.name, 'id'),
+                               select(func.coalesce(func.max(table.c.id), 0) + 1).scalar_subquery(), False))
+        )
+
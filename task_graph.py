@@ -0,0 +1,163 @@
+"""
+Task dependency graph
+
+Tasks are ordered by two relations: a blocker must finish before the
+tasks it blocks, and subtasks must finish before their parent. Both are
+folded into one precedence graph (edge u -> v means u comes first) held
+as adjacency lists. Every operation is a single O(V + E) pass, and the
+graph is cached until the tasks or task_dependencies tables change.
+"""
+import threading
+from collections import defaultdict, deque
+
+from models import db, Task, TaskDependency
+from response_cache import get_versions
+
+DEFAULT_ESTIMATE = 60  # minutes assumed for tasks without an estimate, as in AIEngine
+
+
+class TaskGraph:
+    """Precedence graph over all tasks, built from two column selects"""
+
+    def __init__(self, tasks, dependencies):
+        self.status = {}
+        self.minutes = {}
+        self.parent = {}
+        self.children = defaultdict(list)
+        self.blockers = defaultdict(list)
+        self.blocks = defaultdict(list)
+        self.succ = defaultdict(list)
+        self.pred = defaultdict(list)
+
+        for task_id, status, estimated_time, parent_id in tasks:
+            self.status[task_id] = status
+            self.minutes[task_id] = estimated_time or DEFAULT_ESTIMATE
+            if parent_id is not None:
+                self.parent[task_id] = parent_id
+                self.children[parent_id].append(task_id)
+                self.succ[task_id].append(parent_id)
+                self.pred[parent_id].append(task_id)
+
+        for blocker_id, blocked_id in dependencies:
+            self.blockers[blocked_id].append(blocker_id)
+            self.blocks[blocker_id].append(blocked_id)
+            self.succ[blocker_id].append(blocked_id)
+            self.pred[blocked_id].append(blocker_id)
+
+        self._critical = None
+        self._critical_ids = set()
+
+    @classmethod
+    def load(cls):
+        tasks = db.session.query(Task.id, Task.status, Task.estimated_time, Task.parent_id)
+        dependencies = db.session.query(TaskDependency.blocker_id, TaskDependency.blocked_id)
+        return cls(tasks, dependencies)
+
+    def is_open(self, task_id):
+        return task_id in self.status and self.status[task_id] != 'completed'
+
+    def would_create_cycle(self, before, after):
+        """True if requiring `before` to finish ahead of `after` closes a cycle"""
+        if before == after:
+            return True
+        # The new edge closes a cycle iff `after` already reaches `before`
+        seen = {after}
+        stack = [after]
+        while stack:
+            for nxt in self.succ.get(stack.pop(), ()):
+                if nxt == before:
+                    return True
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return False
+
+    def is_ready(self, task_id):
+        """Open, and every blocker and subtask is completed"""
+        return self.is_open(task_id) and not any(self.is_open(p) for p in self.pred.get(task_id, ()))
+
+    def ready(self):
+        return [task_id for task_id in self.status if self.is_ready(task_id)]
+
+    def unblocks(self, task_id):
+        """Open tasks waiting directly on this one"""
+        return sum(1 for s in self.succ.get(task_id, ()) if self.is_open(s))
+
+    def topological_order(self):
+        """Open tasks in dependency order (Kahn); tasks on a cycle are left out"""
+        indegree = {t: 0 for t in self.status if self.is_open(t)}
+        for task_id in indegree:
+            for s in self.succ.get(task_id, ()):
+                if s in indegree:
+                    indegree[s] += 1
+
+        queue = deque(t for t, d in indegree.items() if d == 0)
+        order = []
+        while queue:
+            task_id = queue.popleft()
+            order.append(task_id)
+            for s in self.succ.get(task_id, ()):
+                if s in indegree:
+                    indegree[s] -= 1
+                    if indegree[s] == 0:
+                        queue.append(s)
+        return order
+
+    def critical_path(self):
+        """Longest chain of open tasks by estimated minutes: (task ids, total minutes)"""
+        if self._critical is None:
+            finish = {}
+            via = {}
+            for task_id in self.topological_order():
+                start, best = 0, None
+                for p in self.pred.get(task_id, ()):
+                    if finish.get(p, 0) > start:
+                        start, best = finish[p], p
+                finish[task_id] = start + self.minutes[task_id]
+                via[task_id] = best
+
+            path = []
+            end = max(finish, key=finish.get, default=None)
+            total = finish[end] if end is not None else 0
+            while end is not None:
+                path.append(end)
+                end = via[end]
+            path.reverse()
+            self._critical = (path, total)
+            self._critical_ids = set(path)
+        return self._critical
+
+    def on_critical_path(self, task_id):
+        self.critical_path()
+        return task_id in self._critical_ids
+
+    def neighbours(self, task_id):
+        return {
+            'parent_id': self.parent.get(task_id),
+            'children': list(self.children.get(task_id, ())),
+            'blocked_by': list(self.blockers.get(task_id, ())),
+            'blocks': list(self.blocks.get(task_id, ())),
+            'ready': self.is_ready(task_id),
+        }
+
+
+_cache = {'key': None, 'graph': None}
+_cache_lock = threading.Lock()
+
+
+def get_task_graph():
+    """
+    The current graph, rebuilt only after tasks or dependencies change
+    For reads only: writes check cycles on a fresh TaskGraph.load(), so an
+    uncommitted change can never end up cached
+    """
+    versions = get_versions(('tasks', 'task_dependencies'))
+    key = (str(db.engine.url), tuple(sorted(versions.items())))
+    with _cache_lock:
+        if _cache['key'] == key:
+            return _cache['graph']
+
+    graph = TaskGraph.load()
+    with _cache_lock:
+        _cache.update(key=key, graph=graph)
+    return graph
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import Config
+from app import create_app, init_db
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a fresh SQLite file, inside an app context, without background services"""
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        BACKGROUND_SERVICES = False
+        THROTTLE_ENABLED = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    init_db()
+    return app.test_client()
@@ -0,0 +1,102 @@
+"""
+Ids stay unique across the hot tables and their archive
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+
+from config import Config
+from app import init_db
+from archive import archive_history
+from migrations import upgrade
+from models import db, Task, TimeEntry, ArchivedTask, ArchivedTimeEntry, SchemaMigration
+
+
+def add_history(count):
+    """`count` tasks completed long ago, each with one finished time entry"""
+    done = datetime.utcnow() - timedelta(days=Config.ARCHIVE_AFTER_DAYS + 30)
+    for i in range(count):
+        task = Task(title=f"Old task {i}", status='completed', completed_at=done)
+        db.session.add(task)
+        db.session.flush()
+        db.session.add(TimeEntry(task_id=task.id, start_time=done - timedelta(hours=1),
+                                 end_time=done, duration=60))
+    db.session.commit()
+
+
+def table_sql(name):
+    return db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE name = :name"), {'name': name}).scalar()
+
+
+def test_archiving_the_newest_rows_does_not_free_their_ids(app):
+    init_db()
+    add_history(3)
+
+    moved = archive_history()
+    assert moved == {'time_entries': 3, 'tasks': 3}
+
+    task = Task(title='New task')
+    db.session.add(task)
+    db.session.flush()
+    entry = TimeEntry(task_id=task.id, start_time=datetime.utcnow(), duration=5)
+    db.session.add(entry)
+    db.session.commit()
+    assert task.id == 4
+    assert entry.id == 4
+
+
+def test_delete_after_archive_does_not_reuse_archived_ids(app):
+    init_db()
+    add_history(2)
+    live = Task(title='Still open')
+    db.session.add(live)
+    db.session.commit()
+    assert live.id == 3
+
+    archive_history()
+    assert {row.id for row in ArchivedTask.query} == {1, 2}
+
+    client = app.test_client()
+    assert client.delete(f"/api/tasks/{live.id}").status_code == 204
+    created = client.post('/api/tasks', json={'title': 'After delete'}).get_json()
+    assert created['id'] == 4
+
+    # The next pass must not collide with ids already in the archive
+    add_history(1)
+    assert archive_history() == {'time_entries': 1, 'tasks': 1}
+    assert ArchivedTask.query.count() == 3
+    assert ArchivedTimeEntry.query.count() == 3
+
+
+def test_migration_rebuilds_tables_without_autoincrement(app, monkeypatch):
+    # A database created before the tables used AUTOINCREMENT
+    for model in (Task, TimeEntry):
+        monkeypatch.setitem(model.__table__.dialect_options['sqlite'], 'autoincrement', False)
+    db.create_all()
+    monkeypatch.undo()
+    add_history(2)
+    db.session.add(Task(title='Still open'))
+    db.session.commit()
+    archive_history()
+    db.session.execute(db.delete(Task.__table__).where(Task.id == 3))
+    db.session.commit()
+    assert 'AUTOINCREMENT' not in table_sql('tasks')
+
+    upgrade()
+
+    assert 'AUTOINCREMENT' in table_sql('tasks')
+    assert 'AUTOINCREMENT' in table_sql('time_entries')
+    assert SchemaMigration.query.filter_by(name='autoincrement_ids').count() == 1
+    indexes = {row[0] for row in db.session.execute(db.text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'time_entries'"))}
+    assert {'ix_time_entries_running', 'uq_time_entries_active_timer'} <= indexes
+
+    # Ids 1 and 2 live on in the archive; SQLite alone would hand out 1 again
+    task = Task(title='New task')
+    db.session.add(task)
+    db.session.flush()
+    entry = TimeEntry(task_id=task.id, start_time=datetime.utcnow(), duration=5)
+    db.session.add(entry)
+    db.session.commit()
+    assert task.id == 3
+    assert entry.id == 3
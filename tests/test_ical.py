@@ -0,0 +1,178 @@
+"""
+iCalendar parsing, UID upserts, the feed and the URL import guard
+
+    python -m pytest tests
+"""
+import io
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import ical
+from config import Config
+from models import db, Event
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures', 'sample.ics')
+
+
+def calendar(*events):
+    """An .ics document (bytes) holding VEVENTs given as lists of content lines"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Test//EN']
+    for event in events:
+        lines += ['BEGIN:VEVENT', *event, 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return ''.join(ical.fold(line) for line in lines).encode()
+
+
+def meeting(uid, summary='Meeting', *extra):
+    return [f"UID:{uid}", 'DTSTART:20260115T140000Z', 'DTEND:20260115T150000Z', f"SUMMARY:{summary}", *extra]
+
+
+# ============================================================================
+# Parsing
+# ============================================================================
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_parser_reads_any_chunking_the_same(monkeypatch, chunk_size):
+    # Lines, CRLFs and folded continuations all straddle chunk boundaries at small sizes
+    monkeypatch.setattr(ical, 'CHUNK_SIZE', chunk_size)
+    with open(FIXTURE, 'rb') as f:
+        rows = [ical.to_row(properties, ZoneInfo('UTC')) for properties in ical.parse_events(f)]
+    by_uid = {row['uid']: row for row in rows if row}
+
+    assert rows.count(None) == 1  # No UID
+    assert by_uid['standup@example.com']['start_time'] == datetime(2026, 1, 5, 8, 30)
+    assert by_uid['standup@example.com']['description'] == 'Blockers, progress; plans'  # Not the VALARM's
+    assert by_uid['standup@example.com#20260107T093000']['start_time'] == datetime(2026, 1, 7, 10, 0)
+    assert 'draft so we can go' in by_uid['offsite@example.com']['description']
+    assert by_uid['review@example.com']['end_time'] == datetime(2026, 1, 15, 15, 30)
+    assert by_uid['dentist@example.com']['cancelled']
+
+
+def test_long_utf8_lines_fold_and_unfold():
+    title = 'Planung für das Team — ' * 10
+    events = list(ical.parse_events(io.BytesIO(calendar(meeting('fold@test', ical.escape(title))))))
+    assert ical.unescape(events[0]['SUMMARY'][1]) == title
+    assert all(len(line.encode()) <= 75 for line in ical.fold(f"SUMMARY:{title}").split('\r\n'))
+
+
+def test_oversized_rrule_keeps_only_the_frequency():
+    rule = 'FREQ=WEEKLY;BYDAY=MO;EXDATE=' + ','.join(['20260101T000000Z'] * 40)
+    properties = next(ical.parse_events(io.BytesIO(calendar(meeting('long@test', 'Long', f"RRULE:{rule}")))))
+    row = ical.to_row(properties, ZoneInfo('UTC'))
+    assert len(rule) > 500
+    assert (row['is_recurring'], row['recurrence_rule'], row['rrule']) == (True, 'weekly', None)
+
+
+# ============================================================================
+# Import
+# ============================================================================
+
+def test_reimport_updates_by_uid(client):
+    first = client.post('/api/calendar/import', data=calendar(meeting('a@test'), meeting('b@test')),
+                        content_type='text/calendar').get_json()
+    assert first == {'created': 2, 'updated': 0, 'cancelled': 0, 'skipped': 0}
+
+    again = client.post('/api/calendar/import', data=calendar(meeting('a@test', 'Renamed'), meeting('c@test')),
+                        content_type='text/calendar').get_json()
+    assert again == {'created': 1, 'updated': 1, 'cancelled': 0, 'skipped': 0}
+    assert Event.query.count() == 3
+    assert Event.query.filter_by(uid='a@test').one().title == 'Renamed'
+
+
+def test_import_in_batches_and_repeated_uids(client, monkeypatch):
+    monkeypatch.setattr(Config, 'ICAL_IMPORT_BATCH_SIZE', 2)
+    events = [meeting(f"e{i}@test") for i in range(5)] + [meeting('e0@test', 'Last wins')]
+    counts = client.post('/api/calendar/import', data=calendar(*events), content_type='text/calendar').get_json()
+    assert counts['created'] + counts['updated'] == 6
+    assert Event.query.count() == 5
+    assert Event.query.filter_by(uid='e0@test').one().title == 'Last wins'
+
+
+def test_cancellation_counts_only_removed_events(client):
+    client.post('/api/calendar/import', data=calendar(meeting('a@test')), content_type='text/calendar')
+    counts = client.post('/api/calendar/import', content_type='text/calendar', data=calendar(
+        meeting('a@test', 'Gone', 'STATUS:CANCELLED'),
+        meeting('never@test', 'Never stored', 'STATUS:CANCELLED'),
+    )).get_json()
+    assert counts == {'created': 0, 'updated': 0, 'cancelled': 1, 'skipped': 1}
+    assert Event.query.count() == 0
+
+
+def test_feed_is_byte_identical_under_its_etag(client):
+    client.post('/api/calendar/import', data=calendar(meeting('a@test')), content_type='text/calendar')
+    Event.query.filter_by(uid='a@test').one().updated_at = datetime(2026, 1, 2, 3, 4, 5)
+    db.session.commit()
+    # Buffered: a streamed body holds its request context until it is read
+    first = client.get('/api/calendar/feed.ics', buffered=True)
+    second = client.get('/api/calendar/feed.ics', buffered=True)
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.get_data() == second.get_data()
+    assert b'DTSTAMP:20260102T030405Z' in first.get_data()  # When the event changed, not when it was served
+
+    unchanged = client.get('/api/calendar/feed.ics', headers={'If-None-Match': first.headers['ETag']})
+    assert unchanged.status_code == 304
+
+
+# ============================================================================
+# URL imports
+# ============================================================================
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/cal.ics',
+    'http://localhost:8080/cal.ics',
+    'webcal://10.0.0.5/cal.ics',
+    'https://192.168.1.1/cal.ics',
+    'http://169.254.169.254/latest/meta-data',
+    'http://[::1]/cal.ics',
+    'http://[::ffff:127.0.0.1]/cal.ics',
+    'http://0.0.0.0/cal.ics',
+    'ftp://93.184.216.34/cal.ics',
+    'file:///etc/passwd',
+])
+def test_url_import_refuses_private_hosts_and_other_schemes(client, url):
+    response = client.post('/api/calendar/import', json={'url': url})
+    assert response.status_code == 400
+
+
+def test_url_import_of_public_host_is_queued(client):
+    response = client.post('/api/calendar/import', json={'url': 'webcal://93.184.216.34/cal.ics'})
+    assert response.status_code == 202
+    assert response.get_json()['payload'] == {'url': 'https://93.184.216.34/cal.ics'}
+
+
+def test_private_hosts_allowed_when_opted_in(monkeypatch):
+    monkeypatch.setattr(Config, 'ICAL_ALLOW_PRIVATE_URLS', True)
+    assert ical.calendar_url('webcal://192.168.1.10/cal.ics') == 'https://192.168.1.10/cal.ics'
+
+
+def test_redirect_to_private_host_is_refused(monkeypatch):
+    class Redirect(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(302)
+            self.send_header('Location', 'http://169.254.169.254/latest/meta-data')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Redirect)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    real_check, checked = ical.calendar_url, []
+
+    def first_hop_allowed(url):
+        # Let the test server through; every later hop gets the real check
+        checked.append(url)
+        return url if len(checked) == 1 else real_check(url)
+
+    monkeypatch.setattr(ical, 'calendar_url', first_hop_allowed)
+    try:
+        with pytest.raises(ValueError, match='not a public address'):
+            ical.open_calendar_url(f"http://127.0.0.1:{server.server_port}/cal.ics", timeout=5)
+    finally:
+        server.shutdown()
+    assert checked[1] == 'http://169.254.169.254/latest/meta-data'
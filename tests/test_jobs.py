@@ -0,0 +1,141 @@
+"""
+The persistent job queue: periodic dedupe, claiming, retries
+
+    python -m pytest tests
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from app import init_db
+from jobs import job_queue
+from models import db, Job
+
+
+@pytest.fixture
+def queue(app, monkeypatch):
+    """job_queue with test handlers, run by hand instead of by the dispatcher thread"""
+    init_db()
+    calls = []
+
+    def flaky(fail=True):
+        calls.append(fail)
+        if fail:
+            raise RuntimeError('boom')
+        return {'ok': True}
+
+    monkeypatch.setitem(job_queue.handlers, 'test_flaky', (flaky, None))
+    monkeypatch.setattr(job_queue, '_slots', threading.BoundedSemaphore(job_queue.workers))
+    monkeypatch.setattr(job_queue, 'calls', calls, raising=False)
+    return job_queue
+
+
+def run_claimed(queue):
+    """Claim the next due job and run it on this thread, as a worker would"""
+    job_id = queue._claim_next()
+    assert job_id is not None
+    queue._slots.acquire()
+    queue._run(job_id)
+    db.session.expire_all()
+    return db.session.get(Job, job_id)
+
+
+def frozen_utcnow(monkeypatch, moment):
+    class Frozen(datetime):
+        @classmethod
+        def utcnow(cls):
+            return moment
+
+    monkeypatch.setattr(jobs, 'datetime', Frozen)
+
+
+def test_periodic_job_is_enqueued_once_per_slot(queue, monkeypatch):
+    slot = datetime(2026, 1, 1, 2, 0, 0)
+    frozen_utcnow(monkeypatch, slot)
+    for _ in range(3):  # Every process fires the same schedule
+        queue._enqueue_periodic('refit_estimator')
+    assert Job.query.filter_by(name='refit_estimator').count() == 1
+
+    frozen_utcnow(monkeypatch, slot + timedelta(seconds=59))
+    queue._enqueue_periodic('refit_estimator')
+    assert Job.query.filter_by(name='refit_estimator').count() == 1
+
+    frozen_utcnow(monkeypatch, slot + timedelta(days=1))
+    queue._enqueue_periodic('refit_estimator')
+    keys = sorted(job.dedupe_key for job in Job.query.filter_by(name='refit_estimator'))
+    assert keys == ['refit_estimator@2026-01-01T02:00:00', 'refit_estimator@2026-01-02T02:00:00']
+
+
+def test_claimed_job_is_not_claimed_again(queue):
+    job = queue.enqueue('test_flaky', {'fail': False})
+    db.session.commit()
+
+    assert queue._claim_next() == job.id
+    assert queue._claim_next() is None
+    db.session.expire_all()
+    assert (job.status, job.attempts) == ('running', 1)
+
+
+def test_concurrent_claims_hand_out_each_job_once(app, queue):
+    for _ in range(3):
+        queue.enqueue('test_flaky', {'fail': False})
+    db.session.commit()
+
+    claimed, lock = [], threading.Lock()
+
+    def claim():
+        with app.app_context():
+            while (job_id := queue._claim_next()) is not None:
+                with lock:
+                    claimed.append(job_id)
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [job.id for job in Job.query.order_by(Job.id)]
+
+
+def test_failed_job_is_retried_with_backoff(queue):
+    job = queue.enqueue('test_flaky')
+    db.session.commit()
+
+    delays = []
+    for attempt in (1, 2):
+        started = datetime.utcnow()
+        job = run_claimed(queue)
+        assert (job.status, job.attempts) == ('pending', attempt)
+        assert job.last_error == 'RuntimeError: boom'
+        delays.append((job.run_at - started).total_seconds())
+        job.run_at = datetime.utcnow()  # Due now rather than after the backoff
+        db.session.commit()
+
+    assert queue.retry_delay <= delays[0] < queue.retry_delay + 5
+    assert 2 * queue.retry_delay <= delays[1] < 2 * queue.retry_delay + 5
+
+    job = run_claimed(queue)
+    assert (job.status, job.attempts) == ('failed', job.max_attempts)
+    assert len(queue.calls) == job.max_attempts
+
+
+def test_job_not_due_yet_is_not_claimed(queue):
+    queue.enqueue('test_flaky', delay=60)
+    db.session.commit()
+    assert queue._claim_next() is None
+
+
+def test_stale_running_job_is_requeued(queue):
+    job = queue.enqueue('test_flaky', {'fail': False})
+    db.session.commit()
+    queue._claim_next()
+    job.started_at = datetime.utcnow() - timedelta(seconds=queue.timeout + 1)
+    db.session.commit()
+
+    queue._requeue_stale()
+    db.session.expire_all()
+    assert job.status == 'pending'
+    job = run_claimed(queue)
+    assert (job.status, job.attempts) == ('completed', 2)
@@ -0,0 +1,60 @@
+"""
+Request profiling and access to /metrics
+
+    python -m pytest tests
+"""
+import threading
+
+import pytest
+
+from config import Config
+from app import create_app
+from metrics import metrics
+
+
+def profiler_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'nexus-profiler']
+
+
+def test_profiler_stops_when_the_view_raises(app, monkeypatch):
+    monkeypatch.setattr(metrics, 'profiling_enabled', True)
+
+    def broken():
+        raise RuntimeError('view failed')
+
+    app.add_url_rule('/test/broken', 'test_broken', broken)
+    # As under the debugger: the exception propagates and after_request never runs
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/test/broken?_profile=1')
+    assert profiler_threads() == []
+
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    response = app.test_client().get('/test/broken?_profile=1')
+    assert response.status_code == 500  # The profile, but not a success
+    assert profiler_threads() == []
+
+
+def metrics_app(tmp_path, **settings):
+    class MetricsConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'metrics.db'}"
+        BACKGROUND_SERVICES = False
+
+    for name, value in settings.items():
+        setattr(MetricsConfig, name, value)
+    return create_app(MetricsConfig)
+
+
+def test_metrics_are_off_by_default(tmp_path):
+    assert metrics_app(tmp_path).test_client().get('/metrics').status_code == 404
+
+
+@pytest.mark.parametrize('authorization, status', [(None, 401), ('Bearer wrong', 401), ('Bearer s3cret', 200)])
+def test_metrics_token(tmp_path, monkeypatch, authorization, status):
+    app = metrics_app(tmp_path, METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+    monkeypatch.setattr(metrics, 'token', 's3cret')
+    headers = {'Authorization': authorization} if authorization else {}
+    response = app.test_client().get('/metrics', headers=headers)
+    assert response.status_code == status
+    if status == 200:
+        assert b'nexus_http_request_duration_seconds' in response.get_data()
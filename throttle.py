@@ -0,0 +1,177 @@
+import threading
+import time
+from functools import wraps
+
+from flask import request, make_response, jsonify, Response
+
+from response_cache import get_versions
+
+
+class Flight:
+    """One in-progress computation that identical requests wait on"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # (status, headers, body)
+        self.error = None
+
+    def response(self):
+        if self.error is not None:
+            raise self.error
+        status, headers, body = self.result
+        return Response(body, status=status, headers=headers)
+
+
+class Throttle:
+    """
+    Load shedding for CPU-heavy GET routes
+    Each client gets a token bucket; identical concurrent requests (same
+    route, args and data versions) share one computation; and at most
+    THROTTLE_MAX_CONCURRENT computations run at once, with a bounded queue
+    behind them. Anything over a limit gets a 429 with Retry-After instead
+    of tying up a worker thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.computed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self._buckets = {}  # client -> (tokens, last refill)
+        self._flights = {}  # request key -> Flight
+        self._waiting = 0
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('THROTTLE_ENABLED', True)
+        self.rate = app.config.get('THROTTLE_RATE', 2)
+        self.burst = app.config.get('THROTTLE_BURST', 10)
+        self.max_concurrent = app.config.get('THROTTLE_MAX_CONCURRENT', 2)
+        self.max_queue = app.config.get('THROTTLE_MAX_QUEUE', 8)
+        self.queue_timeout = app.config.get('THROTTLE_QUEUE_TIMEOUT', 10)
+        self.max_clients = app.config.get('THROTTLE_MAX_CLIENTS', 10000)
+        self.client_header = app.config.get('THROTTLE_CLIENT_HEADER')
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    def expensive(self, *tables):
+        """
+        Rate-limit, coalesce and queue a GET view whose output depends on `tables`
+        Put it under @cached so cache hits skip all of this
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                retry_after = self._take_token(self._client())
+                if retry_after:
+                    self.rate_limited += 1
+                    return self._reject('Rate limit exceeded', retry_after)
+
+                key = self._key(get_versions(tables))
+                with self._lock:
+                    flight = self._flights.get(key)
+                    leader = flight is None
+                    if leader:
+                        flight = self._flights[key] = Flight()
+
+                if not leader:
+                    self.coalesced += 1
+                    flight.done.wait()
+                    return flight.response()
+
+                try:
+                    flight.result = self._compute(view, args, kwargs)
+                except Exception as error:
+                    flight.error = error
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flights[key]
+                    flight.done.set()
+                return flight.response()
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'computed': self.computed,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'shed': self.shed,
+            'in_flight': len(self._flights),
+            'queued': self._waiting,
+        }
+
+    def _compute(self, view, args, kwargs):
+        """Run the view in a computation slot; a full queue yields a 429 for every waiter"""
+        if not self._acquire_slot():
+            self.shed += 1
+            return self._capture(self._reject('Server busy, try again shortly', self.queue_timeout))
+        try:
+            self.computed += 1
+            return self._capture(make_response(view(*args, **kwargs)))
+        finally:
+            self._slots.release()
+
+    def _acquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _take_token(self, client):
+        """0 if the client may proceed, else seconds until its next token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1, now)
+            if len(self._buckets) > self.max_clients:
+                # Forget clients whose buckets have refilled; they start full anyway
+                self._buckets = {c: (t, u) for c, (t, u) in self._buckets.items()
+                                 if t + (now - u) * self.rate < self.burst}
+        return 0
+
+    def _client(self):
+        if self.client_header and self.client_header in request.headers:
+            return request.headers[self.client_header].split(',')[0].strip()
+        return request.remote_addr
+
+    @staticmethod
+    def _key(versions):
+        args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        version_part = ','.join(f"{t}:{versions[t]}" for t in sorted(versions))
+        return f"{request.path}?{args}|{version_part}"
+
+    @staticmethod
+    def _capture(response):
+        """Status, headers and body of a response, so each waiter can get its own copy"""
+        response.direct_passthrough = False  # send_file() bodies are read into memory here
+        body = response.get_data()
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() != 'content-length']
+        return response.status_code, headers, body
+
+    @staticmethod
+    def _reject(message, retry_after):
+        response = make_response(jsonify({'error': message}), 429)
+        response.headers['Retry-After'] = str(max(1, round(retry_after)))
+        return response
+
+
+throttle = Throttle()
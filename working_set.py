@@ -0,0 +1,138 @@
+"""
+Compact working set for AIEngine
+
+The AI routes used to load full ORM objects, turn them into dicts with ISO
+string datetimes and let AIEngine parse those strings back. The records
+here hold only the columns AIEngine reads, as native Python values, and
+are filled straight from column selects: one tuple per row, no identity
+map, no per-row dict.
+
+AIEngine also accepts the to_dict() form; those dicts are converted to
+records once on the way in (see as_tasks/as_events/as_time_entries).
+"""
+from datetime import datetime
+
+from archive import ARCHIVES, on_archive
+from config import Config
+from models import db, Task, Event, TimeEntry
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+class TaskRecord:
+    """The task columns AIEngine and the duration estimator read"""
+    __slots__ = ('id', 'title', 'status', 'priority', 'deadline', 'estimated_time', 'tags', 'source')
+    columns = ('id', 'title', 'status', 'priority', 'deadline', 'estimated_time', 'tags')
+
+    def __init__(self, id, title, status, priority, deadline, estimated_time, tags, source=None):
+        self.id = id
+        self.title = title
+        self.status = status
+        self.priority = priority
+        self.deadline = deadline
+        self.estimated_time = estimated_time
+        self.tags = tags  # JSON text from the database, a list from to_dict()
+        self.source = source  # The dict this record was built from, if any
+
+    @classmethod
+    def from_dict(cls, task):
+        return cls(task.get('id'), task.get('title'), task['status'], task.get('priority'),
+                   _parse(task.get('deadline')), task.get('estimated_time'), task.get('tags'), task)
+
+    def original(self):
+        """What AIEngine hands back: the caller's dict, or the record itself"""
+        return self if self.source is None else self.source
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'status': self.status,
+            'priority': self.priority,
+            'deadline': self.deadline.isoformat() if self.deadline else None,
+            'estimated_time': self.estimated_time,
+        }
+
+
+class EventRecord:
+    """An event's time span"""
+    __slots__ = ('id', 'start_time', 'end_time')
+    columns = __slots__
+
+    def __init__(self, id, start_time, end_time):
+        self.id = id
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @classmethod
+    def from_dict(cls, event):
+        return cls(event.get('id'), _parse(event['start']), _parse(event['end']))
+
+
+class TimeEntryRecord:
+    """When time was logged and how much"""
+    __slots__ = ('id', 'start_time', 'duration')
+    columns = __slots__
+
+    def __init__(self, id, start_time, duration):
+        self.id = id
+        self.start_time = start_time
+        self.duration = duration
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry.get('id'), _parse(entry.get('start_time')), entry.get('duration'))
+
+
+def _as(record_class, rows):
+    return [row if isinstance(row, record_class) else record_class.from_dict(row) for row in rows]
+
+
+def as_tasks(tasks, status=None):
+    """Tasks (with `status`, if given) as records; dicts are filtered before they are converted"""
+    if status is None:
+        return _as(TaskRecord, tasks)
+    return [task if isinstance(task, TaskRecord) else TaskRecord.from_dict(task) for task in tasks
+            if (task.status if isinstance(task, TaskRecord) else task['status']) == status]
+
+
+def as_events(events):
+    return _as(EventRecord, events)
+
+
+def as_time_entries(entries):
+    return _as(TimeEntryRecord, entries)
+
+
+def _load(record_class, model, criteria, history=False):
+    query = db.session.query(*(getattr(model, name) for name in record_class.columns)).filter(*criteria)
+    records = [record_class(*row) for row in query.yield_per(Config.DB_STREAM_BATCH_SIZE)]
+    if history:
+        archive = ARCHIVES[model]
+        query = db.session.query(*(getattr(archive, name) for name in record_class.columns)).filter(
+            *(on_archive(criterion, model) for criterion in criteria))
+        records.extend(record_class(*row) for row in query.yield_per(Config.DB_STREAM_BATCH_SIZE))
+    return records
+
+
+def load_tasks(*criteria, history=False):
+    """Task records matching `criteria`, plus archived ones if `history`"""
+    return _load(TaskRecord, Task, criteria, history)
+
+
+def load_events(*criteria):
+    return _load(EventRecord, Event, criteria)
+
+
+def load_time_entries(*criteria, history=False):
+    """Time entry records matching `criteria`, plus archived ones if `history`"""
+    return _load(TimeEntryRecord, TimeEntry, criteria, history)
+
+
+def task_dicts(records):
+    """Full to_dict() output for the few tasks a response returns, in one query"""
+    ids = [record.id for record in records]
+    tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids))} if ids else {}
+    return [tasks[task_id].to_dict() for task_id in ids if task_id in tasks]